@@ -1,6 +1,7 @@
 from .url_agent import URLMetadataAgent, URLAgentResult
 from .headlines_agent import HeadlinesAgent, HeadlinesAgentResult
 from .ocr_agent import OCRAgent, ScreenshotsAgent
+from .linear_agent import LinearTierAgent, LinearAgentResult
 
 __all__ = [
     "URLMetadataAgent",
@@ -9,4 +10,6 @@ __all__ = [
     "HeadlinesAgentResult",
     "OCRAgent",
     "ScreenshotsAgent",
+    "LinearTierAgent",
+    "LinearAgentResult",
 ]
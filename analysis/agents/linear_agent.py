@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from analysis.linear_tier import LinearModel, event_features, resolve_dir
+from core.config import settings
+
+
+@dataclass
+class LinearAgentResult:
+    action: str
+    confidence: float
+    probabilities: Dict[str, float]
+    latency_us: float
+    confident: bool
+    version: str  # training timestamp of the model that answered
+
+
+class LinearTierAgent:
+    """Learned layer: hashed-feature logistic regression trained on past decisions."""
+
+    def __init__(self):
+        self.logger = logging.getLogger("watchit.linear_tier")
+        self.threshold = settings.linear_tier_threshold
+        self.model: Optional[LinearModel] = None
+        if settings.linear_tier_enabled:
+            try:
+                self.model = LinearModel.load(resolve_dir())
+            except Exception:
+                self.logger.exception("Could not load the linear tier; pages go to the LLM")
+        if self.model is not None:
+            self.logger.info("Linear tier loaded (%s classes, trained on %s pages)", len(self.model.classes), self.model.meta.get("examples"))
+
+    def run(self, event: Dict[str, Any]) -> Optional[LinearAgentResult]:
+        if self.model is None:
+            return None
+        started = time.perf_counter()
+        action, confidence, probabilities = self.model.predict(event_features(event))
+        latency_us = (time.perf_counter() - started) * 1e6
+        return LinearAgentResult(
+            action=action,
+            confidence=confidence,
+            probabilities=probabilities,
+            latency_us=round(latency_us, 1),
+            confident=confidence >= self.threshold,
+            version=str(self.model.meta.get("trained_at", "")),
+        )
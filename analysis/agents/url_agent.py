@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import json
+import time
 
 from analysis.safety import SafetyAnalyzer
-from analysis.llm_judge import LLMJudge
+from analysis.llm_judge import JudgeTier, LLMJudge, judge_tiers
+from core.config import settings
 
 
 @dataclass
@@ -13,6 +15,7 @@ class URLAgentResult:
     fast_scores: Dict[str, float]
     llm_decision: Dict[str, Any]
     confidence: float
+    tiers: List[Dict[str, Any]] = field(default_factory=list)  # one record per cascade tier consulted
 
 
 class URLMetadataAgent:
@@ -20,7 +23,23 @@ class URLMetadataAgent:
 
     def __init__(self):
         self.analyzer = SafetyAnalyzer()
-        self.judge = LLMJudge()
+        self.tiers: List[Tuple[JudgeTier, LLMJudge]] = [(tier, LLMJudge(model=tier.model)) for tier in judge_tiers()]
+        self.judge = self.tiers[-1][1]
+        self.escalate_severities = {s.strip().lower() for s in settings.judge_cascade_escalate_severity.split(",") if s.strip()}
+        self.escalate_categories = {c.strip().lower() for c in settings.judge_cascade_escalate_categories.split(",") if c.strip()}
+
+    def _escalation(self, tier: JudgeTier, verdict: Dict[str, Any]) -> Optional[str]:
+        """Why a cascade tier's verdict must go to the next tier, or None to accept it."""
+        if tier.min_confidence is None:
+            return None
+        if float(verdict.get("confidence", 0.0) or 0.0) < tier.min_confidence:
+            return "low_confidence"
+        if str(verdict.get("severity", "")).lower() in self.escalate_severities:
+            return "severity"
+        categories = [str(c).lower() for c in verdict.get("categories") or []]
+        if any(esc in c for c in categories for esc in self.escalate_categories):
+            return "category"
+        return None
 
     def run(
         self,
@@ -28,6 +47,7 @@ class URLMetadataAgent:
         child_profile: Dict[str, Any],
         extra_text: str = "",
         fast_scores: Dict[str, float] | None = None,
+        on_action: Optional[Callable[[str], None]] = None,
     ) -> URLAgentResult:
         if fast_scores is None:
             fast_scores = self.analyzer.analyze_event_fast(event, extra_text=extra_text)
@@ -36,19 +56,88 @@ class URLMetadataAgent:
         domain = url.split("//")[-1].split("/")[0] if url else ""
         child_age = int(child_profile.get("age", 12) or 12)
         strictness = (child_profile.get("strictness") or "standard").lower()
-        llm_decision = self.judge.judge(
-            page_title=title,
-            domain=domain,
-            fast_scores=fast_scores,
-            text_sample=self._aggregate_text(event, extra_text),
-            child_age=child_age,
-            strictness=strictness,
-        )
+        text_sample = self._aggregate_text(event, extra_text)
+
+        def _call(tier: JudgeTier, judge: LLMJudge) -> Dict[str, Any]:
+            return judge.judge(
+                page_title=title,
+                domain=domain,
+                fast_scores=fast_scores,
+                text_sample=text_sample,
+                child_age=child_age,
+                strictness=strictness,
+                # Only the last tier's streamed action is final enough to act on.
+                on_action=on_action if tier.min_confidence is None else None,
+            )
+
+        return self._cascade(_call, fast_scores)
+
+    def run_delta(
+        self,
+        event: Dict[str, Any],
+        child_profile: Dict[str, Any],
+        previous: Dict[str, Any],
+        new_text: str,
+        fast_scores: Dict[str, float],
+    ) -> URLAgentResult:
+        """
+        Revise `previous`, this page's earlier verdict, with new evidence (OCR
+        text) using a short delta prompt instead of re-sending the page text.
+        Starts at the cascade tier that gave `previous`; the tiers below it
+        already escalated for this page.
+        """
+        title = event.get("title") or ""
+        url = event.get("url") or ""
+        domain = url.split("//")[-1].split("/")[0] if url else ""
+        child_age = int(child_profile.get("age", 12) or 12)
+        strictness = (child_profile.get("strictness") or "standard").lower()
+
+        def _call(tier: JudgeTier, judge: LLMJudge) -> Dict[str, Any]:
+            return judge.judge_delta(
+                page_title=title,
+                domain=domain,
+                fast_scores=fast_scores,
+                previous=previous,
+                new_text=new_text,
+                child_age=child_age,
+                strictness=strictness,
+            )
+
+        try:
+            start = max(0, min(int(previous.get("tier") or 0), len(self.tiers) - 1))
+        except (TypeError, ValueError):
+            start = 0
+        return self._cascade(_call, fast_scores, start=start)
+
+    def _cascade(
+        self,
+        call: Callable[[JudgeTier, LLMJudge], Dict[str, Any]],
+        fast_scores: Dict[str, float],
+        start: int = 0,
+    ) -> URLAgentResult:
+        tiers: List[Dict[str, Any]] = []
+        llm_decision: Dict[str, Any] = {}
+        for index, (tier, judge) in enumerate(self.tiers[start:], start):
+            started = time.perf_counter()
+            llm_decision = call(tier, judge)
+            escalation = self._escalation(tier, llm_decision)
+            tiers.append({
+                "tier": index,
+                "model": tier.model,
+                "latency_ms": int((time.perf_counter() - started) * 1000),
+                "min_confidence": tier.min_confidence,
+                "escalated": escalation,
+                "verdict": llm_decision,
+            })
+            if escalation is None:
+                break
+        llm_decision = {**llm_decision, "model": tiers[-1]["model"], "tier": tiers[-1]["tier"]}
         confidence = float(llm_decision.get("confidence", 0.5))
         return URLAgentResult(
             fast_scores=fast_scores,
             llm_decision=llm_decision,
             confidence=max(0.0, min(1.0, confidence)),
+            tiers=tiers,
         )
 
     def _aggregate_text(self, event: Dict[str, Any], extra_text: str) -> str:
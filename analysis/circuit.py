@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from core.config import settings
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker for LLM calls.
+
+    Trips after `failures` consecutive errors, timeouts or responses slower
+    than `slow_ms`. While open, callers skip the model and use their fallback;
+    after `cooldown_s` a single probe call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, *, failures: int, slow_ms: float, cooldown_s: float, window: int = 200):
+        self.name = name
+        self.max_failures = max(1, failures)
+        self.slow_ms = slow_ms
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._streak = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.counters = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "trips": 0, "hedges": 0, "hedge_wins": 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def _current(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now; counts a rejection if not."""
+        with self._lock:
+            state = self._current()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record(self, elapsed_ms: float, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.counters["calls"] += 1
+            slow = error is None and self.slow_ms > 0 and elapsed_ms > self.slow_ms
+            if error is None:
+                self._latencies.append(elapsed_ms)
+            if error is not None or slow:
+                self.counters["failures" if error is not None else "slow"] += 1
+                self.last_error = repr(error) if error is not None else f"slow response ({elapsed_ms:.0f} ms)"
+                self._streak += 1
+                if self._state == HALF_OPEN or self._streak >= self.max_failures:
+                    if self._state != OPEN:
+                        self.counters["trips"] += 1
+                    self._state = OPEN
+                    self._opened_at = time.monotonic()
+                    self._probing = False
+            else:
+                self._streak = 0
+                self._state = CLOSED
+                self._probing = False
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """Latency percentile of recent successful calls, or None until enough were seen."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._streak = 0
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5, 1), self.percentile(0.95, 1)
+        with self._lock:
+            state = self._current()
+            retry_in = max(0.0, self.cooldown_s - (time.monotonic() - self._opened_at)) if state == OPEN else 0.0
+            return {
+                "model": self.name,
+                "state": state,
+                "consecutive_failures": self._streak,
+                "retry_in_s": round(retry_in, 1),
+                "p50_ms": round(p50, 1) if p50 is not None else None,
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "last_error": self.last_error,
+                **self.counters,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    """The shared breaker of `model` (one per model, whichever judge uses it)."""
+    with _registry_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                model,
+                failures=settings.judge_breaker_failures,
+                slow_ms=settings.judge_breaker_slow_ms,
+                cooldown_s=settings.judge_breaker_cooldown_seconds,
+            )
+        return breaker
+
+
+def all_breakers() -> List[CircuitBreaker]:
+    with _registry_lock:
+        return list(_breakers.values())
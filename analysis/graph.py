@@ -1,36 +1,71 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from langgraph.graph import StateGraph, START, END
 from pydantic import BaseModel, Field
 
 from analysis.agents import (
     URLMetadataAgent,
     HeadlinesAgent,
+    LinearTierAgent,
     OCRAgent,
     ScreenshotsAgent,
 )
+from analysis.llm_judge import judge_tiers
 from core.config import settings
 from core.activity_logger import log_step
 
 HEADLINE_DECISION_THRESHOLD = 0.85
 
+# Actions the LLM has already streamed for events whose verdict is still being
+# generated, so a deadline-bound provisional decision can use them.
+_streamed_actions: "OrderedDict[str, str]" = OrderedDict()
+_streamed_lock = threading.Lock()
+_STREAMED_MAX = 256
+
+
+def _note_streamed_action(event_id: Any, action: str) -> None:
+    with _streamed_lock:
+        _streamed_actions[str(event_id)] = action
+        while len(_streamed_actions) > _STREAMED_MAX:
+            _streamed_actions.popitem(last=False)
+
+
+def streamed_action(event_id: Any, *, forget: bool = False) -> Optional[str]:
+    with _streamed_lock:
+        if forget:
+            return _streamed_actions.pop(str(event_id), None)
+        return _streamed_actions.get(str(event_id))
+
 
 class MonitorState(BaseModel):
     event: Dict[str, Any]
     child_profile: Dict[str, Any] = Field(default_factory=dict)
     fast_scores: Dict[str, float] = Field(default_factory=dict)
     judge_json: Dict[str, Any] = Field(default_factory=dict)
+    judge_tiers: List[Dict[str, Any]] = Field(default_factory=list)
     headline_result: Dict[str, Any] = Field(default_factory=dict)
+    linear_result: Dict[str, Any] = Field(default_factory=dict)
     confidence: float = 1.0
     ocr_text: str = ""
+    ocr_attempted: bool = False
     need_llm: bool = True
     need_ocr: bool = False
     needs_screenshot: bool = False
 
 
 headlines_agent = HeadlinesAgent()
+linear_agent = LinearTierAgent()
 url_agent = URLMetadataAgent()
+
+
+def model_versions() -> List[str]:
+    """The models a verdict depends on: each judge tier with its escalation threshold, then the linear tier's build."""
+    tiers = [f"{t.model}@{t.min_confidence}" for t in judge_tiers()]
+    trained_at = linear_agent.model.meta.get("trained_at", "") if linear_agent.model is not None else ""
+    return tiers + [f"linear:{trained_at}@{settings.linear_tier_threshold}"]
 ocr_agent = OCRAgent()
 screens_agent = ScreenshotsAgent()
 
@@ -70,18 +105,46 @@ def node_headline_layer(state: MonitorState) -> MonitorState:
     return state
 
 
-def node_url_layer(state: MonitorState) -> MonitorState:
+def node_linear_layer(state: MonitorState) -> MonitorState:
     if not state.need_llm:
         return state
+    result = linear_agent.run(state.event)
+    if result is None:
+        return state
+    state.linear_result = {
+        "action": result.action,
+        "confidence": result.confidence,
+        "probabilities": result.probabilities,
+        "latency_us": result.latency_us,
+        "confident": result.confident,
+        "version": result.version,
+    }
+    if result.confident:
+        # Confident learned verdict: skip the LLM (and OCR) like the headline early exit does.
+        state.need_llm = False
+        state.judge_json = {
+            "action": result.action,
+            "categories": [],
+            "severity": "low" if result.action == "allow" else "medium",
+            "rationale": "linear_tier_decision",
+            "confidence": result.confidence,
+            "is_harmful": result.action != "allow",
+            "source": "linear",
+        }
+        state.confidence = result.confidence
+    log_step("linear_layer", state.event, state.linear_result)
+    return state
+
+
+def node_url_layer(state: MonitorState) -> Dict[str, Any]:
+    # Runs alongside node_ocr_extract, so it returns only the keys it owns.
+    event_id = state.event.get("id")
     result = url_agent.run(
         state.event,
         state.child_profile,
-        extra_text=state.ocr_text,
         fast_scores=state.fast_scores or None,
+        on_action=lambda action: _note_streamed_action(event_id, action),
     )
-    state.fast_scores = result.fast_scores
-    state.judge_json = result.llm_decision
-    state.confidence = result.confidence
     # Treat any low-confidence or non-allow verdict as uncertain and trigger OCR.
     llm_action = (result.llm_decision or {}).get("action", "").lower()
     llm_severity = (result.llm_decision or {}).get("severity", "").lower()
@@ -90,23 +153,37 @@ def node_url_layer(state: MonitorState) -> MonitorState:
         or llm_action in {"warn", "blur", "notify"}
         or llm_severity in {"medium", "high"}
     )
-    state.need_ocr = uncertain
     log_step(
         "url_metadata_layer",
         state.event,
         {"llm_decision": result.llm_decision, "confidence": result.confidence},
     )
-    return state
-
+    return {
+        "fast_scores": result.fast_scores,
+        "judge_json": result.llm_decision,
+        "judge_tiers": state.judge_tiers + result.tiers,
+        "confidence": result.confidence,
+        "need_ocr": uncertain,
+    }
 
-def node_ocr_layer(state: MonitorState) -> MonitorState:
-    state.needs_screenshot = False
-    if not state.need_llm or not state.need_ocr:
-        return state
 
+def node_ocr_extract(state: MonitorState) -> Dict[str, Any]:
+    """Speculative OCR of attached screenshots while the first LLM call is in flight."""
     screenshots = screens_agent.get_screenshots(state.event)
-    if not screenshots:
-        state.needs_screenshot = True
+    ocr_text = ocr_agent.extract_text(screenshots) if screenshots else ""
+    log_step(
+        "ocr_extract",
+        state.event,
+        {"screenshot_count": len(screenshots), "ocr_chars": len(ocr_text), "speculative": True},
+    )
+    return {"ocr_text": ocr_text, "ocr_attempted": True}
+
+
+def node_merge_layer(state: MonitorState) -> Dict[str, Any]:
+    """Join point of the parallel stages: decide whether OCR is still needed and possible."""
+    if not state.need_ocr:
+        return {"needs_screenshot": False}
+    if not screens_agent.get_screenshots(state.event):
         log_step(
             "ocr_layer_request_screenshot",
             state.event,
@@ -115,9 +192,14 @@ def node_ocr_layer(state: MonitorState) -> MonitorState:
                 "note": "llm_uncertain_no_screenshot_yet",
             },
         )
-        return state
+        return {"needs_screenshot": True}
+    return {"needs_screenshot": False}
+
 
-    ocr_text = ocr_agent.extract_text(screenshots)
+def node_ocr_layer(state: MonitorState) -> MonitorState:
+    screenshots = screens_agent.get_screenshots(state.event)
+    # Usually extracted already by node_ocr_extract; extract here when speculative OCR is off.
+    ocr_text = state.ocr_text if state.ocr_attempted else ocr_agent.extract_text(screenshots)
     if not ocr_text:
         log_step(
             "ocr_layer_no_text",
@@ -131,14 +213,25 @@ def node_ocr_layer(state: MonitorState) -> MonitorState:
         return state
 
     state.ocr_text = ocr_text
-    refreshed = url_agent.run(
-        state.event,
-        state.child_profile,
-        extra_text=ocr_text,
-        fast_scores=state.fast_scores or None,
-    )
+    if settings.judge_delta_prompt and state.judge_json:
+        # The first verdict already summarises the page text; send only what OCR adds.
+        refreshed = url_agent.run_delta(
+            state.event,
+            state.child_profile,
+            previous=state.judge_json,
+            new_text=ocr_text,
+            fast_scores=state.fast_scores,
+        )
+    else:
+        refreshed = url_agent.run(
+            state.event,
+            state.child_profile,
+            extra_text=ocr_text,
+            fast_scores=state.fast_scores or None,
+        )
     state.fast_scores = refreshed.fast_scores
     state.judge_json = refreshed.llm_decision
+    state.judge_tiers = state.judge_tiers + refreshed.tiers
     state.confidence = refreshed.confidence
     state.need_ocr = False
     log_step(
@@ -149,17 +242,61 @@ def node_ocr_layer(state: MonitorState) -> MonitorState:
             "ocr_text_full": ocr_text[:2000],  # log capped full text for debugging
             "llm_decision": refreshed.llm_decision,
             "confidence": refreshed.confidence,
+            "delta_prompt": settings.judge_delta_prompt,
         },
     )
     return state
 
 
+# --- routing -----------------------------------------------------------------
+# Conditional edges only schedule nodes whose inputs are ready and needed, so a
+# skipped stage costs nothing, and independent stages share a superstep: the
+# OCR extraction runs next to the first LLM call and both join in merge_layer.
+
+
+def route_after_prefilter(state: MonitorState) -> str:
+    return "continue" if state.need_llm else END
+
+
+def route_analysis(state: MonitorState) -> List[str]:
+    if not state.need_llm:
+        return [END]
+    stages = ["url_layer"]
+    if settings.speculative_ocr and screens_agent.get_screenshots(state.event):
+        stages.append("ocr_extract")
+    return stages
+
+
+def route_after_merge(state: MonitorState) -> str:
+    if state.need_ocr and not state.needs_screenshot:
+        return "ocr_layer"
+    return END
+
+
 graph = StateGraph(MonitorState)
 graph.add_node("headline_layer", node_headline_layer)
+graph.add_node("linear_layer", node_linear_layer)
 graph.add_node("url_layer", node_url_layer)
+graph.add_node("ocr_extract", node_ocr_extract)
+graph.add_node("merge_layer", node_merge_layer)
 graph.add_node("ocr_layer", node_ocr_layer)
 graph.add_edge(START, "headline_layer")
-graph.add_edge("headline_layer", "url_layer")
-graph.add_edge("url_layer", "ocr_layer")
+graph.add_conditional_edges("headline_layer", route_after_prefilter, {"continue": "linear_layer", END: END})
+graph.add_conditional_edges("linear_layer", route_analysis, ["url_layer", "ocr_extract", END])
+graph.add_edge("url_layer", "merge_layer")
+graph.add_edge("ocr_extract", "merge_layer")
+graph.add_conditional_edges("merge_layer", route_after_merge, ["ocr_layer", END])
 graph.add_edge("ocr_layer", END)
 app_graph = graph.compile()
+
+# OCR upgrade resumed from a first-pass checkpoint (see runtime/checkpoints.py):
+# the headline, linear and first LLM results are already in the state.
+resume = StateGraph(MonitorState)
+resume.add_node("ocr_extract", node_ocr_extract)
+resume.add_node("merge_layer", node_merge_layer)
+resume.add_node("ocr_layer", node_ocr_layer)
+resume.add_edge(START, "ocr_extract")
+resume.add_edge("ocr_extract", "merge_layer")
+resume.add_conditional_edges("merge_layer", route_after_merge, ["ocr_layer", END])
+resume.add_edge("ocr_layer", END)
+resume_graph = resume.compile()
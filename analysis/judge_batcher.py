@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BatchFn = Callable[[List[Any]], List[Optional[Dict[str, Any]]]]
+SoloFn = Callable[[Any], Dict[str, Any]]
+
+
+class _Slot:
+    __slots__ = ("request", "result", "lead", "ready")
+
+    def __init__(self, request: Any):
+        self.request = request
+        self.result: Optional[Dict[str, Any]] = None
+        self.lead = False
+        self.ready = threading.Event()
+
+
+class JudgeBatcher:
+    """
+    Coalesces judge requests that arrive close together into one LLM call.
+
+    Callers block in `judge()` on their own pipeline thread. The first caller
+    of a batch leads it: while other judge calls are in flight it waits up to
+    `window_ms` for more requests (or until `max_items` are queued), runs
+    `batch_fn` on them and hands every follower its verdict. A lone request on
+    an idle judge skips the window. Requests a batch could not answer, and
+    batches of one, go to `solo` as if there were no batcher.
+    """
+
+    def __init__(self, batch_fn: BatchFn, window_ms: float, max_items: int):
+        self.batch_fn = batch_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_items = max(2, max_items)
+        self._cond = threading.Condition()
+        self._queue: List[_Slot] = []
+        self._collecting = False
+        self._inflight = 0  # judge() calls not yet answered, batched or solo
+        self.counters = {
+            "requests": 0, "batches": 0, "batched_items": 0, "fallbacks": 0, "largest_batch": 0, "window_skipped": 0,
+        }
+
+    def judge(self, request: Any, solo: SoloFn) -> Dict[str, Any]:
+        with self._cond:
+            self._inflight += 1
+        try:
+            result = self._batched(request)
+            return result if result is not None else solo(request)
+        finally:
+            with self._cond:
+                self._inflight -= 1
+
+    def _batched(self, request: Any) -> Optional[Dict[str, Any]]:
+        slot = _Slot(request)
+        with self._cond:
+            self.counters["requests"] += 1
+            self._queue.append(slot)
+            if not self._collecting:
+                self._collecting = True
+                slot.lead = True
+            elif len(self._queue) >= self.max_items:
+                self._cond.notify_all()
+        if not slot.lead:
+            slot.ready.wait()
+            if not slot.lead:
+                return slot.result
+        self._lead()
+        return slot.result
+
+    def _lead(self) -> None:
+        with self._cond:
+            if self._inflight > len(self._queue):
+                # Other calls are being judged; pages arriving meanwhile can share this one's call.
+                deadline = time.monotonic() + self.window
+                self._cond.wait_for(
+                    lambda: len(self._queue) >= self.max_items, timeout=max(0.0, deadline - time.monotonic())
+                )
+            else:
+                self.counters["window_skipped"] += 1
+            batch = self._queue[: self.max_items]
+            del self._queue[: self.max_items]
+            if self._queue:
+                # Whoever queued next starts collecting the following batch.
+                self._queue[0].lead = True
+                self._queue[0].ready.set()
+            else:
+                self._collecting = False
+        if len(batch) == 1:
+            batch[0].lead = False
+            return
+        try:
+            results = list(self.batch_fn([s.request for s in batch]))
+        except Exception:
+            results = []
+        results += [None] * (len(batch) - len(results))
+        failed = sum(1 for r in results if r is None)
+        with self._cond:
+            self.counters["batches"] += 1
+            self.counters["batched_items"] += len(batch) - failed
+            self.counters["fallbacks"] += failed
+            self.counters["largest_batch"] = max(self.counters["largest_batch"], len(batch))
+        for s, r in zip(batch, results):
+            s.result = r
+            s.lead = False
+            s.ready.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {**self.counters, "window_ms": self.window * 1000, "max_items": self.max_items}
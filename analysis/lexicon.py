@@ -0,0 +1,419 @@
+"""
+Single-pass multi-pattern lexicon matching (Aho–Corasick).
+
+Lexicons are plain text files, one per category, in `WATCHIT_LEXICON_DIR`:
+
+    # lexicons/gambling.txt
+    casino
+    online slots\t1.5
+    apuestas
+
+Each line is a term with an optional tab-separated weight (default 1.0). A
+category's score sums the weights of its matches. Matching is case-, accent-
+and leetspeak-insensitive ("P0rn", "pörn" and "porn" all match "porn"), ignores
+zero-width characters, and respects word boundaries at term edges made of
+letters or digits, except in scripts written without spaces (CJK, Thai, ...).
+
+The automaton is compiled once into `compiled.json` next to the sources and
+rebuilt whenever they change. It runs on pyahocorasick's C matcher; without it,
+small lexicons (like the built-in one) are matched with one C substring scan
+per term, which beats the pure-Python automaton until about SMALL_LEXICON_TERMS
+terms. Compile or benchmark against the old regex path with
+
+    python -m analysis.lexicon compile
+    python -m analysis.lexicon bench [--chars 20000] [--terms 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.config import settings
+
+log = logging.getLogger("watchit.lexicon")
+
+_BASE_DIR = Path(__file__).resolve().parent.parent
+COMPILED_NAME = "compiled.json"
+LEGACY_COMPILED_NAME = "compiled.pkl"
+FORMAT_VERSION = 2
+# Without pyahocorasick, lexicons up to this size use per-term substring scans instead of the Python automaton.
+SMALL_LEXICON_TERMS = 128
+
+# Used when WATCHIT_LEXICON_DIR holds no lexicon files.
+DEFAULT_LEXICONS: Dict[str, Tuple[str, ...]] = {
+    "violence": ("kill", "shoot", "gun", "fight", "blood", "weapon"),
+    "sexual": ("sex", "porn", "nude", "xxx", "18+", "adult only"),
+    "profanity": ("damn", "shit", "fuck", "bitch"),
+}
+
+_LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+_INVISIBLE = dict.fromkeys(map(ord, "\u00ad\u200b\u200c\u200d\u2060\ufeff"))  # soft hyphen, zero-width marks
+_FOLD = {**str.maketrans(_LEET), **_INVISIBLE}
+
+Term = Tuple[str, str, float]  # (normalised term, category, weight)
+
+
+def normalize(text: str) -> str:
+    """Lower-case, strip accents and zero-width characters, undo common leetspeak."""
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text.translate(_FOLD)
+
+
+def _bounded(ch: str) -> bool:
+    # Letters of space-less scripts are category "Lo"; words there have no boundary to check.
+    return ch.isalnum() and unicodedata.category(ch) != "Lo"
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class Lexicon:
+    """Compiled Aho–Corasick automaton over weighted, categorised terms."""
+
+    def __init__(self, terms: Sequence[Term], goto: List[Dict[str, int]], fail: List[int], out: List[Tuple[int, ...]], digest: str = ""):
+        self.terms = list(terms)
+        self.categories = sorted({category for _, category, _ in self.terms})
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+        self.digest = digest
+        # (length, needs boundary before, needs boundary after) per term
+        self._edges = [(len(t), _bounded(t[0]), _bounded(t[-1])) for t, _, _ in self.terms]
+        self._native = _native_automaton(self.terms) or _small_matcher(self.terms)
+
+    @classmethod
+    def build(cls, lexicons: Dict[str, Iterable[Tuple[str, float]]], digest: str = "") -> "Lexicon":
+        terms: List[Term] = []
+        seen: Dict[Tuple[str, str], int] = {}
+        for category, entries in sorted(lexicons.items()):
+            for raw, weight in entries:
+                term = normalize(raw.strip())
+                if not term:
+                    continue
+                key = (term, category)
+                if key in seen:  # duplicate after normalisation: keep the heavier weight
+                    idx = seen[key]
+                    terms[idx] = (term, category, max(terms[idx][2], weight))
+                    continue
+                seen[key] = len(terms)
+                terms.append((term, category, float(weight)))
+
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for idx, (term, _, _) in enumerate(terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(idx)
+
+        # Breadth-first failure links; each state also reports its failure chain's terms.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch) != nxt else 0
+                outputs[nxt].extend(outputs[fail[nxt]])
+        return cls(terms, goto, fail, [tuple(o) for o in outputs], digest)
+
+    # --- matching ----------------------------------------------------------
+
+    def _matches(self, norm: str) -> Iterable[Tuple[int, int]]:
+        """(end index, term id) of every raw occurrence in normalised text."""
+        if self._native is not None:
+            yield from self._native.iter(norm)
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(norm):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in out[state]:
+                yield i, idx
+
+    def _accept(self, norm: str, end: int, idx: int) -> bool:
+        length, before, after = self._edges[idx]
+        start = end - length + 1
+        if before and start > 0 and _is_word(norm[start - 1]):
+            return False
+        if after and end + 1 < len(norm) and _is_word(norm[end + 1]):
+            return False
+        return True
+
+    def scan(self, text: str) -> Dict[str, float]:
+        """Summed match weight per category (every category present, zero if unmatched)."""
+        totals = dict.fromkeys(self.categories, 0.0)
+        if not text:
+            return totals
+        norm = normalize(text)
+        terms = self.terms
+        for end, idx in self._matches(norm):
+            if self._accept(norm, end, idx):
+                _, category, weight = terms[idx]
+                totals[category] += weight
+        return totals
+
+    def count(self, text: str) -> int:
+        """Number of term occurrences in `text`, over all categories."""
+        if not text:
+            return 0
+        norm = normalize(text)
+        return sum(1 for end, idx in self._matches(norm) if self._accept(norm, end, idx))
+
+    # --- persistence -------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_suffix(".tmp")
+        payload = {
+            "version": FORMAT_VERSION,
+            "digest": self.digest,
+            "terms": self.terms,
+            "goto": self.goto,
+            "fail": self.fail,
+            "out": self.out,
+        }
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, ensure_ascii=False, separators=(",", ":"))
+        tmp.replace(path)
+        # Pickled automatons from FORMAT_VERSION 1 are never loaded; do not leave one lying around.
+        (path.parent / LEGACY_COMPILED_NAME).unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Lexicon"]:
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+        except FileNotFoundError:
+            return None
+        if payload.get("version") != FORMAT_VERSION:
+            return None
+        terms = [(term, category, float(weight)) for term, category, weight in payload["terms"]]
+        out = [tuple(o) for o in payload["out"]]
+        return cls(terms, payload["goto"], payload["fail"], out, payload.get("digest", ""))
+
+
+def _native_automaton(terms: Sequence[Term]):
+    """The pyahocorasick C automaton over the same terms, when that package is installed."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    if not terms:
+        return None
+    automaton = ahocorasick.Automaton()
+    for idx, (term, _, _) in enumerate(terms):
+        # Same normalised term in several categories: report each id.
+        existing = automaton.get(term, ())
+        automaton.add_word(term, (*existing, idx))
+    automaton.make_automaton()
+    return _NativeIter(automaton)
+
+
+class _NativeIter:
+    def __init__(self, automaton):
+        self.automaton = automaton
+
+    def iter(self, norm: str) -> Iterable[Tuple[int, int]]:
+        for end, ids in self.automaton.iter(norm):
+            for idx in ids:
+                yield end, idx
+
+
+def _small_matcher(terms: Sequence[Term]):
+    """Per-term substring scans for small lexicons, when the C automaton is unavailable."""
+    if not terms or len(terms) > SMALL_LEXICON_TERMS:
+        return None
+    return _FindIter(terms)
+
+
+class _FindIter:
+    def __init__(self, terms: Sequence[Term]):
+        self.terms = [(term, len(term) - 1, idx) for idx, (term, _, _) in enumerate(terms)]
+
+    def iter(self, norm: str) -> Iterable[Tuple[int, int]]:
+        # str.find runs in C; stepping one character past each hit also reports
+        # overlapping occurrences, as the automaton does. Lexicon._accept checks boundaries.
+        find = norm.find
+        for term, tail, idx in self.terms:
+            pos = find(term)
+            while pos >= 0:
+                yield pos + tail, idx
+                pos = find(term, pos + 1)
+
+
+# --- lexicon sources ---------------------------------------------------------
+
+
+def resolve_dir() -> Path:
+    raw = Path(settings.lexicon_dir).expanduser()
+    return raw if raw.is_absolute() else _BASE_DIR / raw
+
+
+def _source_files(directory: Path) -> List[Path]:
+    return sorted(directory.glob("*.txt")) if directory.is_dir() else []
+
+
+def read_sources(files: Sequence[Path]) -> Tuple[Dict[str, List[Tuple[str, float]]], str]:
+    """Parse lexicon files into {category: [(term, weight)]} plus a digest of their contents."""
+    digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+    lexicons: Dict[str, List[Tuple[str, float]]] = {}
+    for path in files:
+        raw = path.read_bytes()
+        digest.update(path.name.encode() + b"\0" + raw)
+        entries = lexicons.setdefault(path.stem, [])
+        for lineno, line in enumerate(raw.decode("utf-8").splitlines(), 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            term, _, weight = line.partition("\t")
+            try:
+                entries.append((term, float(weight) if weight.strip() else 1.0))
+            except ValueError:
+                log.warning("%s:%s: bad weight %r; using 1.0", path.name, lineno, weight)
+                entries.append((term, 1.0))
+    return lexicons, digest.hexdigest()
+
+
+def load_lexicon(directory: Optional[Path] = None, *, write: bool = True) -> Lexicon:
+    """
+    The lexicon of `directory` (default `WATCHIT_LEXICON_DIR`): the compiled
+    file when it matches the sources, otherwise rebuilt (and re-saved). Falls
+    back to DEFAULT_LEXICONS when the directory has no lexicon files.
+    """
+    directory = directory or resolve_dir()
+    files = _source_files(directory)
+    if not files:
+        return Lexicon.build({c: [(t, 1.0) for t in terms] for c, terms in DEFAULT_LEXICONS.items()})
+    sources, digest = read_sources(files)
+    compiled = directory / COMPILED_NAME
+    try:
+        lexicon = Lexicon.load(compiled)
+    except Exception:
+        log.exception("Could not read %s; rebuilding", compiled)
+        lexicon = None
+    if lexicon is not None and lexicon.digest == digest:
+        return lexicon
+    started = time.perf_counter()
+    lexicon = Lexicon.build(sources, digest)
+    log.info(
+        "Compiled %s lexicon terms (%s categories) in %.0f ms",
+        len(lexicon.terms), len(lexicon.categories), (time.perf_counter() - started) * 1000,
+    )
+    if write:
+        try:
+            lexicon.save(compiled)
+        except OSError:
+            log.warning("Could not write %s; lexicons will be recompiled at each start", compiled)
+    return lexicon
+
+
+# --- benchmark ---------------------------------------------------------------
+
+
+def _regex_counts(patterns: Dict[str, "re.Pattern[str]"], text: str) -> Dict[str, int]:
+    """The previous matcher: one alternation regex per category, one findall pass each."""
+    return {category: len(rx.findall(text)) for category, rx in patterns.items()}
+
+
+def _bench(lexicon: Lexicon, texts: Sequence[str], rounds: int) -> Tuple[float, float]:
+    by_category: Dict[str, List[str]] = {}
+    for term, category, _ in lexicon.terms:
+        by_category.setdefault(category, []).append(term)
+    started = time.perf_counter()
+    patterns = {
+        c: re.compile(r"\b(" + "|".join(map(re.escape, sorted(t, key=len, reverse=True))) + r")\b", re.I)
+        for c, t in by_category.items()
+    }
+    compile_ms = (time.perf_counter() - started) * 1000
+    print(f"regex compile: {compile_ms:.1f} ms")
+    results = {}
+    for name, fn in (
+        ("regex", lambda text: (_regex_counts(patterns, text), len(text.split()))),
+        ("automaton", lambda text: (lexicon.scan(text), len(text.split()))),
+    ):
+        timings = []
+        for _ in range(rounds):
+            for text in texts:
+                started = time.perf_counter()
+                fn(text)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = timings[len(timings) // 2]
+        print(f"{name:<9} p50={results[name]:.3f} ms p99={timings[int(len(timings) * 0.99) - 1]:.3f} ms per page")
+    return results["regex"], results["automaton"]
+
+
+def _synthetic(chars: int, terms: int, seed: int = 7) -> Tuple[Lexicon, List[str]]:
+    """A large random lexicon and DOM-like pages sprinkled with its terms."""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+
+    def word(lo: int, hi: int) -> str:
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(lo, hi)))
+
+    categories = ["violence", "sexual", "profanity", "drugs", "gambling", "hate", "self_harm", "weapons"]
+    lexicons = {c: [(word(4, 10) if rng.random() < 0.8 else word(3, 7) + " " + word(3, 7), 1.0) for _ in range(terms // len(categories))] for c in categories}
+    vocabulary = [term for entries in lexicons.values() for term, _ in entries]
+    pages = []
+    for _ in range(20):
+        parts: List[str] = []
+        size = 0
+        while size < chars:
+            piece = rng.choice(vocabulary) if rng.random() < 0.02 else word(2, 9)
+            parts.append(piece)
+            size += len(piece) + 1
+        pages.append(" ".join(parts))
+    return Lexicon.build(lexicons), pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile lexicons or benchmark the automaton against regex matching.")
+    parser.add_argument("command", choices=("compile", "bench"))
+    parser.add_argument("--chars", type=int, default=20000, help="characters per synthetic page (bench)")
+    parser.add_argument("--terms", type=int, default=5000, help="terms in the synthetic lexicon (bench)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        directory = resolve_dir()
+        if not _source_files(directory):
+            raise SystemExit(f"no *.txt lexicons in {directory}")
+        (directory / COMPILED_NAME).unlink(missing_ok=True)
+        lexicon = load_lexicon(directory)
+        print(f"compiled {len(lexicon.terms)} terms in {len(lexicon.categories)} categories -> {directory / COMPILED_NAME}")
+        return
+
+    native = "pyahocorasick" if _native_automaton([("a", "x", 1.0)]) is not None else f"pure python (substring scans up to {SMALL_LEXICON_TERMS} terms)"
+    print(f"automaton backend: {native}")
+    print(f"-- current lexicons, {args.chars}-char pages")
+    _, pages = _synthetic(args.chars, 200)
+    _bench(load_lexicon(write=False), pages, args.rounds)
+    print(f"-- synthetic lexicon of {args.terms} terms, {args.chars}-char pages")
+    lexicon, pages = _synthetic(args.chars, args.terms)
+    regex_ms, automaton_ms = _bench(lexicon, pages, args.rounds)
+    print(f"speed-up: {regex_ms / max(automaton_ms, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
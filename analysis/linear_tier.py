@@ -0,0 +1,277 @@
+"""
+Hashed-feature logistic regression trained on our own decision history.
+
+Sits between the keyword prefilter and the LLM judge: pages it classifies
+with high confidence skip the LLM. Train or refresh it with
+
+    python -m analysis.linear_tier train [--limit 50000] [--epochs 8]
+    python -m analysis.linear_tier eval
+
+Weights are plain `.npy` files loaded memory-mapped, so startup costs no
+parsing and several processes share the same pages.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from core.config import settings
+
+_BASE_DIR = Path(__file__).resolve().parent.parent
+
+DIMS = 1 << 18
+MAX_TEXT_CHARS = 2000
+_WORD = re.compile(r"[a-z0-9][a-z0-9'_-]{1,30}")
+
+Features = Tuple[np.ndarray, np.ndarray]  # (hashed indices, signed values)
+
+
+def resolve_dir() -> Path:
+    raw = Path(settings.linear_tier_path).expanduser()
+    return raw if raw.is_absolute() else _BASE_DIR / raw
+
+
+def page_tokens(title: Optional[str], url: Optional[str], text: Optional[str]) -> List[str]:
+    """Namespaced tokens: title words, host labels, path words and page-text words."""
+    tokens: List[str] = []
+    tokens += ["t:" + w for w in _WORD.findall((title or "").lower())]
+    try:
+        parts = urlsplit(url or "")
+        host, path = (parts.hostname or "").lower(), parts.path.lower()
+    except ValueError:
+        host, path = "", ""
+    if host.startswith("www."):
+        host = host[4:]
+    if host:
+        labels = host.split(".")
+        tokens.append("h:" + host)
+        tokens += ["d:" + ".".join(labels[i:]) for i in range(1, len(labels) - 1)]
+        tokens += ["l:" + label for label in labels[:-1]]
+    tokens += ["p:" + w for w in _WORD.findall(path)]
+    words = _WORD.findall((text or "")[:MAX_TEXT_CHARS].lower())
+    tokens += ["w:" + w for w in words]
+    tokens += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    return tokens
+
+
+def hash_features(tokens: Sequence[str], dims: int = DIMS) -> Features:
+    """Signed feature hashing (CRC32) with counts damped by sqrt and the vector L2-normalised."""
+    if not tokens:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+    idx = (hashes % np.uint64(dims)).astype(np.int64)
+    sign = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+    idx, inverse = np.unique(idx, return_inverse=True)
+    values = np.zeros(len(idx), dtype=np.float32)
+    np.add.at(values, inverse, sign)
+    values = np.sign(values) * np.sqrt(np.abs(values))
+    norm = float(np.linalg.norm(values))
+    return idx, (values / norm if norm else values).astype(np.float32)
+
+
+def event_features(event: Dict[str, Any], data: Optional[Dict[str, Any]] = None) -> Features:
+    if data is None:
+        try:
+            data = json.loads(event.get("data_json") or "{}") or {}
+        except Exception:
+            data = {}
+    text = " ".join(str(data.get(k) or "") for k in ("dom_sample", "text"))
+    return hash_features(page_tokens(event.get("title"), event.get("url"), text))
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class LinearModel:
+    """Multinomial logistic regression over hashed features."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: Sequence[str], meta: Optional[Dict[str, Any]] = None):
+        self.weights = weights  # (dims, classes), possibly memory-mapped
+        self.bias = bias
+        self.classes = list(classes)
+        self.meta = meta or {}
+
+    @property
+    def dims(self) -> int:
+        return int(self.weights.shape[0])
+
+    def predict_proba(self, features: Features) -> np.ndarray:
+        idx, values = features
+        scores = self.bias + (values @ self.weights[idx] if len(idx) else 0.0)
+        return _softmax(np.asarray(scores, dtype=np.float64))
+
+    def predict(self, features: Features) -> Tuple[str, float, Dict[str, float]]:
+        probs = self.predict_proba(features)
+        best = int(np.argmax(probs))
+        return self.classes[best], float(probs[best]), {c: round(float(p), 4) for c, p in zip(self.classes, probs)}
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        # Write next to the live files and swap in, so a running process never maps a half-written file.
+        for name, arr in (("weights", self.weights), ("bias", self.bias)):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(arr, dtype=np.float32))
+            tmp.replace(path / f"{name}.npy")
+        tmp = path / "meta.tmp.json"
+        tmp.write_text(json.dumps({**self.meta, "classes": self.classes, "dims": self.dims}, indent=2))
+        tmp.replace(path / "meta.json")
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LinearModel"]:
+        if not (path / "meta.json").exists():
+            return None
+        meta = json.loads((path / "meta.json").read_text())
+        weights = np.load(path / "weights.npy", mmap_mode="r")
+        bias = np.load(path / "bias.npy")
+        return cls(weights, bias, meta["classes"], meta)
+
+
+# --- training ----------------------------------------------------------------
+
+
+def _stack(features: Sequence[Features]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate per-example features into (row, idx, value) arrays."""
+    rows = np.concatenate([np.full(len(f[0]), i, dtype=np.int64) for i, f in enumerate(features)] or [np.zeros(0, np.int64)])
+    idx = np.concatenate([f[0] for f in features] or [np.zeros(0, np.int64)])
+    values = np.concatenate([f[1] for f in features] or [np.zeros(0, np.float32)])
+    return rows, idx, values
+
+
+def train(
+    features: Sequence[Features],
+    labels: Sequence[str],
+    *,
+    dims: int = DIMS,
+    epochs: int = 8,
+    batch: int = 256,
+    lr: float = 0.5,
+    l2: float = 1e-6,
+    seed: int = 7,
+) -> LinearModel:
+    """
+    Mini-batch SGD on the softmax loss. Classes are weighted by inverse
+    frequency so the rarer block/warn labels are not drowned out by allows.
+    """
+    classes = sorted(set(labels))
+    y = np.array([classes.index(label) for label in labels], dtype=np.int64)
+    counts = np.bincount(y, minlength=len(classes)).astype(np.float64)
+    class_weight = (len(y) / (len(classes) * np.maximum(counts, 1))).astype(np.float32)
+    weights = np.zeros((dims, len(classes)), dtype=np.float32)
+    bias = np.log(np.maximum(counts, 1) / len(y)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    order = np.arange(len(y))
+    step = 0
+    for _ in range(epochs):
+        rng.shuffle(order)
+        for start in range(0, len(order), batch):
+            chunk = order[start:start + batch]
+            rows, idx, values = _stack([features[i] for i in chunk])
+            scores = np.tile(bias, (len(chunk), 1))
+            np.add.at(scores, rows, values[:, None] * weights[idx])
+            grad = _softmax(scores)
+            grad[np.arange(len(chunk)), y[chunk]] -= 1.0
+            grad *= class_weight[y[chunk]][:, None] / len(chunk)
+            step_lr = lr / np.sqrt(1.0 + step / 100.0)
+            np.add.at(weights, idx, -step_lr * values[:, None] * grad[rows])
+            bias -= step_lr * grad.sum(axis=0)
+            step += 1
+        weights *= 1.0 - l2 * lr
+    return LinearModel(weights, bias, classes)
+
+
+def evaluate(model: LinearModel, features: Sequence[Features], labels: Sequence[str], threshold: float) -> Dict[str, Any]:
+    """Accuracy overall and on the confident subset the tier would answer, plus per-page latency."""
+    correct = confident = confident_correct = 0
+    latencies: List[float] = []
+    for feats, label in zip(features, labels):
+        started = time.perf_counter()
+        action, prob, _ = model.predict(feats)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        correct += action == label
+        if prob >= threshold:
+            confident += 1
+            confident_correct += action == label
+    n = len(labels)
+    lat = np.array(latencies or [0.0])
+    return {
+        "examples": n,
+        "accuracy": round(correct / n, 4) if n else 0.0,
+        "threshold": threshold,
+        "coverage": round(confident / n, 4) if n else 0.0,
+        "confident_accuracy": round(confident_correct / confident, 4) if confident else 0.0,
+        "predict_us_p50": round(float(np.percentile(lat, 50)), 1),
+        "predict_us_p99": round(float(np.percentile(lat, 99)), 1),
+    }
+
+
+def _dataset(limit: int) -> Tuple[List[Features], List[str], List[float]]:
+    from core.db import db
+
+    pages = db.fetch_labelled_pages(limit)
+    features, labels, featurize_us = [], [], []
+    for page in reversed(pages):  # oldest first, so the holdout is the newest history
+        started = time.perf_counter()
+        features.append(event_features(page, page["data"]))
+        featurize_us.append((time.perf_counter() - started) * 1e6)
+        labels.append(page["action"])
+    return features, labels, featurize_us
+
+
+def _report(name: str, metrics: Dict[str, Any]) -> None:
+    print(f"{name}: " + ", ".join(f"{k}={v}" for k, v in metrics.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train or evaluate the linear pre-LLM tier.")
+    parser.add_argument("command", choices=("train", "eval"))
+    parser.add_argument("--limit", type=int, default=50000, help="newest labelled pages to use")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--holdout", type=float, default=0.2, help="newest fraction kept for evaluation")
+    parser.add_argument("--min-examples", type=int, default=200)
+    args = parser.parse_args()
+
+    path = resolve_dir()
+    threshold = settings.linear_tier_threshold
+    features, labels, featurize_us = _dataset(args.limit)
+    if featurize_us:
+        print(f"featurize: p50={np.percentile(featurize_us, 50):.1f}us p99={np.percentile(featurize_us, 99):.1f}us")
+    if args.command == "eval":
+        model = LinearModel.load(path)
+        if model is None:
+            raise SystemExit(f"no model at {path}; run `python -m analysis.linear_tier train` first")
+        _report("all history", evaluate(model, features, labels, threshold))
+        return
+    if len(labels) < args.min_examples:
+        raise SystemExit(f"only {len(labels)} labelled pages (need {args.min_examples}); not training")
+    cut = int(len(labels) * (1 - args.holdout))
+    started = time.perf_counter()
+    model = train(features[:cut], labels[:cut], epochs=args.epochs)
+    train_s = time.perf_counter() - started
+    holdout = evaluate(model, features[cut:], labels[cut:], threshold)
+    _report("holdout", holdout)
+    # Ship a model trained on everything; the holdout numbers describe it conservatively.
+    model = train(features, labels, epochs=args.epochs)
+    model.meta = {
+        "trained_at": int(time.time()),
+        "examples": len(labels),
+        "class_counts": {c: labels.count(c) for c in sorted(set(labels))},
+        "train_seconds": round(train_s, 2),
+        "holdout": holdout,
+    }
+    model.save(path)
+    print(f"saved {path} ({len(labels)} examples, classes {model.classes})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Optional
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import httpx
 from pydantic import BaseModel, Field
-# from langchain_community.chat_models import ChatOllama
-from langchain_ollama import ChatOllama
-from langchain.schema import SystemMessage, HumanMessage
+
 from core.config import settings
 from core.db import db
-import logging
-import re
-import json
+from analysis.circuit import breaker_for
+from analysis.judge_batcher import JudgeBatcher
+from analysis.prompt_budget import budget_text
 
 logging.basicConfig(
     level=logging.DEBUG,  # or INFO if you want less
@@ -23,75 +31,523 @@ class JudgeOut(BaseModel):
     action: str          # "allow" | "warn" | "blur" | "block" | "notify"
     confidence: float = Field(default=0.5, ge=0.0, le=1.0)
 
-SYSTEM_PROMPT_TEMPLATE = (
+# The system prompt is identical for every call so Ollama can reuse its KV
+# cache for it; everything that varies (guardian feedback, child profile, page)
+# goes into the user message, least volatile first.
+SYSTEM_PROMPT = (
 "You are a children's online safety classifier running on-device. "
-"Evaluate if the given webpage content is suitable for a child age {age}. "
-"Guardian strictness level is '{strictness}'. Lenient means only block severe harm, "
+"Evaluate if the given webpage content is suitable for the child described in CHILD_PROFILE. "
+"Guardian strictness is lenient, standard or strict. Lenient means only block severe harm, "
 "standard balances caution, strict should warn or block whenever uncertain. "
 "Use every signal provided: URL/domain (e.g., nsfw subdomains), page title/meta tags, "
 "visible text, hyperlinks, scripts/trackers, and OCR summaries of screenshots (if present). "
+"Use URL keywords (nsfw, porn, casino), metadata text, hyperlinks, scripts/trackers, sentiment, "
+"OCR text for images/videos, and tone for slurs/bullying as risk hints. "
 "Flag issues such as adult content, gambling, hate, violence, drugs, self-harm, bullying, "
 "or risky redirects hinted by the metadata. "
 "Be conservative relative to the requested strictness. If unsure, choose 'warn'. "
+"When GUARDIAN_FEEDBACK is given, prioritize it. "
 "Output STRICT JSON with keys: is_harmful (bool), categories (array), "
 "severity (low|medium|high), rationale (<=30 words), action (allow|warn|blur|block|notify), "
 "confidence (0.0-1.0 expressing how certain you are in the requested action)."
 )
 
-def build_human_prompt(page_title: str, domain: str, fast_scores: Dict[str, float], text_sample: str, child_age: int, strictness: str) -> str:
-    # Keep payload compact (cap text to ~2000 chars)
-    text_snippet = (text_sample or "")[:2000]
+
+def prefix_messages() -> List[Dict[str, str]]:
+    """The shared prompt prefix, as sent ahead of every judge request."""
+    return [{"role": "system", "content": SYSTEM_PROMPT}]
+
+
+def _page_block(page_title: str, domain: str, fast_scores: Dict[str, float], text_sample: str, child_age: int, strictness: str) -> str:
+    # Keep payload compact: the most informative sentences within the token budget
+    text_snippet = budget_text(text_sample, title=page_title, domain=domain)
     return (
+        f"CHILD_PROFILE: age={child_age}, strictness={strictness}\n"
         f"PAGE_TITLE: {page_title}\n"
         f"DOMAIN: {domain}\n"
-        f"CHILD_PROFILE: age={child_age}, strictness={strictness}\n"
         f"FAST_SCORES: {fast_scores}\n"
-        "RISK_HINTS: use URL keywords (nsfw, porn, casino), metadata text, hyperlinks, "
-        "scripts/trackers, sentiment, OCR text for images/videos, and tone for slurs/bullying.\n"
-        f"TEXT_SNIPPET:\n{text_snippet}\n\n"
-        "Return STRICT JSON only."
+        f"TEXT_SNIPPET:\n{text_snippet}\n"
     )
 
+
+def _guidance_block(guardian_guidance: Optional[str]) -> str:
+    return f"GUARDIAN_FEEDBACK:\n{guardian_guidance}\n" if guardian_guidance else ""
+
+
+def build_human_prompt(
+    page_title: str,
+    domain: str,
+    fast_scores: Dict[str, float],
+    text_sample: str,
+    child_age: int,
+    strictness: str,
+    guardian_guidance: Optional[str] = None,
+) -> str:
+    return (
+        _guidance_block(guardian_guidance)
+        + _page_block(page_title, domain, fast_scores, text_sample, child_age, strictness)
+        + "\nReturn STRICT JSON only."
+    )
+
+
+def build_delta_prompt(
+    page_title: str,
+    domain: str,
+    previous: Dict[str, Any],
+    new_text: str,
+    child_age: int,
+    strictness: str,
+    guardian_guidance: Optional[str] = None,
+) -> str:
+    """
+    Follow-up prompt for an uncertain verdict: the earlier verdict stands in
+    for the page text it was made from, so only the new evidence is sent.
+    """
+    earlier = {k: previous.get(k) for k in ("action", "severity", "categories", "confidence", "rationale")}
+    evidence = budget_text(new_text, title=page_title, domain=domain)
+    return (
+        _guidance_block(guardian_guidance)
+        + f"CHILD_PROFILE: age={child_age}, strictness={strictness}\n"
+        f"PAGE_TITLE: {page_title}\n"
+        f"DOMAIN: {domain}\n"
+        f"PREVIOUS_VERDICT (from the page text, uncertain): {json.dumps(earlier)}\n"
+        f"NEW_EVIDENCE (OCR text of page screenshots):\n{evidence}\n"
+        "\nRevise the previous verdict in light of the new evidence. Return STRICT JSON only."
+    )
+
+
+@dataclass
+class JudgeRequest:
+    page_title: str
+    domain: str
+    fast_scores: Dict[str, float]
+    text_sample: str
+    child_age: int
+    strictness: str
+
+    def __post_init__(self) -> None:
+        if self.strictness not in {"lenient", "standard", "strict"}:
+            self.strictness = "standard"
+        try:
+            self.child_age = int(self.child_age)
+        except Exception:
+            self.child_age = 12
+        self.child_age = max(3, min(18, self.child_age))
+
+    def prompt(self, guardian_guidance: Optional[str]) -> str:
+        return build_human_prompt(
+            self.page_title, self.domain, self.fast_scores, self.text_sample, self.child_age, self.strictness, guardian_guidance
+        )
+
+
+def build_batch_prompt(requests: List[JudgeRequest], guardian_guidance: Optional[str] = None) -> str:
+    """One user message classifying several pages; each page is judged for its own child."""
+    pages = "\n".join(
+        f"### PAGE id={i}\n"
+        + _page_block(r.page_title, r.domain, r.fast_scores, r.text_sample, r.child_age, r.strictness)
+        for i, r in enumerate(requests, 1)
+    )
+    return (
+        _guidance_block(guardian_guidance)
+        + f"Classify each of the {len(requests)} pages below independently.\n\n"
+        + pages
+        + '\nReturn STRICT JSON only: {"results": [...]} with one object per page, in page order, '
+        'each with "id" (the page id) and the usual keys.'
+    )
+
+
+ACTIONS = ("allow", "warn", "blur", "block", "notify")
+_ACTION_FIELD = re.compile(r'"action"\s*:\s*"([^"\\]*)"')
+
+Messages = List[Dict[str, str]]
+
+
+class JsonStreamScanner:
+    """
+    Follows a JSON object as it is streamed token by token.
+
+    `feed` returns True once the top-level object has closed, so the caller
+    can stop generation instead of waiting for trailing tokens. The `action`
+    field is reported through `on_action` as soon as its value is complete.
+    """
+
+    def __init__(self, on_action: Optional[Callable[[str], None]] = None):
+        self.on_action = on_action
+        self.action: Optional[str] = None
+        self.done = False
+        self._parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> bool:
+        if self.done or not chunk:
+            return self.done
+        end = len(chunk)
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._depth:
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    self.done = True
+                    end = i + 1
+                    break
+        self._parts.append(chunk[:end])
+        if self.action is None:
+            m = _ACTION_FIELD.search(self.text)
+            if m and m.group(1).strip().lower() in ACTIONS:
+                self.action = m.group(1).strip().lower()
+                if self.on_action is not None:
+                    try:
+                        self.on_action(self.action)
+                    except Exception:
+                        logging.getLogger("watchit.llm").exception("on_action callback failed")
+        return self.done
+
+
+class JudgeTimeout(TimeoutError):
+    """An LLM call exceeded its deadline."""
+
+
+class OllamaClient:
+    """
+    Minimal Ollama `/api/chat` transport over pooled keep-alive connections.
+
+    Responses are streamed and parsed incrementally; the request is closed as
+    soon as the JSON answer is complete, which makes Ollama stop generating.
+    The sync client is shared by pipeline threads, the async one belongs to
+    the event loop that first uses it.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None):
+        self.base_url = (base_url or settings.ollama_base_url).rstrip("/")
+        self.model = model or settings.ollama_model
+        self.timeout = httpx.Timeout(settings.ollama_timeout_seconds, connect=5.0)
+        self.limits = httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_connections,
+            keepalive_expiry=300.0,
+        )
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def _sync(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._aclient
+
+    def _body(self, messages: Messages, model: Optional[str], json_mode: bool) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "model": model or self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {"temperature": 0},
+        }
+        if json_mode:
+            body["format"] = "json"
+        return body
+
+    @staticmethod
+    def _consume(line: str, scanner: JsonStreamScanner, free_text: List[str]) -> bool:
+        """Handle one NDJSON line; True when the caller should stop reading."""
+        if not line:
+            return False
+        data = json.loads(line)
+        if data.get("error"):
+            raise RuntimeError(f"Ollama error: {data['error']}")
+        content = (data.get("message") or {}).get("content") or ""
+        free_text.append(content)
+        return scanner.feed(content) or bool(data.get("done"))
+
+    @staticmethod
+    def _result(scanner: JsonStreamScanner, free_text: Iterable[str]) -> str:
+        # Fall back to the whole reply when the model never produced an object.
+        return (scanner.text if scanner.done else "".join(free_text)).strip()
+
+    def _request_timeout(self, timeout_s: Optional[float]) -> httpx.Timeout:
+        if timeout_s is None:
+            return self.timeout
+        return httpx.Timeout(timeout_s, connect=min(5.0, timeout_s))
+
+    def chat(
+        self,
+        messages: Messages,
+        *,
+        model: Optional[str] = None,
+        json_mode: bool = True,
+        on_action: Optional[Callable[[str], None]] = None,
+        timeout_s: Optional[float] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> str:
+        """
+        Stream one reply. `timeout_s` bounds the whole call (JudgeTimeout past
+        it); setting `stop` abandons the request, as used for hedge losers.
+        """
+        scanner = JsonStreamScanner(on_action)
+        free_text: List[str] = []
+        deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+        body = self._body(messages, model, json_mode)
+        with self._sync().stream("POST", "/api/chat", json=body, timeout=self._request_timeout(timeout_s)) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if stop is not None and stop.is_set():
+                    raise JudgeTimeout("request abandoned")
+                if self._consume(line, scanner, free_text):
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise JudgeTimeout(f"no complete reply within {timeout_s:.1f}s")
+        return self._result(scanner, free_text)
+
+    async def achat(
+        self,
+        messages: Messages,
+        *,
+        model: Optional[str] = None,
+        json_mode: bool = True,
+        on_action: Optional[Callable[[str], None]] = None,
+        timeout_s: Optional[float] = None,
+    ) -> str:
+        scanner = JsonStreamScanner(on_action)
+        free_text: List[str] = []
+
+        async def _stream() -> None:
+            body = self._body(messages, model, json_mode)
+            async with self._async().stream("POST", "/api/chat", json=body, timeout=self._request_timeout(timeout_s)) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if self._consume(line, scanner, free_text):
+                        break
+
+        try:
+            await asyncio.wait_for(_stream(), timeout_s)
+        except asyncio.TimeoutError as exc:
+            raise JudgeTimeout(f"no complete reply within {timeout_s:.1f}s") from exc
+        return self._result(scanner, free_text)
+
+    def _prefill_body(self, messages: Messages, model: Optional[str]) -> Dict[str, Any]:
+        body = self._body(messages, model, json_mode=False)
+        body["stream"] = False
+        body["options"]["num_predict"] = 1
+        return body
+
+    @staticmethod
+    def _timings(data: Dict[str, Any]) -> Dict[str, Any]:
+        # Ollama reports durations in nanoseconds; prompt_eval_count excludes cached prefix tokens.
+        return {
+            "prompt_tokens": data.get("prompt_eval_count", 0),
+            "prompt_eval_ms": round((data.get("prompt_eval_duration") or 0) / 1e6, 2),
+            "load_ms": round((data.get("load_duration") or 0) / 1e6, 2),
+            "total_ms": round((data.get("total_duration") or 0) / 1e6, 2),
+        }
+
+    def prefill(self, messages: Messages, *, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Evaluate `messages` and generate a single token: loads the model (pinned
+        for `WATCHIT_OLLAMA_KEEP_ALIVE`) and leaves the prompt in its KV cache.
+        Returns Ollama's prompt timings.
+        """
+        resp = self._sync().post("/api/chat", json=self._prefill_body(messages, model))
+        resp.raise_for_status()
+        return self._timings(resp.json())
+
+    async def aprefill(self, messages: Messages, *, model: Optional[str] = None) -> Dict[str, Any]:
+        resp = await self._async().post("/api/chat", json=self._prefill_body(messages, model))
+        resp.raise_for_status()
+        return self._timings(resp.json())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+        await asyncio.to_thread(self.close)
+
+
+ollama_client = OllamaClient()
+# Runs hedged judge calls; the calling pipeline thread waits on whichever answers first.
+_hedge_pool = ThreadPoolExecutor(max_workers=max(2, settings.pipeline_workers * 2), thread_name_prefix="judge-hedge")
+FALLBACK_BLOCK_SCORE = 0.3
+# Categories of verdicts the judge made up itself because the model gave no usable answer.
+FALLBACK_CATEGORIES = frozenset({"llm_unavailable", "llm_refusal"})
+
+
+def is_fallback_verdict(judge_json: Optional[Dict[str, Any]]) -> bool:
+    """Whether `judge_json` is a stand-in (outage or refusal) rather than a real model verdict."""
+    return bool(FALLBACK_CATEGORIES.intersection((judge_json or {}).get("categories") or ()))
+
+
+@dataclass(frozen=True)
+class JudgeTier:
+    model: str
+    min_confidence: Optional[float] = None  # None for the final tier, which never escalates
+
+
+def judge_tiers() -> List[JudgeTier]:
+    """
+    Cascade order from `WATCHIT_JUDGE_CASCADE` (fast models first, each as
+    `model` or `model@min_confidence`), ending with `WATCHIT_OLLAMA_MODEL`.
+    """
+    tiers: List[JudgeTier] = []
+    for spec in (settings.judge_cascade_models or "").split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        model, _, threshold = spec.rpartition("@") if "@" in spec else (spec, "", "")
+        try:
+            min_confidence = float(threshold) if threshold else settings.judge_cascade_min_confidence
+        except ValueError:
+            model, min_confidence = spec, settings.judge_cascade_min_confidence
+        if model != settings.ollama_model:
+            tiers.append(JudgeTier(model, min_confidence))
+    tiers.append(JudgeTier(settings.ollama_model))
+    return tiers
+
+
 class LLMJudge:
     def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None):
         self.model = model or settings.ollama_model
-        self.client = ChatOllama(
-            model=self.model,
-            base_url=base_url or settings.ollama_base_url,
-            temperature=0,
-        )
+        self.client = OllamaClient(base_url=base_url, model=self.model) if base_url else ollama_client
         self.logger = logging.getLogger("watchit.llm")
         self._guardian_cache: Optional[str] = None
+        self._guardian_text: Optional[str] = None
+        self.breaker = breaker_for(self.model)
+        self.batcher: Optional[JudgeBatcher] = None
+        if settings.judge_batch_window_ms > 0 and settings.judge_batch_max > 1:
+            self.batcher = JudgeBatcher(self._judge_batch, settings.judge_batch_window_ms, settings.judge_batch_max)
 
 
     def _guardian_guidance(self) -> Optional[str]:
         raw = db.get_setting("guardian_feedback")
         if not raw:
             self._guardian_cache = None
+            self._guardian_text = None
             return None
         if raw == self._guardian_cache:
-            try:
-                data = json.loads(raw)
-            except Exception:
-                return raw
-            guidance = data.get("guidance") or ""
-            patterns = data.get("patterns") or []
-            if patterns:
-                guidance = guidance + "\nPatterns: " + "; ".join(patterns[:5])
-            return guidance
+            return self._guardian_text
+        self._guardian_cache = raw
         try:
             data = json.loads(raw)
         except Exception:
-            self._guardian_cache = raw
+            self._guardian_text = raw
             return raw
-        self._guardian_cache = raw
         guidance = data.get("guidance") or ""
         patterns = data.get("patterns") or []
         if patterns:
             guidance = guidance + "\nPatterns: " + "; ".join(patterns[:5])
-        return guidance or None
+        self._guardian_text = guidance or None
+        return self._guardian_text
+
+
+    def _messages(self, request: JudgeRequest) -> Messages:
+        prompt = request.prompt(self._guardian_guidance())
+        return [*prefix_messages(), {"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _fallback(request: JudgeRequest, reason: str) -> Dict[str, Any]:
+        """
+        Deterministic verdict when the model cannot answer (error, timeout or
+        open breaker): strict profiles are held back, others follow the fast
+        keyword scores. Confidence 0 lets later layers know it is a guess.
+        """
+        risky = max(request.fast_scores.values(), default=0.0) >= FALLBACK_BLOCK_SCORE
+        action = "warn" if request.strictness == "strict" and not risky else ("block" if risky else "allow")
+        return {
+            "is_harmful": risky,
+            "categories": ["llm_unavailable"],
+            "severity": "medium" if risky else "low",
+            "rationale": reason[:200],
+            "action": action,
+            "confidence": 0.0,
+            "source": "fallback",
+        }
+
+    def _call(self, msgs: Messages, on_action: Optional[Callable[[str], None]]) -> str:
+        """
+        One guarded model call: bounded by `WATCHIT_JUDGE_TIMEOUT_MS`, recorded
+        on the breaker, and hedged with a duplicate request once it runs past
+        the model's recent p95 (when `WATCHIT_JUDGE_HEDGE` is on).
+        """
+        timeout_s = settings.judge_timeout_ms / 1000
+        started = time.monotonic()
+        hedge_ms = self.breaker.percentile(0.95) if settings.judge_hedge else None
+        try:
+            if hedge_ms is None:
+                raw = self.client.chat(msgs, model=self.model, on_action=on_action, timeout_s=timeout_s)
+            else:
+                raw = self._hedged(msgs, on_action, timeout_s, hedge_ms / 1000)
+        except Exception as e:
+            self.breaker.record((time.monotonic() - started) * 1000, e)
+            raise
+        self.breaker.record((time.monotonic() - started) * 1000)
+        return raw
+
+    def _hedged(self, msgs: Messages, on_action: Optional[Callable[[str], None]], timeout_s: float, hedge_s: float) -> str:
+        started = time.monotonic()
+        stops: List[threading.Event] = []
+
+        def _launch(remaining: float) -> Future:
+            stop = threading.Event()
+            stops.append(stop)
+            return _hedge_pool.submit(
+                self.client.chat, msgs, model=self.model, on_action=on_action, timeout_s=remaining, stop=stop
+            )
+
+        first = _launch(timeout_s)
+        pending = {first}
+        hedged = False
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                remaining = timeout_s - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                wait_s = min(remaining, hedge_s) if not hedged else remaining
+                done, pending = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut.exception() is None:
+                        if hedged and fut is not first:
+                            self.breaker.count("hedge_wins")
+                        return fut.result()
+                    error = fut.exception()
+                if not hedged and not done:
+                    hedged = True
+                    self.breaker.count("hedges")
+                    pending.add(_launch(remaining))
+            if error is not None:
+                raise error
+            raise JudgeTimeout(f"no complete reply within {timeout_s:.1f}s")
+        finally:
+            for stop in stops:
+                stop.set()
 
-    
     def judge(
         self,
         page_title: str,
@@ -100,37 +556,91 @@ class LLMJudge:
         text_sample: str,
         child_age: int,
         strictness: str,
+        on_action: Optional[Callable[[str], None]] = None,
     ) -> Dict[str, Any]:
-        if strictness not in {"lenient", "standard", "strict"}:
-            strictness = "standard"
-        try:
-            child_age = int(child_age)
-        except Exception:
-            child_age = 12
-        child_age = max(3, min(18, child_age))
-        prompt = build_human_prompt(page_title, domain, fast_scores, text_sample, child_age, strictness)
-        system_prompt = SYSTEM_PROMPT_TEMPLATE.format(age=child_age, strictness=strictness)
-        guardian_guidance = self._guardian_guidance()
-        if guardian_guidance:
-            system_prompt += "\nGuardian feedback to prioritize:\n" + guardian_guidance
-        msgs = [SystemMessage(content=system_prompt), HumanMessage(content=prompt)]
-
-        # Send to Ollama
+        """
+        Classify a page. `on_action` receives the model's action as soon as it
+        has been streamed, before the rest of the verdict is generated.
+
+        With micro-batching enabled, requests arriving together are judged in
+        one call (without the early `on_action`); pages the batch could not
+        answer are judged on their own.
+        """
+        request = JudgeRequest(page_title, domain, fast_scores, text_sample, child_age, strictness)
+        if self.batcher is not None:
+            return self.batcher.judge(request, lambda r: self._judge_one(r, on_action))
+        return self._judge_one(request, on_action)
+
+    def _judge_one(self, request: JudgeRequest, on_action: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        if not self.breaker.allow():
+            return self._fallback(request, f"LLM circuit open for {self.model}")
+        msgs = self._messages(request)
         try:
-            resp = self.client.invoke(msgs)
-            raw = resp.content.strip()
+            raw = self._call(msgs, on_action)
             self.logger.debug("Raw LLM response: %s", raw)
         except Exception as e:
-            self.logger.exception("Error calling Ollama LLM")
-            return {
-                "is_harmful": False,
-                "categories": [],
-                "severity": "low",
-                "rationale": f"LLM call failed: {e}",
-                "action": "allow",
-                "confidence": 0.0,
-            }
+            self.logger.warning("Error calling Ollama LLM (%s): %r", self.model, e)
+            return self._fallback(request, f"LLM call failed: {e}")
+        return self._parse(raw)
+
+    def judge_delta(
+        self,
+        page_title: str,
+        domain: str,
+        fast_scores: Dict[str, float],
+        previous: Dict[str, Any],
+        new_text: str,
+        child_age: int,
+        strictness: str,
+    ) -> Dict[str, Any]:
+        """Revise `previous` (this page's earlier verdict) with `new_text` only; see build_delta_prompt."""
+        request = JudgeRequest(page_title, domain, fast_scores, new_text, child_age, strictness)
+        if not self.breaker.allow():
+            return self._fallback(request, f"LLM circuit open for {self.model}")
+        prompt = build_delta_prompt(
+            request.page_title, request.domain, previous, new_text, request.child_age, request.strictness, self._guardian_guidance()
+        )
+        try:
+            raw = self._call([*prefix_messages(), {"role": "user", "content": prompt}], None)
+            self.logger.debug("Raw LLM delta response: %s", raw)
+        except Exception as e:
+            self.logger.warning("Error calling Ollama LLM (%s): %r", self.model, e)
+            return self._fallback(request, f"LLM call failed: {e}")
+        return self._parse(raw)
+
+    def _judge_batch(self, requests: List[JudgeRequest]) -> List[Optional[Dict[str, Any]]]:
+        """Verdicts for `requests` in order; None for any page the reply did not cover validly."""
+        if not self.breaker.allow():
+            return [None] * len(requests)
+        prompt = build_batch_prompt(requests, self._guardian_guidance())
+        try:
+            raw = self._call([*prefix_messages(), {"role": "user", "content": prompt}], None)
+            self.logger.debug("Raw batched LLM response: %s", raw)
+            data = json.loads(raw)
+        except Exception:
+            self.logger.exception("Batched LLM call failed; judging %s pages individually", len(requests))
+            return [None] * len(requests)
+        items = data.get("results") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            self.logger.warning("Batched LLM response has no results array: %s", raw)
+            return [None] * len(requests)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        for pos, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                idx = int(item.get("id", pos + 1)) - 1
+            except (TypeError, ValueError):
+                idx = pos
+            if not 0 <= idx < len(requests) or results[idx] is not None:
+                continue
+            try:
+                results[idx] = JudgeOut(**{k: v for k, v in item.items() if k != "id"}).model_dump()
+            except Exception as e:
+                self.logger.warning("Batched verdict %s failed validation: %s", idx + 1, e)
+        return results
 
+    def _parse(self, raw: str) -> Dict[str, Any]:
         fallback_block = {
             "is_harmful": True,
             "categories": ["llm_refusal"],
@@ -138,6 +648,7 @@ class LLMJudge:
             "rationale": "LLM refused or returned invalid output; treat as unsafe.",
             "action": "block",
             "confidence": 0.2,
+            "source": "fallback",
         }
 
         # Try to parse JSON
@@ -162,3 +673,4 @@ class LLMJudge:
             return result
         except Exception as e:
             self.logger.error("Validation failed: %s. Data: %s", e, data)
+            return fallback_block
@@ -0,0 +1,116 @@
+"""
+Measure how much prompt evaluation the stable judge prompt layout saves.
+
+Replays the same judge requests against Ollama twice: once with the old
+layout (child profile and guardian feedback interpolated into the system
+prompt) and once with the current one (fixed system prompt, variable parts
+last). Each request only generates one token, so the timings are prompt
+evaluation. Run with Ollama up:
+
+    python -m analysis.prompt_bench [--rounds 3] [--model NAME]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+from typing import Any, Callable, Dict, List, Tuple
+
+from analysis.llm_judge import Messages, OllamaClient, build_human_prompt, prefix_messages
+
+LEGACY_SYSTEM_PROMPT = (
+    "You are a children's online safety classifier running on-device. "
+    "Evaluate if the given webpage content is suitable for a child age {age}. "
+    "Guardian strictness level is '{strictness}'. Lenient means only block severe harm, "
+    "standard balances caution, strict should warn or block whenever uncertain. "
+    "Use every signal provided: URL/domain (e.g., nsfw subdomains), page title/meta tags, "
+    "visible text, hyperlinks, scripts/trackers, and OCR summaries of screenshots (if present). "
+    "Flag issues such as adult content, gambling, hate, violence, drugs, self-harm, bullying, "
+    "or risky redirects hinted by the metadata. "
+    "Be conservative relative to the requested strictness. If unsure, choose 'warn'. "
+    "Output STRICT JSON with keys: is_harmful (bool), categories (array), "
+    "severity (low|medium|high), rationale (<=30 words), action (allow|warn|blur|block|notify), "
+    "confidence (0.0-1.0 expressing how certain you are in the requested action)."
+)
+
+PAGES = [
+    ("Fractions made easy - Math practice", "www.khanacademy.org", "Add and subtract fractions with unlike denominators. Practice problems and hints."),
+    ("Top 10 online casinos with instant payout", "bestcasino.example", "Claim your welcome bonus. Slots, roulette and blackjack with real money."),
+    ("Minecraft redstone tutorial", "www.youtube.com", "Build an automatic door with pistons and a pressure plate in survival mode."),
+    ("Celebrity gossip and hot photos", "tabloid.example", "Leaked photos, scandal and rumours from last night's party."),
+]
+CHILDREN = [(8, "strict"), (12, "standard"), (16, "lenient")]
+GUIDANCE = [
+    None,
+    "Guardian allows educational videos and coding sites.\nPatterns: youtube tutorials are fine; block gambling",
+]
+FAST_SCORES = {"adult": 0.02, "gambling": 0.01, "violence": 0.0}
+
+
+def legacy_messages(title: str, domain: str, text: str, age: int, strictness: str, guidance: str | None) -> Messages:
+    system = LEGACY_SYSTEM_PROMPT.format(age=age, strictness=strictness)
+    if guidance:
+        system += "\nGuardian feedback to prioritize:\n" + guidance
+    user = (
+        f"PAGE_TITLE: {title}\n"
+        f"DOMAIN: {domain}\n"
+        f"CHILD_PROFILE: age={age}, strictness={strictness}\n"
+        f"FAST_SCORES: {FAST_SCORES}\n"
+        "RISK_HINTS: use URL keywords (nsfw, porn, casino), metadata text, hyperlinks, "
+        "scripts/trackers, sentiment, OCR text for images/videos, and tone for slurs/bullying.\n"
+        f"TEXT_SNIPPET:\n{text}\n\n"
+        "Return STRICT JSON only."
+    )
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+def stable_messages(title: str, domain: str, text: str, age: int, strictness: str, guidance: str | None) -> Messages:
+    prompt = build_human_prompt(title, domain, FAST_SCORES, text, age, strictness, guidance)
+    return [*prefix_messages(), {"role": "user", "content": prompt}]
+
+
+def workload(rounds: int) -> List[Tuple[str, str, str, int, str, str | None]]:
+    """Children browsing interleaved, with a guardian-feedback update halfway through."""
+    calls = []
+    for r in range(rounds):
+        guidance = GUIDANCE[0] if r < rounds / 2 else GUIDANCE[1]
+        for page in PAGES:
+            for age, strictness in CHILDREN:
+                calls.append((*page, age, strictness, guidance))
+    return calls
+
+
+def run(client: OllamaClient, build: Callable[..., Messages], calls: List[tuple]) -> Dict[str, Any]:
+    # One untimed call so the model is resident before measuring.
+    client.prefill(build(*calls[0]))
+    timings = [client.prefill(build(*call)) for call in calls]
+    eval_ms = [t["prompt_eval_ms"] for t in timings]
+    return {
+        "calls": len(timings),
+        "prompt_tokens": sum(t["prompt_tokens"] for t in timings),
+        "prompt_eval_ms": round(sum(eval_ms), 1),
+        "p50_ms": round(statistics.median(eval_ms), 1),
+        "max_ms": round(max(eval_ms), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+    client = OllamaClient(model=args.model)
+    calls = workload(max(1, args.rounds))
+    results = {"legacy": run(client, legacy_messages, calls), "stable": run(client, stable_messages, calls)}
+    client.close()
+    print(f"{'layout':<8} {'calls':>6} {'tokens evaluated':>17} {'prompt eval ms':>15} {'p50 ms':>8} {'max ms':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['calls']:>6} {r['prompt_tokens']:>17} {r['prompt_eval_ms']:>15} {r['p50_ms']:>8} {r['max_ms']:>8}")
+    legacy, stable = results["legacy"], results["stable"]
+    if legacy["prompt_eval_ms"]:
+        saved = legacy["prompt_eval_ms"] - stable["prompt_eval_ms"]
+        print(f"saved {saved:.1f} ms of prompt evaluation ({saved / legacy['prompt_eval_ms']:.0%}), "
+              f"{legacy['prompt_tokens'] - stable['prompt_tokens']} fewer tokens evaluated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Fit page text into a token budget by keeping its most informative sentences.
+
+Pages open with navigation, cookie banners and footers; the judge needs the
+few sentences that say what the page is about and anything risky. Sentences
+are ranked by risk-lexicon hits and by how much they add over the title,
+URL and sentences already chosen; boilerplate and repeats are dropped.
+
+Compare against plain truncation on our labelled history with
+
+    python -m analysis.prompt_budget [--limit 2000] [--budget 350] [--judge 50]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from analysis.safety import shared_lexicon
+from core.config import settings
+
+log = logging.getLogger("watchit.prompt_budget")
+
+TRUNCATE_CHARS = 2000  # the old fixed cut, also used when budgeting is off
+MAX_SCAN_CHARS = 20_000  # bounds ranking work on very long pages
+RISK_TERMS = (
+    "casino", "gambling", "bet", "betting", "poker", "slots", "escort", "nsfw", "onlyfans", "hentai",
+    "drugs", "cocaine", "weed", "vape", "suicide", "self-harm", "cutting", "kill yourself", "hate",
+    "nazi", "gore", "terror", "bully", "dating", "hookup", "leaked", "crypto",
+)
+BOILERPLATE = re.compile(
+    r"\b(cookies?|accept all|reject all|privacy (policy|settings)|terms (of (use|service)|and conditions)|"
+    r"all rights reserved|sign (in|up)|log ?in|subscribe|newsletter|skip to (main )?content|"
+    r"javascript|enable (js|javascript)|advertisement|sponsored|share (on|this)|follow us)\b|©",
+    re.I,
+)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*|\s*[|•·]\s*")
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PIECE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_RISK = re.compile(r"\b(" + "|".join(re.escape(t) for t in RISK_TERMS) + r")\b", re.I)
+
+TokenCounter = Callable[[str], int]
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    """The judge model's own tokenizer, when `WATCHIT_JUDGE_TOKENIZER` points at one and `tokenizers` is installed."""
+    name = settings.judge_tokenizer
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        log.warning("WATCHIT_JUDGE_TOKENIZER is set but the tokenizers package is missing; estimating tokens")
+        return None
+    try:
+        return Tokenizer.from_file(name) if name.endswith(".json") else Tokenizer.from_pretrained(name)
+    except Exception:
+        log.exception("Could not load tokenizer %s; estimating tokens", name)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    # BPE vocabularies of current chat models average a little over one token per word/punctuation mark.
+    return int(len(_PIECE.findall(text)) * 1.15) + 1
+
+
+def lexicon_hits(text: str) -> int:
+    return shared_lexicon().count(text) + len(_RISK.findall(text))
+
+
+def sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s and s.strip()]
+
+
+def _words(text: str) -> Set[str]:
+    return {w.lower() for w in _WORD.findall(text) if len(w) > 2}
+
+
+def _is_boilerplate(sentence: str, words: Set[str]) -> bool:
+    if len(words) < 3 and not lexicon_hits(sentence):
+        return True  # menu items, button labels, stray numbers
+    return bool(BOILERPLATE.search(sentence)) and not lexicon_hits(sentence)
+
+
+def salient_text(
+    text: str,
+    budget_tokens: int,
+    *,
+    context: Sequence[str] = (),
+    count: TokenCounter = count_tokens,
+) -> str:
+    """
+    The highest-value sentences of `text` that fit in `budget_tokens`, in
+    their original order. `context` (title, URL) counts as already known, so
+    sentences repeating it rank lower.
+    """
+    if not text:
+        return ""
+    text = text[:MAX_SCAN_CHARS]
+    if count(text) <= budget_tokens:
+        return text
+    seen_norm: Set[str] = set()
+    candidates: List[Tuple[int, str, Set[str], int, int]] = []
+    for pos, sentence in enumerate(sentences(text)):
+        norm = " ".join(_WORD.findall(sentence.lower()))
+        if not norm or norm in seen_norm:
+            continue
+        seen_norm.add(norm)
+        words = _words(sentence)
+        if _is_boilerplate(sentence, words):
+            continue
+        candidates.append((pos, sentence, words, lexicon_hits(sentence), count(sentence)))
+
+    known: Set[str] = set()
+    for c in context:
+        known |= _words(c or "")
+    chosen: List[Tuple[int, str]] = []
+    used = 0
+    remaining = candidates
+    # Greedy selection, re-scoring novelty against what is already in the prompt.
+    while remaining:
+        best, best_score = None, 0.0
+        for cand in remaining:
+            pos, sentence, words, hits, tokens = cand
+            if used + tokens > budget_tokens:
+                continue
+            novelty = len(words - known) / len(words) if words else 0.0
+            score = 3.0 * hits + 2.0 * novelty + min(len(words), 25) / 25 + 1.0 / (1 + pos / 10)
+            if score > best_score:
+                best, best_score = cand, score
+        if best is None:
+            break
+        remaining = [c for c in remaining if c is not best]
+        pos, sentence, words, hits, tokens = best
+        if words and not (words - known) and not hits:
+            continue  # adds nothing the prompt does not already say
+        chosen.append((pos, sentence))
+        known |= words
+        used += tokens
+    if not chosen:
+        # Nothing but boilerplate or one unbroken run of text: fall back to its start.
+        return text[: budget_tokens * 4]
+    return "\n".join(s for _, s in sorted(chosen))
+
+
+def budget_text(text: str, *, title: str = "", domain: str = "", budget_tokens: Optional[int] = None) -> str:
+    """Page text for the judge prompt, budgeted by `WATCHIT_JUDGE_TEXT_TOKENS` (0 = plain truncation)."""
+    budget = settings.judge_text_tokens if budget_tokens is None else budget_tokens
+    if budget <= 0:
+        return (text or "")[:TRUNCATE_CHARS]
+    return salient_text(text, budget, context=(title, domain))
+
+
+# --- evaluation --------------------------------------------------------------
+
+
+def _page_text(page: dict) -> str:
+    data = page.get("data") or {}
+    return "\n".join(str(data.get(k) or "") for k in ("dom_sample", "text") if data.get(k))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare budgeted page text against plain truncation.")
+    parser.add_argument("--limit", type=int, default=2000, help="newest labelled pages to use")
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default WATCHIT_JUDGE_TEXT_TOKENS)")
+    parser.add_argument("--judge", type=int, default=0, help="also run the LLM on this many blocked/allowed pages per mode")
+    args = parser.parse_args()
+
+    from core.db import db
+
+    budget = args.budget if args.budget is not None else settings.judge_text_tokens or 350
+    pages = [p for p in db.fetch_labelled_pages(args.limit) if _page_text(p)]
+    if not pages:
+        raise SystemExit("no labelled pages with text")
+    totals = {"truncate": [0, 0], "budget": [0, 0]}  # tokens, lexicon hits kept
+    full_hits = 0
+    for page in pages:
+        text = _page_text(page)
+        full_hits += lexicon_hits(text)
+        for mode, kept in (
+            ("truncate", text[:TRUNCATE_CHARS]),
+            ("budget", salient_text(text, budget, context=(page.get("title") or "", page.get("url") or ""))),
+        ):
+            totals[mode][0] += count_tokens(kept)
+            totals[mode][1] += lexicon_hits(kept)
+    print(f"pages={len(pages)} budget={budget} tokenizer={'model' if _tokenizer() else 'estimate'}")
+    for mode, (tokens, hits) in totals.items():
+        recall = hits / full_hits if full_hits else 1.0
+        print(f"{mode:<9} avg_tokens={tokens / len(pages):.0f} lexicon_recall={recall:.3f}")
+    saved = 1 - totals["budget"][0] / max(1, totals["truncate"][0])
+    print(f"text tokens saved: {saved:.0%}")
+    if args.judge:
+        _judge_recall(pages, budget, args.judge)
+
+
+def _judge_recall(pages: List[dict], budget: int, n: int) -> None:
+    """Agreement of the LLM with the stored labels when fed truncated vs budgeted text."""
+    from analysis.llm_judge import LLMJudge
+
+    judge = LLMJudge()
+    blocked = [p for p in pages if p["action"] != "allow"][:n]
+    allowed = [p for p in pages if p["action"] == "allow"][:n]
+    for mode in ("truncate", "budget"):
+        # The judge budgets page text itself; switch the setting for this offline run.
+        settings.judge_text_tokens = 0 if mode == "truncate" else budget
+        caught = passed = 0
+        for group, target in ((blocked, "block"), (allowed, "allow")):
+            for page in group:
+                verdict = judge.judge(page.get("title") or "", page.get("url") or "", {}, _page_text(page), 12, "standard")
+                hit = (verdict.get("action") != "allow") == (target == "block")
+                if target == "block":
+                    caught += hit
+                else:
+                    passed += hit
+        print(f"{mode:<9} block_recall={caught / max(1, len(blocked)):.3f} allow_precision={passed / max(1, len(allowed)):.3f}")
+
+
+if __name__ == "__main__":
+    main()
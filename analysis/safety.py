@@ -1,23 +1,25 @@
 from __future__ import annotations
-import json, re
+import json
+from functools import lru_cache
 from typing import Dict, Any
+from analysis.lexicon import Lexicon, load_lexicon
+
+@lru_cache(maxsize=1)
+def shared_lexicon() -> Lexicon:
+    """Lexicons of `WATCHIT_LEXICON_DIR`, compiled once per process."""
+    return load_lexicon()
+
 class SafetyAnalyzer:
-    def __init__(self):
-        self.violence = ["kill","shoot","gun","fight","blood","weapon"]
-        self.sexual   = ["sex","porn","nude","xxx","18+","adult only"]
-        self.profanity= ["damn","shit","fuck","bitch"]
-        self.re_v = re.compile(r"\b(" + "|".join(map(re.escape, self.violence)) + r")\b", re.I)
-        self.re_s = re.compile(r"\b(" + "|".join(map(re.escape, self.sexual)) + r")\b", re.I)
-        self.re_p = re.compile(r"\b(" + "|".join(map(re.escape, self.profanity)) + r")\b", re.I)
+    def __init__(self, lexicon: Lexicon | None = None):
+        self.lexicon = lexicon or shared_lexicon()
 
     def analyze_text(self, text: str) -> Dict[str, float]:
         if not text:
-            return {"violence":0.0,"sexual":0.0,"profanity":0.0}
+            return {c: 0.0 for c in self.lexicon.categories}
         words = max(1, len(text.split()))
-        v = len(self.re_v.findall(text)) / words * 5.0
-        s = len(self.re_s.findall(text)) / words * 5.0
-        p = len(self.re_p.findall(text)) / words * 5.0
-        return {"violence": round(min(1.0, v),3), "sexual": round(min(1.0, s),3), "profanity": round(min(1.0, p),3)}
+        # One automaton pass scores every category; weights default to 1 per match.
+        totals = self.lexicon.scan(text)
+        return {c: round(min(1.0, w / words * 5.0), 3) for c, w in totals.items()}
 
     def analyze_event_fast(self, event: Dict[str, Any], extra_text: str = "") -> Dict[str, float]:
         text = ""
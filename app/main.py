@@ -1,16 +1,30 @@
 from __future__ import annotations
 import asyncio
+import base64
+import json
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Literal, Optional
+from typing import Any, Dict, Literal, Optional
 from app.api_models import EventInput
 from core.db import db
 from core.config import settings
-from runtime.bootstrap import process_event, bus, publish_decision_row
+from runtime.bootstrap import process_event, bus, publish_decision_row, admit_event, load_admitted_event
+from runtime.executor import pipeline_executor, PipelineSaturated
+from runtime.verdict_cache import verdict_cache
+from runtime.checkpoints import pipeline_checkpoints
+from runtime.scheduler import tab_scheduler
+from runtime.journal import ingest
 from runtime.guardian_learning import GuardianLearningLoop
+from analysis.llm_judge import ollama_client
+from runtime.retention import RetentionJob
+from runtime.model_warmup import ModelWarmup
+from analysis.graph import url_agent
+from analysis.circuit import all_breakers
+from core.archive import KINDS, archive
 from core import pg
+from core.paging import PageQuery
 
 import logging
 from core.activity_logger import log_service_event, log_service_shutdown
@@ -20,6 +34,10 @@ logger = logging.getLogger("watchit.api")
 app = FastAPI(title="WatchIt Local API", version="0.2.0", description="Local-only parental monitoring with PaddleOCR and predictive blocking")
 _learning_loop: GuardianLearningLoop | None = None
 _learning_task: asyncio.Task | None = None
+_retention_job: RetentionJob | None = None
+_retention_task: asyncio.Task | None = None
+_warmup: ModelWarmup | None = None
+_warmup_task: asyncio.Task | None = None
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -39,6 +57,16 @@ async def _startup():
     if _learning_task is None:
         _learning_loop = GuardianLearningLoop()
         _learning_task = asyncio.create_task(_learning_loop.run_forever())
+    global _retention_job, _retention_task
+    if settings.retention_enabled and _retention_task is None:
+        _retention_job = RetentionJob()
+        _retention_task = asyncio.create_task(_retention_job.run_forever())
+    global _warmup, _warmup_task
+    if settings.ollama_warmup and _warmup_task is None:
+        _warmup = ModelWarmup()
+        _warmup_task = asyncio.create_task(_warmup.run_forever())
+    if settings.ingest_journal:
+        await ingest.start(_process_journaled, admit_event, load_admitted_event)
 
 
 @app.on_event("shutdown")
@@ -52,6 +80,28 @@ async def _shutdown():
         except asyncio.CancelledError:
             pass
         _learning_task = None
+    global _retention_task
+    if _retention_task:
+        _retention_task.cancel()
+        try:
+            await _retention_task
+        except asyncio.CancelledError:
+            pass
+        _retention_task = None
+    global _warmup_task
+    if _warmup_task:
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+        _warmup_task = None
+    if settings.ingest_journal:
+        await ingest.stop()
+    pipeline_executor.shutdown()
+    await ollama_client.aclose()
+    archive.close()
+    db.close()
 
 class PinPayload(BaseModel):
     pin: str
@@ -79,10 +129,21 @@ async def sync_pg_on_demand():
     from runtime.pg_replicator import sync_once_on_demand
     sync_once_on_demand()
 
+async def _process_journaled(event: dict) -> None:
+    # The journal stored the event row before acking; replay=True keeps it from being inserted twice.
+    # The entry is marked done when this returns, so wait for the final decision, not the provisional one.
+    await process_event(event, upgrade=False, replay=True, wait_final=True)
+
 @app.post("/v1/event")
 async def post_event(evt: EventInput):
     try:
+        if settings.ingest_journal:
+            # Ack once the event is durable; the decision follows over SSE.
+            return await ingest.submit(evt.model_dump())
         return await process_event(evt.model_dump(), upgrade=False)
+    except PipelineSaturated as e:
+        logger.warning("Rejected /v1/event: %s", e)
+        raise HTTPException(503, "analysis pipeline busy")
     except Exception:
         logger.exception("Error in /v1/event")
         raise HTTPException(500, "internal error")
@@ -91,35 +152,161 @@ async def post_event(evt: EventInput):
 async def post_event_upgrade(evt: UpgradeInput):
     try:
         return await process_event(evt.model_dump(), upgrade=True)
+    except PipelineSaturated as e:
+        logger.warning("Rejected /v1/event/upgrade: %s", e)
+        raise HTTPException(503, "analysis pipeline busy")
     except Exception:
         logger.exception("Error in /v1/event/upgrade")
         raise HTTPException(500, "internal error")
 
+def _page_query(**params: Any) -> PageQuery:
+    try:
+        return PageQuery.parse(**params)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 @app.get("/v1/events")
-async def get_events(child_id: str | None = None, limit: int = 50):
-    events = None
+async def get_events(
+    child_id: str | None = None,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
+    kind: str | None = None,
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+):
+    page = _page_query(limit=limit, before=before, after=after, child_id=child_id, value=kind, since_ms=since_ms, until_ms=until_ms)
+    result = None
     if settings.pg_dsn:
         await sync_pg_on_demand()
         try:
-            events = pg.fetch_recent_events(child_id, limit)
+            result = pg.fetch_events_page(page)
         except Exception as e:
             logger.warning("Falling back to SQLite for events: %s", e)
-    if events is None:
-        events = db.get_recent_events(child_id, limit)
-    return {"events": events}
+    if result is None:
+        result = db.list_events(page)
+    return result
+
+@app.get("/v1/events/{event_id}/payload")
+async def get_event_payload(event_id: str, screenshots: bool = False):
+    payload = await asyncio.to_thread(db.get_event_payload, event_id)
+    if payload is None:
+        raise HTTPException(404, "event not found")
+    body: Dict[str, Any] = {"event_id": event_id, "payload": payload}
+    if screenshots:
+        shots = await asyncio.to_thread(db.get_event_screenshots, event_id)
+        body["screenshots_b64"] = [base64.b64encode(b).decode("ascii") for b in shots]
+    return body
 
 @app.get("/v1/decisions")
-async def get_decisions(child_id: str | None = None, limit: int = 50):
-    decisions = None
+async def get_decisions(
+    child_id: str | None = None,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
+    action: str | None = None,
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+):
+    page = _page_query(limit=limit, before=before, after=after, child_id=child_id, value=action, since_ms=since_ms, until_ms=until_ms)
+    result = None
     if settings.pg_dsn:
         await sync_pg_on_demand()
         try:
-            decisions = pg.fetch_recent_decisions(child_id, limit)
+            result = pg.fetch_decisions_page(page)
         except Exception as e:
             logger.warning("Falling back to SQLite for decisions: %s", e)
-    if decisions is None:
-        decisions = db.get_recent_decisions(child_id, limit)
-    return {"decisions": decisions}
+    if result is None:
+        result = db.list_decisions(page)
+    return result
+
+@app.get("/v1/llm/breakers")
+async def llm_breakers():
+    return {"breakers": [b.stats() for b in all_breakers()]}
+
+@app.post("/v1/llm/breakers/{model:path}/reset")
+async def reset_llm_breaker(model: str, body: PinPayload):
+    if body.pin != settings.parent_pin:
+        raise HTTPException(403, "Invalid PIN")
+    breaker = next((b for b in all_breakers() if b.name == model), None)
+    if breaker is None:
+        raise HTTPException(404, "unknown model")
+    breaker.reset()
+    return breaker.stats()
+
+@app.get("/v1/pipeline/stats")
+async def pipeline_stats():
+    return {
+        "executor": pipeline_executor.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "checkpoints": pipeline_checkpoints.stats(),
+        "scheduler": tab_scheduler.stats(),
+        "sqlite": db.conns.stats() if db.conns else {},
+        **({"model_warmup": _warmup.stats()} if _warmup else {}),
+        **({"judge_batcher": url_agent.judge.batcher.stats()} if url_agent.judge.batcher else {}),
+        **({"ingest": ingest.stats()} if settings.ingest_journal else {}),
+    }
+
+def _stats_days(days: int) -> int:
+    return max(1, min(days, 366))
+
+@app.get("/v1/stats/daily")
+async def stats_daily(child_id: str | None = None, days: int = 30):
+    return {"days": _stats_days(days), "rows": db.stats_daily(child_id, _stats_days(days))}
+
+@app.get("/v1/stats/categories")
+async def stats_categories(child_id: str | None = None, days: int = 30, action: str | None = None, limit: int = 10):
+    return {"days": _stats_days(days), "rows": db.stats_categories(child_id, _stats_days(days), action, max(1, min(limit, 100)))}
+
+@app.get("/v1/stats/domains")
+async def stats_domains(child_id: str | None = None, days: int = 30, action: str | None = None, limit: int = 10):
+    return {"days": _stats_days(days), "rows": db.stats_domains(child_id, _stats_days(days), action, max(1, min(limit, 100)))}
+
+@app.get("/v1/stats/overrides")
+async def stats_overrides(child_id: str | None = None, days: int = 30):
+    return {"days": _stats_days(days), **db.stats_overrides(child_id, _stats_days(days))}
+
+@app.get("/v1/search")
+async def search_pages(
+    q: str,
+    child_id: str | None = None,
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    if not db.search_enabled:
+        raise HTTPException(503, "full-text search unavailable (SQLite built without FTS5)")
+    limit = max(1, min(limit, 100))
+    results = db.search_pages(q, child_id=child_id, since_ms=since_ms, until_ms=until_ms, limit=limit, offset=max(0, offset))
+    return {"query": q, "results": results}
+
+@app.get("/v1/archive/segments")
+async def archive_segments():
+    return {
+        "segments": await asyncio.to_thread(archive.segments),
+        **({"retention": _retention_job.stats()} if _retention_job else {}),
+    }
+
+@app.get("/v1/archive/export")
+async def archive_export(
+    kind: str | None = None,
+    child_id: str | None = None,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    limit: int | None = None,
+    screenshots: bool = False,
+):
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(400, f"kind must be one of {', '.join(KINDS)}")
+
+    def _lines():
+        for row in archive.query(kind=kind, start_ms=start_ms, end_ms=end_ms, child_id=child_id, limit=limit, screenshots=screenshots):
+            if "screenshots" in row:
+                row["screenshots_b64"] = [base64.b64encode(b).decode("ascii") for b in row.pop("screenshots")]
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
 
 @app.get("/v1/stream/decisions")
 async def stream_decisions():
@@ -140,16 +327,12 @@ async def control_pause(body: PausePayload):
     minutes = body.minutes if body.minutes is not None else 0
     horizon_minutes = minutes if minutes > 0 else 10 * 365 * 24 * 60
     until_ms = int(time.time()*1000 + horizon_minutes*60*1000)
-    cur = db.conn.cursor()
-    cur.execute("INSERT INTO settings(key,value) VALUES('paused_until', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (str(until_ms),))
-    db.conn.commit()
+    db.set_setting("paused_until", str(until_ms))
     return {"ok": True, "paused_until": until_ms}
 
 @app.post("/v1/control/resume")
 async def control_resume(body: ResumePayload):
-    cur = db.conn.cursor()
-    cur.execute("DELETE FROM settings WHERE key='paused_until'")
-    db.conn.commit()
+    db.delete_setting("paused_until")
     return {"ok": True}
 
 @app.get("/v1/children")
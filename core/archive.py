@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from pysqlcipher3 import dbapi2 as sqlcipher
+
+from . import payloads
+from .config import settings
+from .connections import KDF_ITER, derive_raw_key, read_salt
+from .db import db
+
+log = logging.getLogger("watchit.archive")
+_BASE_DIR = Path(__file__).resolve().parent.parent
+
+SEGMENT_SUFFIX = ".seg"
+KINDS = ("event", "decision", "analysis")
+
+
+def _resolve_dir() -> Path:
+    raw = Path(settings.archive_dir).expanduser()
+    path = raw if raw.is_absolute() else _BASE_DIR / raw
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def segment_name(ts_ms: Optional[int]) -> str:
+    """Monthly partition (UTC) an event timestamp belongs to."""
+    when = datetime.fromtimestamp((ts_ms or 0) / 1000, tz=timezone.utc)
+    return when.strftime("%Y-%m")
+
+
+def _month_bounds(name: str) -> tuple[int, int]:
+    start = datetime.strptime(name, "%Y-%m").replace(tzinfo=timezone.utc)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+class ArchiveStore:
+    """
+    Time-partitioned archive of history pruned from the live database.
+
+    Each calendar month is one SQLCipher file keyed with `WATCHIT_DB_KEY`.
+    Rows are stored as compressed JSON records indexed by kind, time and
+    child, so a month can be queried or exported without restoring it.
+    Writes are idempotent: re-archiving a row replaces its record.
+    """
+
+    def __init__(self, root: Optional[Path] = None, passphrase: Optional[str] = None, max_open: int = 4):
+        self._root = root
+        self.passphrase = passphrase if passphrase is not None else settings.db_key
+        self.max_open = max_open
+        self._conns: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = _resolve_dir()
+        return self._root
+
+    def _raw_key(self, path: Path) -> Optional[str]:
+        """
+        Hex key for a segment that skips PBKDF2: new segments take the live
+        database's salt and already-derived key, older ones are derived once
+        per process. None when the live database has no raw key to share.
+        """
+        conns = db.conns
+        if conns is None or conns.passphrase != self.passphrase or conns.cipher_major is None:
+            return None
+        salt = read_salt(str(path))
+        if salt is None:
+            return conns.raw_key_with_salt()
+        return derive_raw_key(self.passphrase, salt, conns.cipher_major)
+
+    def _open(self, path: Path, raw_key: Optional[str]) -> Any:
+        conn = sqlcipher.connect(str(path), check_same_thread=False, isolation_level=None)
+        cur = conn.cursor()
+        if raw_key:
+            cur.execute(f"PRAGMA key = \"x'{raw_key}'\";")
+        else:
+            escaped = self.passphrase.replace("'", "''")
+            cur.execute(f"PRAGMA key = '{escaped}';")
+            cur.execute(f"PRAGMA kdf_iter = {KDF_ITER};")
+        cur.execute("PRAGMA cipher_memory_security = ON;")
+        try:
+            cur.execute("SELECT count(*) FROM sqlite_master")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self, name: str) -> Any:
+        conn = self._conns.get(name)
+        if conn is not None:
+            self._conns.move_to_end(name)
+            return conn
+        path = self.root / f"{name}{SEGMENT_SUFFIX}"
+        raw_key = self._raw_key(path)
+        try:
+            conn = self._open(path, raw_key)
+        except sqlcipher.DatabaseError:
+            if not raw_key:
+                raise
+            log.warning("Raw key rejected for archive segment %s; using the passphrase", name)
+            conn = self._open(path, None)
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS record(
+              kind TEXT NOT NULL,
+              id TEXT NOT NULL,
+              event_id TEXT,
+              child_id TEXT,
+              ts INTEGER,
+              codec TEXT NOT NULL,
+              data BLOB NOT NULL,
+              PRIMARY KEY(kind, id)
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_record_ts ON record(ts)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_record_child_ts ON record(child_id, ts)")
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS screenshot(event_id TEXT NOT NULL, idx INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY(event_id, idx))"
+        )
+        self._conns[name] = conn
+        while len(self._conns) > self.max_open:
+            _, old = self._conns.popitem(last=False)
+            old.close()
+        return conn
+
+    @staticmethod
+    def _record(kind: str, row: Dict[str, Any], event: Dict[str, Any]) -> tuple:
+        blob = payloads.encode(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+        return (kind, row["id"], event["id"], event.get("child_id"), event.get("ts"), blob.codec, blob.data)
+
+    def _insert(self, name: str, records: List[tuple], screenshots: List[tuple]) -> None:
+        conn = self._connect(name)
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(
+                "INSERT OR REPLACE INTO record(kind, id, event_id, child_id, ts, codec, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            if screenshots:
+                cur.executemany("INSERT OR REPLACE INTO screenshot(event_id, idx, data) VALUES (?, ?, ?)", screenshots)
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def write_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Archive events from `Database.fetch_events_for_archive` (with their decisions/analyses)."""
+        groups: Dict[str, tuple[List[tuple], List[tuple]]] = {}
+        count = 0
+        for event in events:
+            records, shots = groups.setdefault(segment_name(event.get("ts")), ([], []))
+            row = {k: v for k, v in event.items() if k not in ("decisions", "analyses", "screenshots")}
+            records.append(self._record("event", row, event))
+            records.extend(self._record("decision", d, event) for d in event.get("decisions", []))
+            records.extend(self._record("analysis", a, event) for a in event.get("analyses", []))
+            shots.extend((event["id"], idx, data) for idx, data in enumerate(event.get("screenshots") or []) if data)
+            count += 1
+        with self._lock:
+            for name, (records, shots) in groups.items():
+                self._insert(name, records, shots)
+        return count
+
+    def write_analyses(self, analyses: Iterable[Dict[str, Any]]) -> int:
+        """Archive analysis rows on their own (from `Database.fetch_analyses_for_archive`)."""
+        groups: Dict[str, List[tuple]] = {}
+        count = 0
+        for row in analyses:
+            event = {"id": row["event_id"], "child_id": row.get("child_id"), "ts": row.get("ts")}
+            groups.setdefault(segment_name(row.get("ts")), []).append(self._record("analysis", row, event))
+            count += 1
+        with self._lock:
+            for name, records in groups.items():
+                self._insert(name, records, [])
+        return count
+
+    def segments(self) -> List[Dict[str, Any]]:
+        out = []
+        for path in sorted(self.root.glob(f"*{SEGMENT_SUFFIX}")):
+            out.append({"segment": path.stem, "bytes": path.stat().st_size})
+        return out
+
+    def query(
+        self,
+        *,
+        kind: Optional[str] = None,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        child_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        screenshots: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield archived rows in time order, each tagged with its `kind`."""
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind=?")
+            params.append(kind)
+        if start_ms is not None:
+            clauses.append("ts >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append("ts < ?")
+            params.append(end_ms)
+        if child_id:
+            clauses.append("child_id=?")
+            params.append(child_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        remaining = limit
+        for seg in self.segments():
+            lo, hi = _month_bounds(seg["segment"])
+            if (start_ms is not None and hi <= start_ms) or (end_ms is not None and lo >= end_ms):
+                continue
+            with self._lock:
+                conn = self._connect(seg["segment"])
+                sql = f"SELECT kind, codec, data FROM record {where} ORDER BY ts, kind DESC"
+                if remaining is not None:
+                    rows = conn.execute(sql + " LIMIT ?", tuple(params) + (remaining,)).fetchall()
+                else:
+                    rows = conn.execute(sql, tuple(params)).fetchall()
+                decoded = []
+                for kind_, codec, data in rows:
+                    row = json.loads(payloads.decode(codec, data))
+                    row["kind"] = kind_
+                    if screenshots and kind_ == "event":
+                        row["screenshots"] = [
+                            bytes(r[0]) for r in conn.execute(
+                                "SELECT data FROM screenshot WHERE event_id=? ORDER BY idx", (row["id"],)
+                            ).fetchall()
+                        ]
+                    decoded.append(row)
+            yield from decoded
+            if remaining is not None:
+                remaining -= len(rows)
+                if remaining <= 0:
+                    return
+
+    def close(self) -> None:
+        with self._lock:
+            while self._conns:
+                _, conn = self._conns.popitem()
+                conn.close()
+
+
+archive = ArchiveStore()
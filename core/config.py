@@ -5,6 +5,8 @@ class Settings(BaseSettings):
     # DB
     db_path: str = Field(default="child_monitor.db", alias="WATCHIT_DB_PATH")
     db_key: str = Field(default="change_this_strong_key", alias="WATCHIT_DB_KEY")
+    db_readers: int = Field(default=4, alias="WATCHIT_DB_READERS")
+    db_reader_timeout: float = Field(default=10.0, alias="WATCHIT_DB_READER_TIMEOUT")
 
     # Policy
     policy_version: str = Field(default="1.0.0", alias="WATCHIT_POLICY_VERSION")
@@ -20,6 +22,28 @@ class Settings(BaseSettings):
     # Ollama
     ollama_model: str = Field(default="qwen2.5:7b-instruct-q4_K_M", alias="WATCHIT_OLLAMA_MODEL")
     ollama_base_url: str = Field(default="http://localhost:11434", alias="WATCHIT_OLLAMA_BASE_URL")
+    ollama_timeout_seconds: float = Field(default=60.0, alias="WATCHIT_OLLAMA_TIMEOUT")
+    ollama_max_connections: int = Field(default=8, alias="WATCHIT_OLLAMA_MAX_CONNECTIONS")
+    ollama_keep_alive: str = Field(default="30m", alias="WATCHIT_OLLAMA_KEEP_ALIVE")
+    ollama_warmup: bool = Field(default=True, alias="WATCHIT_OLLAMA_WARMUP")
+    ollama_warmup_interval_seconds: float = Field(default=240.0, alias="WATCHIT_OLLAMA_WARMUP_INTERVAL")
+    judge_timeout_ms: int = Field(default=20000, alias="WATCHIT_JUDGE_TIMEOUT_MS")
+    judge_breaker_failures: int = Field(default=3, alias="WATCHIT_JUDGE_BREAKER_FAILURES")
+    judge_breaker_slow_ms: float = Field(default=15000, alias="WATCHIT_JUDGE_BREAKER_SLOW_MS")
+    judge_breaker_cooldown_seconds: float = Field(default=30.0, alias="WATCHIT_JUDGE_BREAKER_COOLDOWN")
+    judge_hedge: bool = Field(default=False, alias="WATCHIT_JUDGE_HEDGE")
+    judge_delta_prompt: bool = Field(default=True, alias="WATCHIT_JUDGE_DELTA_PROMPT")
+    judge_text_tokens: int = Field(default=350, alias="WATCHIT_JUDGE_TEXT_TOKENS")
+    judge_tokenizer: str = Field(default="", alias="WATCHIT_JUDGE_TOKENIZER")
+    judge_batch_window_ms: float = Field(default=0.0, alias="WATCHIT_JUDGE_BATCH_WINDOW_MS")
+    judge_batch_max: int = Field(default=4, alias="WATCHIT_JUDGE_BATCH_MAX")
+    linear_tier_enabled: bool = Field(default=True, alias="WATCHIT_LINEAR_TIER")
+    linear_tier_path: str = Field(default="models/linear_tier", alias="WATCHIT_LINEAR_TIER_PATH")
+    linear_tier_threshold: float = Field(default=0.97, alias="WATCHIT_LINEAR_TIER_THRESHOLD")
+    judge_cascade_models: str = Field(default="", alias="WATCHIT_JUDGE_CASCADE")
+    judge_cascade_min_confidence: float = Field(default=0.8, alias="WATCHIT_JUDGE_CASCADE_MIN_CONFIDENCE")
+    judge_cascade_escalate_severity: str = Field(default="high", alias="WATCHIT_JUDGE_CASCADE_ESCALATE_SEVERITY")
+    judge_cascade_escalate_categories: str = Field(default="self-harm,self_harm,sexual,drugs", alias="WATCHIT_JUDGE_CASCADE_ESCALATE_CATEGORIES")
 
     # Server
     bind_host: str = Field(default="127.0.0.1", alias="WATCHIT_BIND_HOST")
@@ -31,9 +55,45 @@ class Settings(BaseSettings):
     # Features
     enable_ocr: bool = Field(default=True, alias="WATCHIT_ENABLE_OCR")
     ocr_confidence_threshold: float = Field(default=0.7, alias="WATCHIT_OCR_CONFIDENCE_THRESHOLD")
+    speculative_ocr: bool = Field(default=True, alias="WATCHIT_SPECULATIVE_OCR")
+    lexicon_dir: str = Field(default="lexicons", alias="WATCHIT_LEXICON_DIR")
     save_screenshots: bool = Field(default=False, alias="WATCHIT_SAVE_SCREENSHOTS")
     screenshots_dir: str = Field(default="screenshots", alias="WATCHIT_SCREENSHOT_DIR")
 
+    # Pipeline execution
+    pipeline_workers: int = Field(default=2, alias="WATCHIT_PIPELINE_WORKERS")
+    pipeline_max_queue: int = Field(default=32, alias="WATCHIT_PIPELINE_MAX_QUEUE")
+    decision_deadline_ms: int = Field(default=0, alias="WATCHIT_DECISION_DEADLINE_MS")
+
+    # Ingest journal
+    ingest_journal: bool = Field(default=False, alias="WATCHIT_INGEST_JOURNAL")
+    ingest_journal_path: str = Field(default="journal/ingest.log", alias="WATCHIT_INGEST_JOURNAL_PATH")
+    ingest_journal_flush_ms: float = Field(default=2.0, alias="WATCHIT_INGEST_JOURNAL_FLUSH_MS")
+    ingest_journal_compact_bytes: int = Field(default=8 * 1024 * 1024, alias="WATCHIT_INGEST_JOURNAL_COMPACT_BYTES")
+    ingest_workers: int = Field(default=4, alias="WATCHIT_INGEST_WORKERS")
+    ingest_max_queue: int = Field(default=256, alias="WATCHIT_INGEST_MAX_QUEUE")
+
+    # Verdict cache
+    verdict_cache_enabled: bool = Field(default=True, alias="WATCHIT_VERDICT_CACHE")
+    verdict_cache_ttl_seconds: float = Field(default=6 * 3600, alias="WATCHIT_VERDICT_CACHE_TTL")
+    verdict_cache_max_entries: int = Field(default=2048, alias="WATCHIT_VERDICT_CACHE_SIZE")
+    verdict_cache_max_disk_entries: int = Field(default=50000, alias="WATCHIT_VERDICT_CACHE_DISK_SIZE")
+    verdict_cache_persist: bool = Field(default=True, alias="WATCHIT_VERDICT_CACHE_PERSIST")
+    pipeline_checkpoints: bool = Field(default=True, alias="WATCHIT_PIPELINE_CHECKPOINTS")
+    pipeline_checkpoint_ttl_seconds: float = Field(default=1800, alias="WATCHIT_PIPELINE_CHECKPOINT_TTL")
+
+    # Retention / archive
+    retention_enabled: bool = Field(default=False, alias="WATCHIT_RETENTION")
+    retention_event_days: int = Field(default=180, alias="WATCHIT_RETENTION_EVENT_DAYS")
+    retention_analysis_days: int = Field(default=0, alias="WATCHIT_RETENTION_ANALYSIS_DAYS")
+    retention_max_events: int = Field(default=0, alias="WATCHIT_RETENTION_MAX_EVENTS")
+    retention_interval_seconds: float = Field(default=3600.0, alias="WATCHIT_RETENTION_INTERVAL")
+    retention_batch: int = Field(default=200, alias="WATCHIT_RETENTION_BATCH")
+    retention_max_write_ms: float = Field(default=5.0, alias="WATCHIT_RETENTION_MAX_WRITE_MS")
+    retention_max_batches: int = Field(default=500, alias="WATCHIT_RETENTION_MAX_BATCHES")
+    retention_pause_ms: float = Field(default=20.0, alias="WATCHIT_RETENTION_PAUSE_MS")
+    archive_dir: str = Field(default="archive", alias="WATCHIT_ARCHIVE_DIR")
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
 
 settings = Settings()
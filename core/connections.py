@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from pysqlcipher3 import dbapi2 as sqlcipher
+
+KDF_ITER = 256000
+SALT_BYTES = 16
+
+WriteFn = Callable[[Any], Any]
+
+
+class ReadersBusy(TimeoutError):
+    """No read connection became free within the reader timeout."""
+
+log = logging.getLogger("watchit.sqlite.connections")
+
+
+def read_salt(path: str) -> Optional[bytes]:
+    """The KDF salt in an SQLCipher file's header, or None when the file has none yet."""
+    try:
+        with open(path, "rb") as fh:
+            salt = fh.read(SALT_BYTES)
+    except OSError:
+        return None
+    return salt if len(salt) == SALT_BYTES else None
+
+
+@lru_cache(maxsize=64)
+def derive_raw_key(passphrase: str, salt: bytes, cipher_major: int) -> str:
+    """SQLCipher's PBKDF2 page key for `salt`, as hex; each salt is derived once per process."""
+    digest = "sha512" if cipher_major >= 4 else "sha1"
+    return hashlib.pbkdf2_hmac(digest, passphrase.encode("utf-8"), salt, KDF_ITER, 32).hex().upper()
+
+
+class ConnectionManager:
+    """
+    SQLCipher connection layout for one database file.
+
+    * One writer connection, owned by a dedicated thread. Callers submit write
+      jobs to its queue; the thread runs whatever jobs are waiting as one
+      transaction (each job in its own savepoint) and commits once.
+    * A small pool of read-only connections for queries, usable from any thread.
+      WAL mode lets them read concurrently with the writer.
+    * The passphrase goes through PBKDF2 once. Later connections are keyed with
+      the derived raw key. If the raw key cannot be verified, they fall back to
+      the passphrase.
+    """
+
+    def __init__(self, db_path: str, passphrase: str, readers: int = 4, batch_limit: int = 64, reader_timeout: float = 10.0):
+        self.db_path = db_path
+        self.passphrase = passphrase
+        self.reader_count = max(1, readers)
+        self.reader_timeout = reader_timeout
+        self.batch_limit = max(1, batch_limit)
+        self._raw_key: Optional[str] = None
+        self._salt: Optional[bytes] = None
+        self.cipher_major: Optional[int] = None
+        self._jobs: "queue.Queue[Optional[Tuple[WriteFn, Future, bool]]]" = queue.Queue()
+        self._readers: "queue.Queue[Any]" = queue.Queue()
+        self._all_readers: List[Any] = []
+        self._writer: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self.commits = 0
+        self.jobs = 0
+
+    # --- connection setup -------------------------------------------------
+
+    def _apply_key(self, conn: Any) -> None:
+        cur = conn.cursor()
+        if self._raw_key:
+            cur.execute(f"PRAGMA key = \"x'{self._raw_key}'\";")
+        else:
+            escaped = self.passphrase.replace("'", "''")
+            cur.execute(f"PRAGMA key = '{escaped}';")
+            cur.execute(f"PRAGMA kdf_iter = {KDF_ITER};")
+        cur.execute("PRAGMA cipher_memory_security = ON;")
+        cur.execute("PRAGMA foreign_keys = ON;")
+
+    def _open(self, *, readonly: bool) -> Any:
+        conn = sqlcipher.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._apply_key(conn)
+        cur = conn.cursor()
+        if readonly:
+            cur.execute("PRAGMA query_only = ON;")
+        else:
+            cur.execute("PRAGMA journal_mode = WAL;")
+            cur.execute("PRAGMA synchronous = NORMAL;")
+        cur.execute("PRAGMA busy_timeout = 5000;")
+        cur.execute("SELECT count(*) FROM sqlite_master")
+        return conn
+
+    def _derive_raw_key(self, conn: Any) -> None:
+        """Derive the page key once so further connections skip PBKDF2."""
+        salt = read_salt(self.db_path)
+        try:
+            row = conn.cursor().execute("PRAGMA cipher_version").fetchone()
+            version = (row[0] if row else "") or ""
+        except Exception:
+            return
+        if salt is None or not version:
+            return
+        try:
+            major = int(version.split(".")[0])
+        except ValueError:
+            return
+        self._raw_key = derive_raw_key(self.passphrase, salt, major)
+        try:
+            probe = self._open(readonly=True)
+            probe.close()
+        except Exception:
+            log.warning("Raw SQLCipher key rejected; new connections will use the passphrase")
+            self._raw_key = None
+            return
+        self._salt, self.cipher_major = salt, major
+
+    def raw_key_with_salt(self) -> Optional[str]:
+        """
+        The derived key followed by this database's salt, in the hex form SQLCipher
+        accepts for `PRAGMA key`. A new file keyed with it takes over the salt,
+        so its key is the one already derived here (and the passphrase still opens it).
+        """
+        if self._raw_key is None or self._salt is None:
+            return None
+        return self._raw_key + self._salt.hex().upper()
+
+    # --- lifecycle --------------------------------------------------------
+
+    def start(self) -> None:
+        if self._writer is not None:
+            return
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._writer = threading.Thread(target=self._writer_loop, name="watchit-sqlite-writer", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def open_readers(self) -> None:
+        """Open the read pool; call once the file has a header (i.e. after the schema exists)."""
+        if self._all_readers:
+            return
+        self.write(self._derive_raw_key, transactional=False)
+        for _ in range(self.reader_count):
+            conn = self._open(readonly=True)
+            self._all_readers.append(conn)
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._jobs.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+        while self._all_readers:
+            try:
+                self._all_readers.pop().close()
+            except Exception:
+                pass
+
+    # --- writer -----------------------------------------------------------
+
+    def _writer_loop(self) -> None:
+        try:
+            conn = self._open(readonly=False)
+        except BaseException as exc:
+            self._start_error = exc
+            self._ready.set()
+            return
+        self._ready.set()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            stop = False
+            while len(batch) < self.batch_limit:
+                try:
+                    nxt = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._run_batch(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    def _run_batch(self, conn: Any, batch: List[Tuple[WriteFn, Future, bool]]) -> None:
+        cur = conn.cursor()
+        try:
+            self._run_jobs(conn, cur, batch)
+        except BaseException as exc:
+            # BEGIN/SAVEPOINT/RELEASE failed: undo whatever is open and fail every
+            # caller still waiting, but keep the writer thread alive.
+            log.exception("Write batch of %s jobs failed", len(batch))
+            try:
+                cur.execute("ROLLBACK")
+            except Exception:
+                pass
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+
+    def _run_jobs(self, conn: Any, cur: Any, batch: List[Tuple[WriteFn, Future, bool]]) -> None:
+        results: List[Tuple[Future, bool, Any]] = []
+        in_txn = False
+        for fn, fut, transactional in batch:
+            if not fut.set_running_or_notify_cancel():
+                continue
+            if not transactional:
+                # Schema scripts manage their own transactions.
+                if in_txn:
+                    self._commit(cur, results)
+                    results, in_txn = [], False
+                try:
+                    fut.set_result(fn(conn))
+                except BaseException as exc:
+                    fut.set_exception(exc)
+                continue
+            if not in_txn:
+                cur.execute("BEGIN IMMEDIATE")
+                in_txn = True
+            cur.execute("SAVEPOINT job")
+            try:
+                value = fn(conn)
+                cur.execute("RELEASE job")
+                results.append((fut, True, value))
+            except BaseException as exc:
+                cur.execute("ROLLBACK TO job")
+                cur.execute("RELEASE job")
+                results.append((fut, False, exc))
+        if in_txn:
+            self._commit(cur, results)
+
+    def _commit(self, cur: Any, results: List[Tuple[Future, bool, Any]]) -> None:
+        try:
+            cur.execute("COMMIT")
+        except BaseException as exc:
+            try:
+                cur.execute("ROLLBACK")
+            except Exception:
+                pass
+            for fut, _, _ in results:
+                fut.set_exception(exc)
+            return
+        self.commits += 1
+        self.jobs += len(results)
+        for fut, ok, value in results:
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._writer
+
+    def submit(self, fn: WriteFn, *, transactional: bool = True) -> Future:
+        fut: Future = Future()
+        self._jobs.put((fn, fut, transactional))
+        return fut
+
+    def write(self, fn: WriteFn, *, transactional: bool = True) -> Any:
+        """Run `fn(conn)` on the writer thread and wait until it is committed."""
+        if self.on_writer_thread():
+            raise RuntimeError("write() called from inside a write job")
+        return self.submit(fn, transactional=transactional).result()
+
+    # --- readers ----------------------------------------------------------
+
+    @contextmanager
+    def reader(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Borrow a read connection, waiting at most `timeout` (default `reader_timeout`) seconds for one."""
+        wait = self.reader_timeout if timeout is None else timeout
+        try:
+            conn = self._readers.get(timeout=wait if wait and wait > 0 else None)
+        except queue.Empty:
+            raise ReadersBusy(f"no SQLite reader free after {wait:.1f}s ({self.reader_count} in pool)") from None
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def stats(self) -> dict:
+        return {
+            "readers": self.reader_count,
+            "idle_readers": self._readers.qsize(),
+            "queued_writes": self._jobs.qsize(),
+            "commits": self.commits,
+            "write_jobs": self.jobs,
+            "raw_key": self._raw_key is not None,
+        }
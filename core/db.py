@@ -1,12 +1,17 @@
 from __future__ import annotations
-import os, json, uuid, time
-from typing import Any, Dict, Optional, List, Tuple
+import base64, json, uuid, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, List, Tuple
 import logging
 from pathlib import Path
 from datetime import datetime
 import re
-from pysqlcipher3 import dbapi2 as sqlcipher
 from .config import settings
+from .connections import ConnectionManager
+from .migrations import LATEST_VERSION, migrate
+from . import payloads, rollups, search
+from .paging import PageQuery
 
 LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
 SQLITE_LOG_DIR = LOG_DIR / "sqlite_logs"
@@ -42,119 +47,153 @@ def _get_sqlite_logger() -> logging.Logger:
     return logger
 
 
+WriteOp = Callable[[Any], Any]
+
+# Analysis rows under this model carry OCR text in scores["text"]; it is indexed for search.
+OCR_ANALYSIS_MODEL = "ocr"
+
+# Listing columns; the payload itself is fetched on demand (get_event_payload).
+EVENT_COLUMNS = "id, child_id, ts, kind, url, title, tab_id, referrer, payload_hash, screenshot_count"
+
+# Writes issued inside `Database.unit_of_work()` in the current task/thread.
+_pending_writes: ContextVar[Optional[List[WriteOp]]] = ContextVar("watchit_pending_writes", default=None)
+
+
+def _rows_to_dicts(cur) -> List[Dict[str, Any]]:
+    cols = [c[0] for c in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def _decode_details(data: Dict[str, Any]) -> Dict[str, Any]:
+    if data.get("details_json"):
+        try:
+            data["details_json"] = json.loads(data["details_json"])
+        except Exception:
+            data["details_json"] = {}
+    return data
+
+
 class Database:
     def __init__(self, db_path: Optional[str] = None):
         self.db_path = db_path or settings.db_path
-        self.conn: Optional[sqlcipher.Connection] = None
+        self.conns: Optional[ConnectionManager] = None
         self.logger = _get_sqlite_logger()
+        # Read-through caches for the small, hot settings/profile tables. Every
+        # write to those tables goes through this class and updates them, so
+        # they are authoritative within this process.
+        self._settings_cache: Dict[str, Optional[str]] = {}
+        self._profile_cache: Dict[str, Dict[str, Any]] = {}
+        self.search_enabled = False
 
     def connect(self):
-        if self.conn:
+        if self.conns:
             return
-        if os.path.dirname(self.db_path):
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self.conn = sqlcipher.connect(self.db_path, check_same_thread=False)
-        cur = self.conn.cursor()
-        cur.execute(f"PRAGMA key = '{settings.db_key}';")
-        cur.execute("PRAGMA foreign_keys = ON;")
-        cur.execute("PRAGMA cipher_memory_security = ON;")
-        cur.execute("PRAGMA kdf_iter = 256000;")
-        self.conn.commit()
-        self.logger.info("Connected to SQLite DB at %s", self.db_path)
+        self.conns = ConnectionManager(
+            self.db_path, settings.db_key, readers=settings.db_readers, reader_timeout=settings.db_reader_timeout
+        )
+        self.conns.start()
+        self.logger.info("Connected to SQLite DB at %s (WAL, dedicated writer)", self.db_path)
+
+    def close(self) -> None:
+        if self.conns:
+            self.conns.close()
+            self.conns = None
 
     def init_schema(self):
-        cur = self.conn.cursor()
-        cur.executescript("""
-        CREATE TABLE IF NOT EXISTS child_profile(
-          id TEXT PRIMARY KEY,
-          name TEXT,
-          os_user TEXT,
-          timezone TEXT,
-          strictness TEXT DEFAULT 'standard',
-          age INTEGER DEFAULT 12,
-          created_at INTEGER
-        );
-        CREATE TABLE IF NOT EXISTS event(
-          id TEXT PRIMARY KEY,
-          child_id TEXT,
-          ts INTEGER,
-          kind TEXT,
-          url TEXT,
-          title TEXT,
-          tab_id TEXT,
-          referrer TEXT,
-          data_json TEXT,
-          FOREIGN KEY(child_id) REFERENCES child_profile(id)
-        );
-        CREATE TABLE IF NOT EXISTS analysis(
-          id TEXT PRIMARY KEY,
-          event_id TEXT,
-          model TEXT,
-          version TEXT,
-          scores_json TEXT,
-          label TEXT,
-          latency_ms INTEGER,
-          FOREIGN KEY(event_id) REFERENCES event(id)
-        );
-        CREATE TABLE IF NOT EXISTS decision(
-          id TEXT PRIMARY KEY,
-          event_id TEXT,
-          policy_version TEXT,
-          action TEXT,
-          reason TEXT,
-          details_json TEXT,
-          original_action TEXT,
-          manual_action TEXT,
-          manual_flagged INTEGER DEFAULT 0,
-          manual_processed INTEGER DEFAULT 0,
-          manual_updated_at INTEGER,
-          FOREIGN KEY(event_id) REFERENCES event(id)
-        );
-        CREATE TABLE IF NOT EXISTS settings(
-          key TEXT PRIMARY KEY,
-          value TEXT
-        );
-        """)
-        self.conn.commit()
-        # Ensure new columns exist for older databases
-        cur.execute("PRAGMA table_info(child_profile)")
-        cols = {row[1] for row in cur.fetchall()}
-        if "strictness" not in cols:
-            cur.execute("ALTER TABLE child_profile ADD COLUMN strictness TEXT DEFAULT 'standard'")
-        if "age" not in cols:
-            cur.execute("ALTER TABLE child_profile ADD COLUMN age INTEGER DEFAULT 12")
-        cur.execute("PRAGMA table_info(decision)")
-        decision_cols = {row[1] for row in cur.fetchall()}
-        if "original_action" not in decision_cols:
-            cur.execute("ALTER TABLE decision ADD COLUMN original_action TEXT")
-        if "manual_action" not in decision_cols:
-            cur.execute("ALTER TABLE decision ADD COLUMN manual_action TEXT")
-        if "manual_flagged" not in decision_cols:
-            cur.execute("ALTER TABLE decision ADD COLUMN manual_flagged INTEGER DEFAULT 0")
-        if "manual_processed" not in decision_cols:
-            cur.execute("ALTER TABLE decision ADD COLUMN manual_processed INTEGER DEFAULT 0")
-        if "manual_updated_at" not in decision_cols:
-            cur.execute("ALTER TABLE decision ADD COLUMN manual_updated_at INTEGER")
-        cur.execute("UPDATE decision SET original_action = action WHERE original_action IS NULL")
-        self.conn.commit()
+        def _apply(conn):
+            applied = migrate(conn)
+            fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name='page_fts'").fetchone()
+            return applied, fts is not None
+
+        applied, self.search_enabled = self.conns.write(_apply, transactional=False)
+        if applied:
+            self.logger.info("Migrated schema to version %s (applied %s)", LATEST_VERSION, applied)
+        self.conns.open_readers()
+
+    # --- connection plumbing ----------------------------------------------
+
+    @contextmanager
+    def reader(self) -> Iterator[Any]:
+        """Borrow a read-only connection from the pool."""
+        with self.conns.reader() as conn:
+            yield conn
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        with self.conns.reader() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return _rows_to_dicts(cur)
+
+    def _write(self, op: WriteOp) -> Any:
+        pending = _pending_writes.get()
+        if pending is not None:
+            pending.append(op)
+            return None
+        return self.conns.write(op)
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator["Database"]:
+        """
+        Group the writes made inside the block into a single transaction.
+
+        Writes are buffered and handed to the writer thread as one job when the
+        outermost block exits; nested blocks join the outer one. Reads inside
+        the block do not see its own pending writes. If the block raises, its
+        buffered writes are discarded.
+        """
+        if _pending_writes.get() is not None:
+            yield self
+            return
+        token = _pending_writes.set([])
+        try:
+            yield self
+        except BaseException:
+            # Nothing was handed to the writer yet: dropping the buffer rolls the block back.
+            _pending_writes.reset(token)
+            raise
+        ops = _pending_writes.get() or []
+        _pending_writes.reset(token)
+        self._run_ops(ops)
+
+    def flush(self) -> None:
+        """Commit the writes buffered so far in the current unit of work."""
+        pending = _pending_writes.get()
+        if pending:
+            ops = list(pending)
+            pending.clear()
+            self._run_ops(ops)
+
+    def _run_ops(self, ops: List[WriteOp]) -> None:
+        if not ops:
+            return
+
+        def _apply(conn):
+            for op in ops:
+                op(conn)
+
+        self.conns.write(_apply)
+        if len(ops) > 1:
+            self.logger.info("Committed unit of work (%s writes)", len(ops))
+
+    # --- child profiles ---------------------------------------------------
 
     def add_child_profile(self, child_id: str, name="", os_user="", timezone="", strictness: str = "standard", age: int = 12):
-        cur = self.conn.cursor()
-        cur.execute(
+        self._write(lambda conn: conn.execute(
             "INSERT OR IGNORE INTO child_profile(id, name, os_user, timezone, strictness, age, created_at) VALUES (?, ?, ?, ?, ?, ?, strftime('%s','now')*1000)",
             (child_id, name, os_user, timezone, strictness, age),
-        )
-        self.conn.commit()
+        ))
         self.logger.info("Ensured child profile exists id=%s strictness=%s age=%s", child_id, strictness, age)
 
     def get_child_profile(self, child_id: str) -> Optional[Dict[str, Any]]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM child_profile WHERE id=?", (child_id,))
-        row = cur.fetchone()
-        if not row:
+        cached = self._profile_cache.get(child_id)
+        if cached is not None:
+            return dict(cached)
+        rows = self._query("SELECT * FROM child_profile WHERE id=?", (child_id,))
+        if not rows:
             return None
-        cols = [c[0] for c in cur.description]
-        return dict(zip(cols, row))
+        profile = rows[0]
+        self._profile_cache[child_id] = profile
+        return dict(profile)
 
     def update_child_profile(self, child_id: str, strictness: Optional[str] = None, age: Optional[int] = None):
         updates = []
@@ -168,74 +207,170 @@ class Database:
         if not updates:
             return
         params.append(child_id)
-        cur = self.conn.cursor()
-        cur.execute(f"UPDATE child_profile SET {', '.join(updates)} WHERE id=?", params)
-        self.conn.commit()
+        self._write(lambda conn: conn.execute(f"UPDATE child_profile SET {', '.join(updates)} WHERE id=?", params))
+        self._profile_cache.pop(child_id, None)
         self.logger.info("Updated child profile id=%s strictness=%s age=%s", child_id, strictness, age)
 
-    def add_event(self, event: Dict[str, Any]) -> str:
-        event_id = event.get("id") or f"evt_{uuid.uuid4().hex}"
+    # --- events / analysis / decisions ------------------------------------
+
+    @staticmethod
+    def new_event_id() -> str:
+        return f"evt_{uuid.uuid4().hex}"
+
+    def add_event(self, event: Dict[str, Any], ensure_child: bool = True) -> str:
+        event_id = event.get("id") or self.new_event_id()
         child_id = event.get("child_id", "child_default")
-        self.add_child_profile(child_id)
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO event(id, child_id, ts, kind, url, title, tab_id, referrer, data_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                event_id,
-                child_id,
-                event.get("ts"),
-                event.get("kind"),
-                event.get("url"),
-                event.get("title"),
-                event.get("tab_id"),
-                event.get("referrer"),
-                event.get("data_json") or "",
-            ),
+        if ensure_child:
+            self.add_child_profile(child_id)
+        # Compress on the caller's thread; the writer only copies bytes.
+        prepared = payloads.prepare(event.get("data_json"))
+        dom_text = search.document_text(event.get("data_json")) if self.search_enabled else ""
+        params = (
+            event_id,
+            child_id,
+            event.get("ts"),
+            event.get("kind"),
+            event.get("url"),
+            event.get("title"),
+            event.get("tab_id"),
+            event.get("referrer"),
         )
-        self.conn.commit()
+
+        def _apply(conn):
+            body_hash, shots = payloads.write(conn, event_id, prepared)
+            conn.execute(
+                "INSERT INTO event(id, child_id, ts, kind, url, title, tab_id, referrer, payload_hash, screenshot_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                params + (body_hash, shots),
+            )
+            if self.search_enabled:
+                search.index_document(conn, event_id, title=event.get("title") or "", url=event.get("url") or "", dom=dom_text)
+
+        self._write(_apply)
         self.logger.info("Inserted event id=%s child_id=%s kind=%s url=%s", event_id, child_id, event.get("kind"), event.get("url"))
         return event_id
 
+    def event_exists(self, event_id: str) -> bool:
+        return bool(self._query("SELECT 1 AS present FROM event WHERE id=?", (event_id,)))
+
     def update_event_data_json(self, event_id: str, data_json: str):
-        cur = self.conn.cursor()
-        cur.execute("UPDATE event SET data_json=? WHERE id=?", (data_json or "", event_id))
-        self.conn.commit()
-        self.logger.info("Updated event data_json id=%s", event_id)
+        prepared = payloads.prepare(data_json)
+        dom_text = search.document_text(data_json) if self.search_enabled else ""
+
+        def _apply(conn):
+            previous = payloads.referenced_hashes(conn, [event_id])
+            body_hash, shots = payloads.write(conn, event_id, prepared)
+            conn.execute(
+                "UPDATE event SET data_json=NULL, payload_hash=?, screenshot_count=? WHERE id=?",
+                (body_hash, shots, event_id),
+            )
+            payloads.collect_garbage(conn, previous)
+            if self.search_enabled:
+                search.index_document(conn, event_id, dom=dom_text)
+
+        self._write(_apply)
+        self.logger.info("Updated event payload id=%s screenshots=%s", event_id, len(prepared.screenshots))
+
+    def _load_blob(self, conn, blob_hash: str) -> Optional[bytes]:
+        row = conn.execute("SELECT codec, data FROM payload_blob WHERE hash=?", (blob_hash,)).fetchone()
+        if not row:
+            return None
+        return payloads.decode(row[0], row[1])
+
+    def get_payload(self, payload_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Decode a stored `data_json` body (screenshots excluded) by hash."""
+        if not payload_hash:
+            return None
+        with self.conns.reader() as conn:
+            raw = self._load_blob(conn, payload_hash)
+        return payloads.load_body(raw) if raw is not None else None
+
+    def get_event_payload(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """The event's `data_json` without screenshots, or None if the event is unknown."""
+        with self.conns.reader() as conn:
+            row = conn.execute("SELECT payload_hash, data_json FROM event WHERE id=?", (event_id,)).fetchone()
+            if not row:
+                return None
+            if row[0]:
+                raw = self._load_blob(conn, row[0])
+                return payloads.load_body(raw) if raw is not None else {}
+        return payloads.load_body(row[1].encode("utf-8")) if row[1] else {}
+
+    def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """The event as it was ingested (payload and screenshots folded back into `data_json`)."""
+        rows = self._query(
+            "SELECT id, child_id, ts, kind, url, title, tab_id, referrer FROM event WHERE id=?", (event_id,)
+        )
+        if not rows:
+            return None
+        event = rows[0]
+        data = self.get_event_payload(event_id) or {}
+        shots = self.get_event_screenshots(event_id)
+        if shots:
+            data[payloads.SCREENSHOT_KEY] = [base64.b64encode(s).decode("ascii") for s in shots]
+        event["data_json"] = json.dumps(data) if data else None
+        return event
+
+    def has_final_decision(self, event_id: str) -> bool:
+        """Whether the event has a decision other than a deadline-bound provisional one."""
+        return bool(self._query(
+            "SELECT 1 AS present FROM decision WHERE event_id=? "
+            "AND COALESCE(json_extract(details_json, '$.provisional'), 0) = 0 LIMIT 1",
+            (event_id,),
+        ))
+
+    def get_event_screenshots(self, event_id: str) -> List[bytes]:
+        """PNG bytes of the event's screenshots, in capture order."""
+        with self.conns.reader() as conn:
+            hashes = [r[0] for r in conn.execute(
+                "SELECT hash FROM event_screenshot WHERE event_id=? ORDER BY idx", (event_id,)
+            ).fetchall()]
+            blobs = [self._load_blob(conn, h) for h in hashes]
+        return [b for b in blobs if b is not None]
 
     def add_analysis(self, event_id: str, model: str, version: str, scores: Dict[str, Any], label: str = "", latency_ms: Optional[int] = None) -> str:
         analysis_id = f"ana_{uuid.uuid4().hex}"
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO analysis(id, event_id, model, version, scores_json, label, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (analysis_id, event_id, model, version, json.dumps(scores), label, latency_ms),
-        )
-        self.conn.commit()
+        params = (analysis_id, event_id, model, version, json.dumps(scores), label, latency_ms)
+        ocr_text = scores.get("text") if model == OCR_ANALYSIS_MODEL and self.search_enabled else None
+
+        def _apply(conn):
+            conn.execute(
+                "INSERT INTO analysis(id, event_id, model, version, scores_json, label, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                params,
+            )
+            if ocr_text:
+                search.index_document(conn, event_id, ocr=ocr_text[: search.MAX_DOC_CHARS])
+
+        self._write(_apply)
         self.logger.info("Recorded analysis id=%s event_id=%s model=%s", analysis_id, event_id, model)
         return analysis_id
 
     def add_decision(self, event_id: str, policy_version: str, action: str, reason: str = "", details: Optional[Dict[str, Any]] = None) -> str:
         decision_id = f"dec_{uuid.uuid4().hex}"
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO decision(id, event_id, policy_version, action, reason, details_json, original_action, manual_flagged, manual_processed) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)",
-            (decision_id, event_id, policy_version, action, reason, json.dumps(details or {}), action),
-        )
-        self.conn.commit()
+        details_json = json.dumps(details or {})
+        params = (decision_id, event_id, policy_version, action, reason, details_json, action)
+
+        def _apply(conn):
+            # Commit-ordered sequence for the replicator; see migrations._decision_seq.
+            conn.execute("UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'decision_seq'")
+            conn.execute(
+                "INSERT INTO decision(id, event_id, policy_version, action, reason, details_json, original_action, manual_flagged, manual_processed, seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'decision_seq'))",
+                params,
+            )
+            rollups.record_decision(conn, event_id, decision_id, action, details_json)
+
+        self._write(_apply)
         self.logger.info("Stored decision id=%s event_id=%s action=%s", decision_id, event_id, action)
         return decision_id
 
-    def get_recent_events(self, child_id: Optional[str], limit: int):
-        cur = self.conn.cursor()
-        if child_id:
-            cur.execute("SELECT * FROM event WHERE child_id=? ORDER BY ts DESC LIMIT ?", (child_id, limit))
-        else:
-            cur.execute("SELECT * FROM event ORDER BY ts DESC LIMIT ?", (limit,))
-        cols = [c[0] for c in cur.description]
-        return [dict(zip(cols, r)) for r in cur.fetchall()]
+    def list_events(self, page: PageQuery) -> Dict[str, Any]:
+        """A keyset page of events (newest first); `page.value` filters on `kind`."""
+        where, tail, params = page.sql(ts_col="ts", id_col="id", child_col="child_id", value_col="kind")
+        rows = self._query(f"SELECT {EVENT_COLUMNS} FROM event {where} {tail}", tuple(params))
+        return page.page(rows, "events")
 
     def get_decision_with_event(self, decision_id: str) -> Optional[Dict[str, Any]]:
-        cur = self.conn.cursor()
-        cur.execute(
+        rows = self._query(
             """
             SELECT d.*, e.url, e.title, e.ts, e.child_id
             FROM decision d JOIN event e ON d.event_id=e.id
@@ -243,39 +378,38 @@ class Database:
             """,
             (decision_id,),
         )
-        row = cur.fetchone()
-        if not row:
+        if not rows:
             return None
-        cols = [c[0] for c in cur.description]
-        data = dict(zip(cols, row))
-        if data.get("details_json"):
-            try:
-                data["details_json"] = json.loads(data["details_json"])
-            except Exception:
-                data["details_json"] = {}
-        return data
+        return _decode_details(rows[0])
 
     def override_decision(self, decision_id: str, new_action: str) -> Optional[Dict[str, Any]]:
         now_ms = int(time.time() * 1000)
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            UPDATE decision
-            SET action=?, manual_action=?, manual_flagged=1, manual_processed=0, manual_updated_at=?
-            WHERE id=?
-            """,
-            (new_action, new_action, now_ms, decision_id),
-        )
-        if cur.rowcount == 0:
-            self.conn.commit()
+
+        def _apply(conn):
+            before = conn.execute(
+                "SELECT event_id, action, details_json, manual_flagged, rolled_up FROM decision WHERE id=?",
+                (decision_id,),
+            ).fetchone()
+            if before is None:
+                return 0
+            conn.execute(
+                """
+                UPDATE decision
+                SET action=?, manual_action=?, manual_flagged=1, manual_processed=0, manual_updated_at=?
+                WHERE id=?
+                """,
+                (new_action, new_action, now_ms, decision_id),
+            )
+            rollups.record_override(conn, decision_id, new_action, before)
+            return 1
+
+        if not self.conns.write(_apply):
             return None
-        self.conn.commit()
         self.logger.info("Decision override id=%s new_action=%s", decision_id, new_action)
         return self.get_decision_with_event(decision_id)
 
     def fetch_unprocessed_overrides(self, limit: int = 50) -> List[Dict[str, Any]]:
-        cur = self.conn.cursor()
-        cur.execute(
+        rows = self._query(
             """
             SELECT d.*, e.url, e.title, e.ts, e.child_id
             FROM decision d
@@ -286,47 +420,22 @@ class Database:
             """,
             (limit,),
         )
-        rows = cur.fetchall()
-        cols = [c[0] for c in cur.description]
-        results = []
-        for row in rows:
-            data = dict(zip(cols, row))
-            if data.get("details_json"):
-                try:
-                    data["details_json"] = json.loads(data["details_json"])
-                except Exception:
-                    data["details_json"] = {}
-            results.append(data)
-        return results
+        return [_decode_details(r) for r in rows]
 
     def mark_override_processed(self, decision_ids: List[str]) -> None:
         if not decision_ids:
             return
-        cur = self.conn.cursor()
         placeholders = ",".join("?" for _ in decision_ids)
-        cur.execute(
+        self._write(lambda conn: conn.execute(
             f"UPDATE decision SET manual_processed=1 WHERE id IN ({placeholders})",
             tuple(decision_ids),
-        )
-        self.conn.commit()
-
-    def get_setting(self, key: str) -> Optional[str]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT value FROM settings WHERE key=?", (key,))
-        row = cur.fetchone()
-        return row[0] if row else None
-
-    def set_setting(self, key: str, value: str) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO settings(key,value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            (key, value),
-        )
-        self.conn.commit()
+        ))
 
-    def get_recent_decisions(self, child_id: Optional[str], limit: int):
-        cur = self.conn.cursor()
-        base_query = """
+    def list_decisions(self, page: PageQuery) -> Dict[str, Any]:
+        """A keyset page of decisions ordered by their event's `ts`; `page.value` filters on `action`."""
+        where, tail, params = page.sql(ts_col="e.ts", id_col="d.id", child_col="e.child_id", value_col="d.action")
+        rows = self._query(
+            f"""
             SELECT
                 d.id,
                 d.event_id,
@@ -343,45 +452,361 @@ class Database:
                 e.title,
                 e.ts,
                 e.child_id
-            FROM decision d
-            JOIN event e ON d.event_id = e.id
-        """
+            FROM event e
+            -- CROSS JOIN keeps event as the outer loop, so every page walks an event index in ts order.
+            CROSS JOIN decision d ON d.event_id = e.id
+            {where}
+            {tail}
+            """,
+            tuple(params),
+        )
+        result = page.page(rows, "decisions")
+        # Only the rows actually returned are decoded (not the look-ahead row).
+        result["decisions"] = [_decode_details(r) for r in result["decisions"]]
+        return result
+
+    def search_pages(
+        self,
+        query: str,
+        *,
+        child_id: Optional[str] = None,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        with self.conns.reader() as conn:
+            return search.search(conn, query, child_id=child_id, since_ms=since_ms, until_ms=until_ms, limit=limit, offset=offset)
+
+    # --- rollups ----------------------------------------------------------
+
+    def _rollup_where(self, child_id: Optional[str], days: int, extra: str = "") -> Tuple[str, List[Any]]:
+        clauses, params = ["day >= ?"], [rollups.first_day(days)]
         if child_id:
-            cur.execute(
-                base_query + " WHERE e.child_id=? ORDER BY e.ts DESC LIMIT ?",
-                (child_id, limit),
-            )
-        else:
-            cur.execute(
-                base_query + " ORDER BY e.ts DESC LIMIT ?",
+            clauses.append("child_id = ?")
+            params.append(child_id)
+        return " AND ".join(clauses) + extra, params
+
+    def stats_daily(self, child_id: Optional[str], days: int) -> List[Dict[str, Any]]:
+        """Decisions and overrides per day and action."""
+        where, params = self._rollup_where(child_id, days, " AND category = ?")
+        return self._query(
+            f"""
+            SELECT day, action, SUM(decisions) AS decisions, SUM(overrides) AS overrides
+            FROM decision_rollup WHERE {where}
+            GROUP BY day, action HAVING SUM(decisions) > 0
+            ORDER BY day, action
+            """,
+            (*params, rollups.ALL_CATEGORIES),
+        )
+
+    def stats_categories(self, child_id: Optional[str], days: int, action: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        where, params = self._rollup_where(child_id, days, " AND category != ?")
+        params.append(rollups.ALL_CATEGORIES)
+        if action:
+            where += " AND action = ?"
+            params.append(action)
+        return self._query(
+            f"""
+            SELECT category, SUM(decisions) AS decisions, SUM(overrides) AS overrides
+            FROM decision_rollup WHERE {where}
+            GROUP BY category HAVING SUM(decisions) > 0
+            ORDER BY decisions DESC, category
+            LIMIT ?
+            """,
+            (*params, limit),
+        )
+
+    def stats_domains(self, child_id: Optional[str], days: int, action: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        where, params = self._rollup_where(child_id, days, " AND category = ?")
+        params.append(rollups.ALL_CATEGORIES)
+        if action:
+            where += " AND action = ?"
+            params.append(action)
+        return self._query(
+            f"""
+            SELECT domain, SUM(decisions) AS decisions, SUM(overrides) AS overrides
+            FROM decision_rollup WHERE {where}
+            GROUP BY domain HAVING SUM(decisions) > 0
+            ORDER BY decisions DESC, domain
+            LIMIT ?
+            """,
+            (*params, limit),
+        )
+
+    def stats_overrides(self, child_id: Optional[str], days: int) -> Dict[str, Any]:
+        where, params = self._rollup_where(child_id, days, " AND category = ?")
+        rows = self._query(
+            f"""
+            SELECT action, SUM(decisions) AS decisions, SUM(overrides) AS overrides
+            FROM decision_rollup WHERE {where}
+            GROUP BY action HAVING SUM(decisions) > 0
+            """,
+            (*params, rollups.ALL_CATEGORIES),
+        )
+        decisions = sum(r["decisions"] for r in rows)
+        overrides = sum(r["overrides"] for r in rows)
+        return {
+            "decisions": decisions,
+            "overrides": overrides,
+            "override_rate": round(overrides / decisions, 4) if decisions else 0.0,
+            # overrides are attributed to the action a guardian changed the decision to
+            "by_action": rows,
+        }
+
+    # --- training data ----------------------------------------------------
+
+    def fetch_labelled_pages(self, limit: int = 50000) -> List[Dict[str, Any]]:
+        """
+        Newest pages with a trustworthy final label: a guardian override, or
+        the counted verdict of the LLM judge (policy-only outcomes such as
+        schedules and block lists say nothing about the page and are skipped,
+        as are the judge's "fallback:" stand-ins for outages and refusals).
+        """
+        with self.conns.reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT e.id, e.ts, e.title, e.url, e.payload_hash, e.data_json, d.action, d.manual_flagged
+                FROM decision d JOIN event e ON e.id = d.event_id
+                WHERE d.rolled_up = 1 AND (d.manual_flagged = 1 OR d.reason LIKE 'llm:%')
+                ORDER BY e.ts DESC LIMIT ?
+                """,
                 (limit,),
+            ).fetchall()
+            out = []
+            for event_id, ts, title, url, payload_hash, data_json, action, manual in rows:
+                if payload_hash:
+                    raw = self._load_blob(conn, payload_hash)
+                    data = payloads.load_body(raw) if raw is not None else {}
+                else:
+                    data = payloads.load_body(data_json.encode("utf-8")) if data_json else {}
+                out.append({
+                    "event_id": event_id,
+                    "ts": ts,
+                    "title": title,
+                    "url": url,
+                    "data": data or {},
+                    "action": action,
+                    "manual": bool(manual),
+                })
+        return out
+
+    # --- retention --------------------------------------------------------
+
+    def count_events(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM event")[0]["n"]
+
+    def event_ts_at(self, offset: int) -> Optional[int]:
+        """`ts` of the event at `offset` in ascending time order (size-budget cutoff)."""
+        rows = self._query("SELECT ts FROM event ORDER BY ts ASC LIMIT 1 OFFSET ?", (offset,))
+        return rows[0]["ts"] if rows else None
+
+    def fetch_events_for_archive(self, before_ts: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Oldest events with `ts < before_ts`, each with its decisions, analyses,
+        decoded payload body and screenshot bytes attached.
+        """
+        with self.conns.reader() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"SELECT {EVENT_COLUMNS}, data_json FROM event WHERE ts < ? ORDER BY ts ASC LIMIT ?",
+                (before_ts, limit),
             )
-        cols = [c[0] for c in cur.description]
-        rows = []
-        for r in cur.fetchall():
-            data = dict(zip(cols, r))
-            if data.get("details_json"):
-                try:
-                    data["details_json"] = json.loads(data["details_json"])
-                except Exception:
-                    data["details_json"] = {}
-            rows.append(data)
-        return rows
+            events = _rows_to_dicts(cur)
+            if not events:
+                return []
+            ids = tuple(e["id"] for e in events)
+            marks = ",".join("?" for _ in ids)
+            cur.execute(f"SELECT * FROM decision WHERE event_id IN ({marks})", ids)
+            decisions = _rows_to_dicts(cur)
+            cur.execute(f"SELECT * FROM analysis WHERE event_id IN ({marks})", ids)
+            analyses = _rows_to_dicts(cur)
+            by_id = {e["id"]: e for e in events}
+            for e in events:
+                e["decisions"], e["analyses"] = [], []
+                legacy = e.pop("data_json", None)
+                if e.get("payload_hash"):
+                    raw = self._load_blob(conn, e["payload_hash"])
+                    e["payload"] = payloads.load_body(raw) if raw is not None else None
+                else:
+                    e["payload"] = payloads.load_body(legacy.encode("utf-8")) if legacy else None
+                e["screenshots"] = [
+                    self._load_blob(conn, r[0])
+                    for r in conn.execute(
+                        "SELECT hash FROM event_screenshot WHERE event_id=? ORDER BY idx", (e["id"],)
+                    ).fetchall()
+                ]
+            for d in decisions:
+                by_id[d["event_id"]]["decisions"].append(d)
+            for a in analyses:
+                by_id[a["event_id"]]["analyses"].append(a)
+        return events
+
+    def fetch_analyses_for_archive(self, before_ts: int, limit: int) -> List[Dict[str, Any]]:
+        """Analysis rows whose event is older than `before_ts` (the event itself stays)."""
+        return self._query(
+            """
+            SELECT a.*, e.ts, e.child_id
+            FROM analysis a JOIN event e ON e.id = a.event_id
+            WHERE e.ts < ?
+            ORDER BY e.ts
+            LIMIT ?
+            """,
+            (before_ts, limit),
+        )
+
+    def purge_events(self, event_ids: List[str], unchanged_since_ms: int) -> List[str]:
+        """
+        Delete archived events with their decisions, analyses and orphaned
+        payload blobs. Events with a decision overridden after
+        `unchanged_since_ms` are kept (their archived copy is stale).
+        """
+        if not event_ids:
+            return []
+
+        def _apply(conn):
+            marks = ",".join("?" for _ in event_ids)
+            stale = {
+                r[0]
+                for r in conn.execute(
+                    f"SELECT event_id FROM decision WHERE event_id IN ({marks}) AND manual_updated_at >= ?",
+                    tuple(event_ids) + (unchanged_since_ms,),
+                ).fetchall()
+            }
+            doomed = tuple(e for e in event_ids if e not in stale)
+            if not doomed:
+                return []
+            marks = ",".join("?" for _ in doomed)
+            hashes = payloads.referenced_hashes(conn, doomed)
+            conn.execute(f"DELETE FROM analysis WHERE event_id IN ({marks})", doomed)
+            conn.execute(f"DELETE FROM decision WHERE event_id IN ({marks})", doomed)
+            conn.execute(f"DELETE FROM event_screenshot WHERE event_id IN ({marks})", doomed)
+            if self.search_enabled:
+                search.delete_documents(conn, doomed)
+            conn.execute(f"DELETE FROM event WHERE id IN ({marks})", doomed)
+            payloads.collect_garbage(conn, hashes)
+            return list(doomed)
+
+        removed = self.conns.write(_apply)
+        self.logger.info("Purged %s archived events", len(removed))
+        return removed
+
+    def purge_analyses(self, analysis_ids: List[str]) -> int:
+        if not analysis_ids:
+            return 0
+        marks = ",".join("?" for _ in analysis_ids)
+        removed = self.conns.write(
+            lambda conn: conn.execute(f"DELETE FROM analysis WHERE id IN ({marks})", tuple(analysis_ids)).rowcount
+        )
+        self.logger.info("Purged %s archived analyses", removed)
+        return removed
+
+    # --- settings ---------------------------------------------------------
+
+    def get_setting(self, key: str) -> Optional[str]:
+        if key in self._settings_cache:
+            return self._settings_cache[key]
+        rows = self._query("SELECT value FROM settings WHERE key=?", (key,))
+        value = rows[0]["value"] if rows else None
+        self._settings_cache[key] = value
+        return value
+
+    def set_setting(self, key: str, value: str) -> None:
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO settings(key,value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value),
+        ))
+        self._settings_cache[key] = value
+
+    def delete_setting(self, key: str) -> None:
+        self._write(lambda conn: conn.execute("DELETE FROM settings WHERE key=?", (key,)))
+        self._settings_cache[key] = None
+
+    def invalidate_caches(self) -> None:
+        """Forget cached settings/profiles (e.g. after another process wrote them)."""
+        self._settings_cache.clear()
+        self._profile_cache.clear()
 
     def get_active_child_id(self) -> Optional[str]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT value FROM settings WHERE key='active_child_id'")
-        row = cur.fetchone()
-        return row[0] if row else None
+        return self.get_setting("active_child_id")
 
     def set_active_child_id(self, child_id: str) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO settings(key,value) VALUES('active_child_id', ?) "
-            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            (child_id,),
+        self.set_setting("active_child_id", child_id)
+
+    # --- verdict cache ----------------------------------------------------
+
+    def get_cached_verdict(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        rows = self._query("SELECT payload_json, stored_at FROM verdict_cache WHERE key=?", (key,))
+        if not rows:
+            return None
+        try:
+            payload = json.loads(rows[0]["payload_json"]) or {}
+        except Exception:
+            return None
+        now_ms = int(time.time() * 1000)
+        # Recency bump is best-effort; do not wait for the writer.
+        self.conns.submit(lambda conn: conn.execute("UPDATE verdict_cache SET last_hit_at=? WHERE key=?", (now_ms, key)))
+        return (rows[0]["stored_at"] or 0) / 1000.0, payload
+
+    def put_cached_verdict(self, key: str, payload: Dict[str, Any], stored_at_ms: int) -> None:
+        blob = json.dumps(payload)
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO verdict_cache(key, payload_json, stored_at, last_hit_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET payload_json=excluded.payload_json, stored_at=excluded.stored_at, last_hit_at=excluded.last_hit_at",
+            (key, blob, stored_at_ms, stored_at_ms),
+        ))
+
+    def prune_verdict_cache(self, max_entries: int, older_than_ms: int) -> int:
+        def _apply(conn):
+            removed = conn.execute("DELETE FROM verdict_cache WHERE stored_at < ?", (older_than_ms,)).rowcount
+            removed += conn.execute(
+                "DELETE FROM verdict_cache WHERE key IN ("
+                "SELECT key FROM verdict_cache ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            ).rowcount
+            return removed
+
+        removed = self.conns.write(_apply)
+        if removed:
+            self.logger.info("Pruned %s verdict cache rows", removed)
+        return removed
+
+    def clear_verdict_cache(self) -> None:
+        self._write(lambda conn: conn.execute("DELETE FROM verdict_cache"))
+
+    # --- pipeline checkpoints ---------------------------------------------
+
+    def put_pipeline_checkpoint(self, event_id: str, state: Dict[str, Any], stored_at_ms: int) -> None:
+        blob = json.dumps(state)
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO pipeline_checkpoint(event_id, state_json, stored_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(event_id) DO UPDATE SET state_json=excluded.state_json, stored_at=excluded.stored_at",
+            (event_id, blob, stored_at_ms),
+        ))
+
+    def take_pipeline_checkpoint(self, event_id: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Fetch and delete the checkpoint of `event_id`; a checkpoint is resumed at most once."""
+        def _apply(conn):
+            row = conn.execute(
+                "SELECT state_json, stored_at FROM pipeline_checkpoint WHERE event_id=?", (event_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM pipeline_checkpoint WHERE event_id=?", (event_id,))
+            return row
+
+        row = self.conns.write(_apply)
+        if row is None:
+            return None
+        try:
+            state = json.loads(row[0]) or {}
+        except Exception:
+            return None
+        return (row[1] or 0) / 1000.0, state
+
+    def prune_pipeline_checkpoints(self, older_than_ms: int) -> int:
+        return self.conns.write(
+            lambda conn: conn.execute("DELETE FROM pipeline_checkpoint WHERE stored_at < ?", (older_than_ms,)).rowcount
         )
-        self.conn.commit()
 
 db = Database()
 db.connect()
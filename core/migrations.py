@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+from . import payloads, rollups, search
+
+log = logging.getLogger("watchit.sqlite.migrations")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Any], None]
+
+
+def _columns(cur: Any, table: str) -> set:
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _baseline(cur: Any) -> None:
+    """The schema as it stood before versioning; also adopts older unversioned files."""
+    for stmt in (
+        """
+        CREATE TABLE IF NOT EXISTS child_profile(
+          id TEXT PRIMARY KEY,
+          name TEXT,
+          os_user TEXT,
+          timezone TEXT,
+          strictness TEXT DEFAULT 'standard',
+          age INTEGER DEFAULT 12,
+          created_at INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS event(
+          id TEXT PRIMARY KEY,
+          child_id TEXT,
+          ts INTEGER,
+          kind TEXT,
+          url TEXT,
+          title TEXT,
+          tab_id TEXT,
+          referrer TEXT,
+          data_json TEXT,
+          FOREIGN KEY(child_id) REFERENCES child_profile(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS analysis(
+          id TEXT PRIMARY KEY,
+          event_id TEXT,
+          model TEXT,
+          version TEXT,
+          scores_json TEXT,
+          label TEXT,
+          latency_ms INTEGER,
+          FOREIGN KEY(event_id) REFERENCES event(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS decision(
+          id TEXT PRIMARY KEY,
+          event_id TEXT,
+          policy_version TEXT,
+          action TEXT,
+          reason TEXT,
+          details_json TEXT,
+          original_action TEXT,
+          manual_action TEXT,
+          manual_flagged INTEGER DEFAULT 0,
+          manual_processed INTEGER DEFAULT 0,
+          manual_updated_at INTEGER,
+          FOREIGN KEY(event_id) REFERENCES event(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS settings(
+          key TEXT PRIMARY KEY,
+          value TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS verdict_cache(
+          key TEXT PRIMARY KEY,
+          payload_json TEXT,
+          stored_at INTEGER,
+          last_hit_at INTEGER
+        )
+        """,
+    ):
+        cur.execute(stmt)
+    # Files created before these columns existed
+    cols = _columns(cur, "child_profile")
+    if "strictness" not in cols:
+        cur.execute("ALTER TABLE child_profile ADD COLUMN strictness TEXT DEFAULT 'standard'")
+    if "age" not in cols:
+        cur.execute("ALTER TABLE child_profile ADD COLUMN age INTEGER DEFAULT 12")
+    decision_cols = _columns(cur, "decision")
+    if "original_action" not in decision_cols:
+        cur.execute("ALTER TABLE decision ADD COLUMN original_action TEXT")
+    if "manual_action" not in decision_cols:
+        cur.execute("ALTER TABLE decision ADD COLUMN manual_action TEXT")
+    if "manual_flagged" not in decision_cols:
+        cur.execute("ALTER TABLE decision ADD COLUMN manual_flagged INTEGER DEFAULT 0")
+    if "manual_processed" not in decision_cols:
+        cur.execute("ALTER TABLE decision ADD COLUMN manual_processed INTEGER DEFAULT 0")
+    if "manual_updated_at" not in decision_cols:
+        cur.execute("ALTER TABLE decision ADD COLUMN manual_updated_at INTEGER")
+    cur.execute("UPDATE decision SET original_action = action WHERE original_action IS NULL")
+
+
+def _indexes(cur: Any) -> None:
+    for stmt in (
+        # event listings (all children) and the replicator's `ts >` batches
+        "CREATE INDEX IF NOT EXISTS idx_event_ts ON event(ts)",
+        # event listings for one child
+        "CREATE INDEX IF NOT EXISTS idx_event_child_ts ON event(child_id, ts)",
+        # every decision/analysis -> event join
+        "CREATE INDEX IF NOT EXISTS idx_decision_event ON decision(event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_analysis_event ON analysis(event_id)",
+        # fetch_unprocessed_overrides: only the small unprocessed set is indexed
+        "CREATE INDEX IF NOT EXISTS idx_decision_override_queue ON decision(manual_updated_at) "
+        "WHERE manual_flagged=1 AND manual_processed=0",
+        # replicator: decisions overridden since the last sync
+        "CREATE INDEX IF NOT EXISTS idx_decision_manual_updated ON decision(manual_updated_at) "
+        "WHERE manual_updated_at IS NOT NULL",
+        # verdict cache pruning
+        "CREATE INDEX IF NOT EXISTS idx_verdict_cache_stored ON verdict_cache(stored_at)",
+        "CREATE INDEX IF NOT EXISTS idx_verdict_cache_hit ON verdict_cache(last_hit_at)",
+    ):
+        cur.execute(stmt)
+    cur.execute("ANALYZE")
+
+
+def _cold_payloads(cur: Any) -> None:
+    """Move `event.data_json` into the compressed, content-addressed blob store."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payload_blob(
+          hash TEXT PRIMARY KEY,
+          codec TEXT NOT NULL,
+          raw_size INTEGER,
+          data BLOB NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS event_screenshot(
+          event_id TEXT NOT NULL,
+          idx INTEGER NOT NULL,
+          hash TEXT NOT NULL,
+          PRIMARY KEY(event_id, idx)
+        )
+        """
+    )
+    cols = _columns(cur, "event")
+    if "payload_hash" not in cols:
+        cur.execute("ALTER TABLE event ADD COLUMN payload_hash TEXT")
+    if "screenshot_count" not in cols:
+        cur.execute("ALTER TABLE event ADD COLUMN screenshot_count INTEGER DEFAULT 0")
+    moved = 0
+    while True:
+        rows = cur.execute(
+            "SELECT id, data_json FROM event WHERE data_json IS NOT NULL AND data_json != '' LIMIT 200"
+        ).fetchall()
+        if not rows:
+            break
+        for event_id, data_json in rows:
+            body_hash, shots = payloads.write(cur, event_id, payloads.prepare(data_json))
+            cur.execute(
+                "UPDATE event SET data_json=NULL, payload_hash=?, screenshot_count=? WHERE id=?",
+                (body_hash, shots, event_id),
+            )
+        moved += len(rows)
+    if moved:
+        log.info("Moved %s event payloads into payload_blob", moved)
+
+
+def _retention_indexes(cur: Any) -> None:
+    for stmt in (
+        # payload garbage collection after archival / screenshot replacement
+        "CREATE INDEX IF NOT EXISTS idx_event_payload ON event(payload_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_event_screenshot_hash ON event_screenshot(hash)",
+    ):
+        cur.execute(stmt)
+
+
+def _keyset_indexes(cur: Any) -> None:
+    # (ts, id) keys make keyset pages a pure index range; they supersede the ts-only indexes.
+    for stmt in (
+        "CREATE INDEX IF NOT EXISTS idx_event_ts_id ON event(ts, id)",
+        "CREATE INDEX IF NOT EXISTS idx_event_child_ts_id ON event(child_id, ts, id)",
+        "DROP INDEX IF EXISTS idx_event_ts",
+        "DROP INDEX IF EXISTS idx_event_child_ts",
+    ):
+        cur.execute(stmt)
+    cur.execute("ANALYZE")
+
+
+def _page_search(cur: Any) -> None:
+    """Full-text index over page titles, URLs, DOM samples and OCR text."""
+    cur.execute("CREATE TABLE IF NOT EXISTS page_doc(docid INTEGER PRIMARY KEY AUTOINCREMENT, event_id TEXT NOT NULL UNIQUE)")
+    try:
+        cur.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5("
+            "title, url, dom, ocr, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except Exception as exc:
+        # Builds without FTS5 keep working; search reports itself unavailable.
+        log.warning("FTS5 unavailable, page search disabled: %s", exc)
+        return
+    last = ""
+    while True:
+        rows = cur.execute(
+            "SELECT e.id, e.title, e.url, b.codec, b.data FROM event e "
+            "LEFT JOIN payload_blob b ON b.hash = e.payload_hash WHERE e.id > ? ORDER BY e.id LIMIT 500",
+            (last,),
+        ).fetchall()
+        if not rows:
+            break
+        for event_id, title, url, codec, data in rows:
+            dom = search.document_text(payloads.decode(codec, data).decode("utf-8", "replace")) if data is not None else ""
+            search.index_document(cur, event_id, title=title or "", url=url or "", dom=dom)
+        last = rows[-1][0]
+
+
+def _decision_rollups(cur: Any) -> None:
+    """Dashboard counters per (child, day, action, category, domain), backfilled from history."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS decision_rollup(
+          child_id TEXT NOT NULL,
+          day TEXT NOT NULL,
+          action TEXT NOT NULL,
+          category TEXT NOT NULL,
+          domain TEXT NOT NULL,
+          decisions INTEGER NOT NULL DEFAULT 0,
+          overrides INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY(child_id, day, action, category, domain)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_decision_rollup_day ON decision_rollup(day, category)")
+    if "rolled_up" not in _columns(cur, "decision"):
+        cur.execute("ALTER TABLE decision ADD COLUMN rolled_up INTEGER DEFAULT 0")
+    counted = rollups.rebuild(cur)
+    if counted:
+        log.info("Backfilled rollups from %s decisions", counted)
+
+
+def _pipeline_checkpoints(cur: Any) -> None:
+    """First-pass pipeline state, kept until the event's OCR upgrade resumes from it."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pipeline_checkpoint(
+          event_id TEXT PRIMARY KEY,
+          state_json TEXT NOT NULL,
+          stored_at INTEGER NOT NULL
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_checkpoint_stored ON pipeline_checkpoint(stored_at)")
+
+
+def _decision_seq(cur: Any) -> None:
+    """
+    Commit-ordered decision sequence, the replicator's watermark for new decisions.
+
+    Existing rows are numbered in event order. New ones draw from the
+    `decision_seq` counter in `settings` on the single writer, so a higher seq
+    always committed later, and retention deleting the newest row never hands
+    its number out again.
+    """
+    if "seq" not in _columns(cur, "decision"):
+        cur.execute("ALTER TABLE decision ADD COLUMN seq INTEGER")
+    rows = cur.execute(
+        "SELECT d.id FROM decision d LEFT JOIN event e ON e.id = d.event_id "
+        "WHERE d.seq IS NULL ORDER BY e.ts, d.id"
+    ).fetchall()
+    start = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM decision").fetchone()[0]
+    cur.executemany("UPDATE decision SET seq = ? WHERE id = ?", [(start + i, r[0]) for i, r in enumerate(rows, 1)])
+    cur.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('decision_seq', ?)", (str(start + len(rows)),))
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_decision_seq ON decision(seq)")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "query indexes", _indexes),
+    Migration(3, "cold event payloads", _cold_payloads),
+    Migration(4, "retention indexes", _retention_indexes),
+    Migration(5, "keyset pagination indexes", _keyset_indexes),
+    Migration(6, "page search", _page_search),
+    Migration(7, "decision rollups", _decision_rollups),
+    Migration(8, "pipeline checkpoints", _pipeline_checkpoints),
+    Migration(9, "decision sequence", _decision_seq),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: Any) -> int:
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version(version INTEGER PRIMARY KEY, name TEXT, applied_at INTEGER)"
+    )
+    row = cur.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def migrate(conn: Any) -> List[int]:
+    """
+    Bring the schema up to `LATEST_VERSION`; returns the versions applied.
+
+    Each migration runs in its own transaction together with its
+    `schema_version` row, so a failed step leaves the file at the previous
+    version. `conn` must be in autocommit mode (isolation_level=None).
+    """
+    applied: List[int] = []
+    version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return applied
+    cur = conn.cursor()
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        started = time.perf_counter()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            migration.apply(cur)
+            cur.execute(
+                "INSERT INTO schema_version(version, name, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.name, int(time.time() * 1000)),
+            )
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            log.exception("Schema migration %s (%s) failed", migration.version, migration.name)
+            raise
+        applied.append(migration.version)
+        log.info(
+            "Applied schema migration %s (%s) in %.1f ms",
+            migration.version,
+            migration.name,
+            (time.perf_counter() - started) * 1000,
+        )
+    return applied
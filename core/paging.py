@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+MAX_PAGE_SIZE = 500
+
+Cursor = Tuple[int, str]
+
+
+def encode_cursor(ts: Optional[int], row_id: str) -> str:
+    raw = f"{int(ts or 0)}:{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Parse a cursor from `encode_cursor`; raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        ts, row_id = raw.split(":", 1)
+        return int(ts), row_id
+    except Exception as exc:
+        raise ValueError(f"invalid cursor {token!r}") from exc
+
+
+@dataclass(frozen=True)
+class PageQuery:
+    """
+    One page of a newest-first listing keyed on `(ts, id)`.
+
+    `before` pages towards older rows, `after` towards newer ones; at most one
+    may be set. Rows are always returned newest first.
+    """
+
+    limit: int = 50
+    before: Optional[Cursor] = None
+    after: Optional[Cursor] = None
+    child_id: Optional[str] = None
+    value: Optional[str] = None  # equality filter on the listing's filter column (kind / action)
+    since_ms: Optional[int] = None
+    until_ms: Optional[int] = None
+
+    @classmethod
+    def parse(
+        cls,
+        *,
+        limit: int = 50,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        child_id: Optional[str] = None,
+        value: Optional[str] = None,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None,
+    ) -> "PageQuery":
+        if before and after:
+            raise ValueError("use either before or after, not both")
+        return cls(
+            limit=max(1, min(int(limit), MAX_PAGE_SIZE)),
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+            child_id=child_id or None,
+            value=value or None,
+            since_ms=since_ms,
+            until_ms=until_ms,
+        )
+
+    def sql(self, *, ts_col: str, id_col: str, child_col: str, value_col: str, mark: str = "?") -> Tuple[str, str, List[Any]]:
+        """
+        WHERE and ORDER BY/LIMIT clauses for this page.
+
+        Shared by the SQLite (`?`) and Postgres (`%s`) listings so both page
+        identically. One extra row is fetched to tell whether more follow.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if self.child_id:
+            clauses.append(f"{child_col} = {mark}")
+            params.append(self.child_id)
+        if self.value:
+            clauses.append(f"{value_col} = {mark}")
+            params.append(self.value)
+        if self.since_ms is not None:
+            clauses.append(f"{ts_col} >= {mark}")
+            params.append(self.since_ms)
+        if self.until_ms is not None:
+            clauses.append(f"{ts_col} < {mark}")
+            params.append(self.until_ms)
+        if self.before:
+            clauses.append(f"({ts_col}, {id_col}) < ({mark}, {mark})")
+            params.extend(self.before)
+        if self.after:
+            clauses.append(f"({ts_col}, {id_col}) > ({mark}, {mark})")
+            params.extend(self.after)
+        direction = "ASC" if self.after else "DESC"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        tail = f"ORDER BY {ts_col} {direction}, {id_col} {direction} LIMIT {mark}"
+        params.append(self.limit + 1)
+        return where, tail, params
+
+    def page(self, rows: Sequence[Dict[str, Any]], key: str) -> Dict[str, Any]:
+        """
+        Trim the over-fetched row, restore newest-first order and attach cursors:
+        `next_cursor` (pass as `before`) is set while older rows remain;
+        `prev_cursor` (pass as `after`) polls for anything newer.
+        """
+        more = len(rows) > self.limit
+        rows = list(rows[: self.limit])
+        if self.after:
+            rows.reverse()
+        first = encode_cursor(rows[0]["ts"], rows[0]["id"]) if rows else None
+        last = encode_cursor(rows[-1]["ts"], rows[-1]["id"]) if rows else None
+        # Paging forward from an `after` cursor, older rows always exist (the cursor row itself).
+        older = more or (self.after is not None and bool(rows))
+        return {
+            key: rows,
+            "next_cursor": last if older else None,
+            "prev_cursor": first or (encode_cursor(*self.after) if self.after else None),
+        }
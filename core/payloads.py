@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:  # optional: better ratio and much faster than zlib on DOM text
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the install
+    zstandard = None
+
+log = logging.getLogger("watchit.sqlite.payloads")
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+CODEC_RAW = "raw"
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+SCREENSHOT_KEY = "screenshots_b64"
+
+_zstd_c = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+_zstd_d = zstandard.ZstdDecompressor() if zstandard else None
+
+
+@dataclass(frozen=True)
+class Blob:
+    hash: str
+    codec: str
+    raw_size: int
+    data: bytes
+
+
+@dataclass(frozen=True)
+class PreparedPayload:
+    """An event's `data_json`, split and encoded off the writer thread."""
+
+    body: Optional[Blob]
+    screenshots: List[Blob] = field(default_factory=list)
+
+
+def encode(raw: bytes, *, compress: bool = True) -> Blob:
+    digest = hashlib.sha256(raw).hexdigest()
+    if not compress:
+        return Blob(digest, CODEC_RAW, len(raw), raw)
+    if _zstd_c is not None:
+        return Blob(digest, CODEC_ZSTD, len(raw), _zstd_c.compress(raw))
+    return Blob(digest, CODEC_ZLIB, len(raw), zlib.compress(raw, ZLIB_LEVEL))
+
+
+def decode(codec: str, data: bytes) -> bytes:
+    data = bytes(data)
+    if codec == CODEC_RAW:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if _zstd_d is None:
+            raise RuntimeError("payload is zstd-compressed but the zstandard package is not installed")
+        return _zstd_d.decompress(data)
+    raise ValueError(f"unknown payload codec {codec!r}")
+
+
+def prepare(data_json: Optional[str]) -> PreparedPayload:
+    """
+    Split screenshots out of `data_json` and encode both parts.
+
+    The JSON body is re-serialised with sorted keys so identical DOM samples
+    hash (and dedupe) identically; PNGs are stored as decoded bytes without a
+    second compression pass.
+    """
+    if not data_json:
+        return PreparedPayload(None)
+    try:
+        parsed = json.loads(data_json)
+    except Exception:
+        return PreparedPayload(encode(data_json.encode("utf-8")))
+    if not isinstance(parsed, dict):
+        return PreparedPayload(encode(data_json.encode("utf-8")))
+    shots: List[Blob] = []
+    for idx, b64 in enumerate(parsed.pop(SCREENSHOT_KEY, None) or []):
+        try:
+            shots.append(encode(base64.b64decode(b64, validate=True), compress=False))
+        except (binascii.Error, TypeError, ValueError):
+            log.warning("Dropping invalid screenshot %s while storing payload", idx)
+    body = json.dumps(parsed, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return PreparedPayload(encode(body), shots)
+
+
+def referenced_hashes(conn: Any, event_ids: Sequence[str]) -> List[str]:
+    """Blob hashes (body and screenshots) currently referenced by `event_ids`."""
+    if not event_ids:
+        return []
+    marks = ",".join("?" for _ in event_ids)
+    params = tuple(event_ids)
+    rows = conn.execute(
+        f"SELECT payload_hash FROM event WHERE id IN ({marks}) AND payload_hash IS NOT NULL "
+        f"UNION SELECT hash FROM event_screenshot WHERE event_id IN ({marks})",
+        params + params,
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def collect_garbage(conn: Any, hashes: Sequence[str]) -> int:
+    """Delete those of `hashes` that no event or screenshot row references any more."""
+    if not hashes:
+        return 0
+    marks = ",".join("?" for _ in hashes)
+    return conn.execute(
+        f"DELETE FROM payload_blob WHERE hash IN ({marks}) "
+        "AND NOT EXISTS (SELECT 1 FROM event WHERE event.payload_hash = payload_blob.hash) "
+        "AND NOT EXISTS (SELECT 1 FROM event_screenshot WHERE event_screenshot.hash = payload_blob.hash)",
+        tuple(hashes),
+    ).rowcount
+
+
+def write(conn: Any, event_id: str, prepared: PreparedPayload) -> Tuple[Optional[str], int]:
+    """
+    Store `prepared` for `event_id` (on the writer connection); returns (body hash, screenshot count).
+
+    When replacing an existing payload, the caller points the event row at the
+    returned hash in the same transaction and passes the previously referenced
+    hashes to `collect_garbage`.
+    """
+    blobs = ([prepared.body] if prepared.body else []) + prepared.screenshots
+    if blobs:
+        conn.executemany(
+            "INSERT OR IGNORE INTO payload_blob(hash, codec, raw_size, data) VALUES (?, ?, ?, ?)",
+            [(b.hash, b.codec, b.raw_size, b.data) for b in blobs],
+        )
+    conn.execute("DELETE FROM event_screenshot WHERE event_id=?", (event_id,))
+    if prepared.screenshots:
+        conn.executemany(
+            "INSERT INTO event_screenshot(event_id, idx, hash) VALUES (?, ?, ?)",
+            [(event_id, idx, b.hash) for idx, b in enumerate(prepared.screenshots)],
+        )
+    return (prepared.body.hash if prepared.body else None), len(prepared.screenshots)
+
+
+def load_body(raw: bytes) -> Dict[str, Any]:
+    text = raw.decode("utf-8", errors="replace")
+    try:
+        parsed = json.loads(text)
+    except Exception:
+        return {"raw": text}
+    return parsed if isinstance(parsed, dict) else {"raw": parsed}
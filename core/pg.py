@@ -6,6 +6,10 @@ import psycopg
 from psycopg.rows import dict_row
 
 from core.config import settings
+from core.paging import PageQuery
+
+# The mirrored payload stays out of listings; SQLite serves it on demand.
+EVENT_COLUMNS = "id, child_id, ts, kind, url, title, tab_id, referrer"
 
 
 def _require_pg_conn():
@@ -14,50 +18,29 @@ def _require_pg_conn():
     return psycopg.connect(settings.pg_dsn, row_factory=dict_row)
 
 
-def fetch_recent_events(child_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+def fetch_events_page(page: PageQuery) -> Dict[str, Any]:
+    where, tail, params = page.sql(ts_col="ts", id_col="id", child_col="child_id", value_col="kind", mark="%s")
     conn = _require_pg_conn()
     with conn, conn.cursor() as cur:
-        if child_id:
-            cur.execute(
-                "SELECT * FROM watchit_events WHERE child_id=%s ORDER BY ts DESC LIMIT %s",
-                (child_id, limit),
-            )
-        else:
-            cur.execute(
-                "SELECT * FROM watchit_events ORDER BY ts DESC LIMIT %s",
-                (limit,),
-            )
-        return cur.fetchall()
+        cur.execute(f"SELECT {EVENT_COLUMNS} FROM watchit_events {where} {tail}", params)
+        return page.page(cur.fetchall(), "events")
 
 
-def fetch_recent_decisions(child_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+def fetch_decisions_page(page: PageQuery) -> Dict[str, Any]:
+    where, tail, params = page.sql(ts_col="e.ts", id_col="d.id", child_col="e.child_id", value_col="d.action", mark="%s")
     conn = _require_pg_conn()
     with conn, conn.cursor() as cur:
-        if child_id:
-            cur.execute(
-                """
-                SELECT d.*, e.url, e.title, e.ts
-                FROM watchit_decisions d
-                JOIN watchit_events e ON e.id = d.event_id
-                WHERE e.child_id=%s
-                ORDER BY e.ts DESC
-                LIMIT %s
-                """,
-                (child_id, limit),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT d.*, e.url, e.title, e.ts
-                FROM watchit_decisions d
-                JOIN watchit_events e ON e.id = d.event_id
-                ORDER BY e.ts DESC
-                LIMIT %s
-                """,
-                (limit,),
-            )
-        rows = cur.fetchall()
-        return rows
+        cur.execute(
+            f"""
+            SELECT d.*, e.url, e.title, e.ts, e.child_id
+            FROM watchit_decisions d
+            JOIN watchit_events e ON e.id = d.event_id
+            {where}
+            {tail}
+            """,
+            params,
+        )
+        return page.page(cur.fetchall(), "decisions")
 
 
 def fetch_children() -> List[Dict[str, Any]]:
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Category value of the per-decision total row. Every counted decision adds
+# one row under ALL_CATEGORIES plus one per category it was tagged with, so
+# totals never double count and category breakdowns need no JSON decoding.
+ALL_CATEGORIES = "*"
+NO_DOMAIN = ""
+
+
+def domain_of(url: Optional[str]) -> str:
+    try:
+        host = (urlsplit(url or "").hostname or "").lower()
+    except ValueError:
+        return NO_DOMAIN
+    return host[4:] if host.startswith("www.") else host
+
+
+def day_of(ts_ms: Optional[int]) -> str:
+    """Local calendar day of an event timestamp."""
+    return datetime.fromtimestamp((ts_ms or 0) / 1000).strftime("%Y-%m-%d")
+
+
+def first_day(days: int) -> str:
+    return (datetime.now() - timedelta(days=max(1, days) - 1)).strftime("%Y-%m-%d")
+
+
+def _categories(details_json: Any) -> List[str]:
+    details = details_json
+    if isinstance(details_json, (str, bytes)):
+        try:
+            details = json.loads(details_json or "{}")
+        except Exception:
+            details = {}
+    cats = (details or {}).get("categories") or []
+    return sorted({str(c) for c in cats if c})
+
+
+def is_provisional(details_json: Any) -> bool:
+    details = details_json
+    if isinstance(details_json, (str, bytes)):
+        try:
+            details = json.loads(details_json or "{}")
+        except Exception:
+            return False
+    return bool((details or {}).get("provisional"))
+
+
+def _bump(conn: Any, key: Tuple[str, str, str, str, str], decisions: int, overrides: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO decision_rollup(child_id, day, action, category, domain, decisions, overrides)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(child_id, day, action, category, domain) DO UPDATE SET
+            decisions = decisions + excluded.decisions,
+            overrides = overrides + excluded.overrides
+        """,
+        (*key, decisions, overrides),
+    )
+
+
+def apply(conn: Any, event: Sequence[Any], action: str, details_json: Any, *, overridden: bool, sign: int) -> None:
+    """
+    Add (`sign=1`) or remove (`sign=-1`) one decision's contribution.
+
+    `event` is the (child_id, ts, url) of the decision's event.
+    """
+    child_id, ts, url = event
+    base = (child_id or "", day_of(ts), action or "")
+    domain = domain_of(url)
+    for category in [ALL_CATEGORIES, *_categories(details_json)]:
+        _bump(conn, (*base, category, domain), sign, sign if overridden else 0)
+
+
+def event_key(conn: Any, event_id: str) -> Optional[Tuple[Any, Any, Any]]:
+    return conn.execute("SELECT child_id, ts, url FROM event WHERE id=?", (event_id,)).fetchone()
+
+
+def record_decision(conn: Any, event_id: str, decision_id: str, action: str, details_json: str) -> None:
+    """
+    Count a new final decision, replacing whichever earlier decision of the
+    same event was counted (e.g. the pre-OCR verdict). Provisional decisions
+    are not counted; the final verdict that follows them is.
+    """
+    if is_provisional(details_json):
+        return
+    event = event_key(conn, event_id)
+    if event is None:
+        return
+    for prev_action, prev_details, prev_manual in conn.execute(
+        "SELECT action, details_json, manual_flagged FROM decision WHERE event_id=? AND rolled_up=1 AND id != ?",
+        (event_id, decision_id),
+    ).fetchall():
+        apply(conn, event, prev_action, prev_details, overridden=bool(prev_manual), sign=-1)
+    conn.execute("UPDATE decision SET rolled_up=0 WHERE event_id=? AND rolled_up=1 AND id != ?", (event_id, decision_id))
+    apply(conn, event, action, details_json, overridden=False, sign=1)
+    conn.execute("UPDATE decision SET rolled_up=1 WHERE id=?", (decision_id,))
+
+
+def record_override(conn: Any, decision_id: str, new_action: str, before: Sequence[Any]) -> None:
+    """Move a counted decision to `new_action`; `before` is its (event_id, action, details_json, manual_flagged, rolled_up) prior to the update."""
+    event_id, old_action, details_json, was_flagged, rolled_up = before
+    if not rolled_up:
+        return
+    event = event_key(conn, event_id)
+    if event is None:
+        return
+    apply(conn, event, old_action, details_json, overridden=bool(was_flagged), sign=-1)
+    apply(conn, event, new_action, details_json, overridden=True, sign=1)
+
+
+def rebuild(conn: Any, batch: int = 500) -> int:
+    """Recount every event's latest final decision (used to backfill the tables)."""
+    conn.execute("DELETE FROM decision_rollup")
+    conn.execute("UPDATE decision SET rolled_up=0 WHERE rolled_up=1")
+    counted = 0
+    last = ""
+    while True:
+        events = conn.execute(
+            "SELECT id, child_id, ts, url FROM event WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+        ).fetchall()
+        if not events:
+            return counted
+        for event_id, child_id, ts, url in events:
+            rows = conn.execute(
+                "SELECT id, action, details_json, manual_flagged FROM decision WHERE event_id=? ORDER BY rowid DESC",
+                (event_id,),
+            ).fetchall()
+            for decision_id, action, details_json, manual in rows:
+                if is_provisional(details_json):
+                    continue
+                apply(conn, (child_id, ts, url), action, details_json, overridden=bool(manual), sign=1)
+                conn.execute("UPDATE decision SET rolled_up=1 WHERE id=?", (decision_id,))
+                counted += 1
+                break
+        last = events[-1][0]
+
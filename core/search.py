@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Columns of `page_fts`, in declaration order (bm25 weights follow the same order).
+FTS_COLUMNS = ("title", "url", "dom", "ocr")
+BM25_WEIGHTS = (8.0, 4.0, 1.0, 1.0)
+MAX_DOC_CHARS = 32_000
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def document_text(data_json: Optional[str]) -> str:
+    """Searchable page text from an event's `data_json` (screenshots are ignored)."""
+    if not data_json:
+        return ""
+    try:
+        data = json.loads(data_json) or {}
+    except Exception:
+        return ""
+    if not isinstance(data, dict):
+        return ""
+    parts = [data.get("dom_sample") or "", data.get("text") or ""]
+    return "\n".join(p for p in parts if isinstance(p, str) and p)[:MAX_DOC_CHARS]
+
+
+def url_text(url: Optional[str]) -> str:
+    # Split hosts and paths into words so "youtube" matches www.youtube.com/watch
+    return " ".join(_TOKEN.findall(url or ""))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word must match (implicit AND); the last word also matches as a
+    prefix so results update while typing. FTS5 operators in user input are
+    treated as plain words.
+    """
+    words = _TOKEN.findall(query or "")
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def index_document(conn: Any, event_id: str, *, title: Optional[str] = None, url: Optional[str] = None,
+                   dom: Optional[str] = None, ocr: Optional[str] = None) -> None:
+    """
+    Insert or refresh the search document of `event_id` on the writer connection.
+
+    Columns passed as None keep their indexed value, so OCR text can be added
+    after the page itself was indexed.
+    """
+    row = conn.execute("SELECT docid FROM page_doc WHERE event_id=?", (event_id,)).fetchone()
+    values = {"title": title, "url": url_text(url) if url is not None else None, "dom": dom, "ocr": ocr}
+    if row:
+        docid = row[0]
+        old = conn.execute(f"SELECT {', '.join(FTS_COLUMNS)} FROM page_fts WHERE rowid=?", (docid,)).fetchone()
+        if old:
+            for col, prev in zip(FTS_COLUMNS, old):
+                if values[col] is None:
+                    values[col] = prev
+            conn.execute("DELETE FROM page_fts WHERE rowid=?", (docid,))
+    else:
+        docid = conn.execute("INSERT INTO page_doc(event_id) VALUES (?)", (event_id,)).lastrowid
+    conn.execute(
+        f"INSERT INTO page_fts(rowid, {', '.join(FTS_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+        (docid, *[(values[c] or "") for c in FTS_COLUMNS]),
+    )
+
+
+def delete_documents(conn: Any, event_ids: Tuple[str, ...]) -> None:
+    if not event_ids:
+        return
+    marks = ",".join("?" for _ in event_ids)
+    conn.execute(f"DELETE FROM page_fts WHERE rowid IN (SELECT docid FROM page_doc WHERE event_id IN ({marks}))", event_ids)
+    conn.execute(f"DELETE FROM page_doc WHERE event_id IN ({marks})", event_ids)
+
+
+def search(
+    conn: Any,
+    query: str,
+    *,
+    child_id: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Ranked matches (best first) with highlighted title and a text snippet."""
+    expr = match_expression(query)
+    if expr is None:
+        return []
+    clauses, params = ["page_fts MATCH ?"], [expr]
+    if child_id:
+        clauses.append("e.child_id = ?")
+        params.append(child_id)
+    if since_ms is not None:
+        clauses.append("e.ts >= ?")
+        params.append(since_ms)
+    if until_ms is not None:
+        clauses.append("e.ts < ?")
+        params.append(until_ms)
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    cur = conn.execute(
+        f"""
+        SELECT e.id AS event_id, e.child_id, e.ts, e.kind, e.url, e.title,
+               highlight(page_fts, 0, '<mark>', '</mark>') AS title_html,
+               snippet(page_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+               bm25(page_fts, {weights}) AS score
+        FROM page_fts
+        JOIN page_doc p ON p.docid = page_fts.rowid
+        JOIN event e ON e.id = p.event_id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+        """,
+        (*params, limit, offset),
+    )
+    cols = [c[0] for c in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
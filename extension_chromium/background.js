@@ -2,6 +2,7 @@ const API = "http://127.0.0.1:4849";
 const childId = "child_main";
 
 let es = null;
+const pendingEvents = new Map(); // event_id -> navigation context awaiting a final verdict
 function connectSSE(){
   if(es) es.close();
   es = new EventSource(`${API}/v1/stream/decisions`);
@@ -9,6 +10,12 @@ function connectSSE(){
     try{
       const msg = JSON.parse(e.data);
       chrome.tabs.query({}, tabs => tabs.forEach(t => chrome.tabs.sendMessage(t.id, { type: "watchit_decision", payload: msg })));
+      // Journal/deadline mode: the final verdict arrives over SSE and may still ask for OCR.
+      const pending = msg.event_id && pendingEvents.get(msg.event_id);
+      if(pending && !msg.provisional && !msg.superseded){
+        pendingEvents.delete(msg.event_id);
+        if(msg.needs_ocr) requestOcrUpgrade(msg.event_id, pending).catch(()=>{});
+      }
     }catch(_){}
   };
   es.onerror = ()=> setTimeout(connectSSE, 1500);
@@ -34,6 +41,21 @@ async function captureTabScreenshot(windowId){
   });
 }
 
+async function requestOcrUpgrade(eventId, ctx){
+  // Upgrade with screenshot (PaddleOCR server-side) only when backend confidence is low
+  const b64 = await captureTabScreenshot(ctx.windowId);
+  if(!b64) return;
+  const upgradeEvt = {
+    id: eventId, child_id: childId, ts: Date.now(), kind: "content",
+    url: ctx.url, title: ctx.title, tab_id: `c-${ctx.tabId}`, referrer: "",
+    data_json: JSON.stringify({ dom_sample: ctx.domSample, screenshots_b64: [b64] })
+  };
+  const r2 = await fetch(`${API}/v1/event/upgrade`, { method: "POST", headers: { "content-type": "application/json" }, body: JSON.stringify(upgradeEvt) });
+  const dec2 = await r2.json();
+  if(dec2.superseded) return;
+  chrome.tabs.sendMessage(ctx.tabId, { type: "watchit_decision", payload: dec2 });
+}
+
 chrome.webNavigation.onCommitted.addListener(async (details)=>{
   if(details.frameId !== 0) return;
   const tab = await chrome.tabs.get(details.tabId);
@@ -50,19 +72,19 @@ chrome.webNavigation.onCommitted.addListener(async (details)=>{
     const r = await fetch(`${API}/v1/event`, { method: "POST", headers: { "content-type": "application/json" }, body: JSON.stringify(baseEvt) });
     const dec = await r.json();
     const eventId = dec.event_id;
+    if(dec.superseded) return; // a newer navigation in this tab took over
+    const ctx = { tabId: details.tabId, windowId: tab.windowId, url: details.url, title: tab.title || "", domSample };
+    if(dec.queued){
+      // Ack only; the decision is streamed once the journal worker has run the pipeline.
+      pendingEvents.set(eventId, ctx);
+      return;
+    }
     chrome.tabs.sendMessage(details.tabId, { type: "watchit_decision", payload: dec });
+    if(dec.provisional){
+      pendingEvents.set(eventId, ctx);
+      return;
+    }
     if(!dec.needs_ocr) return;
-
-    // Upgrade with screenshot (PaddleOCR server-side) only when backend confidence is low
-    const b64 = await captureTabScreenshot(tab.windowId);
-    if(!b64) return;
-    const upgradeEvt = {
-      id: eventId, child_id: childId, ts: Date.now(), kind: "content",
-      url: details.url, title: tab.title || "", tab_id: `c-${details.tabId}`, referrer: "",
-      data_json: JSON.stringify({ dom_sample: domSample, screenshots_b64: [b64] })
-    };
-    const r2 = await fetch(`${API}/v1/event/upgrade`, { method: "POST", headers: { "content-type": "application/json" }, body: JSON.stringify(upgradeEvt) });
-    const dec2 = await r2.json();
-    chrome.tabs.sendMessage(details.tabId, { type: "watchit_decision", payload: dec2 });
+    await requestOcrUpgrade(eventId, ctx);
   }catch(_){}
 });
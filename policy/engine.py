@@ -27,11 +27,9 @@ def _in_quiet_hours(now: datetime, days_csv: str, quiet_spec: str) -> bool:
         return not (end < t < start)
 
 def _paused_until() -> int | None:
-    cur = db.conn.cursor()
-    cur.execute("SELECT value FROM settings WHERE key='paused_until'")
-    row = cur.fetchone()
-    if not row: return None
-    try: return int(row[0])
+    value = db.get_setting("paused_until")
+    if not value: return None
+    try: return int(value)
     except: return None
 
 STRICTNESS_THRESHOLDS = {
@@ -110,7 +108,9 @@ class PolicyEngine:
                 act = "block"
             cats = judge_json.get("categories",[])
             sev  = judge_json.get("severity","low")
-            reason = f"llm:{sev}"
+            # "linear:" and "fallback:" verdicts are kept apart so the linear tier trains only on
+            # real model verdicts, never on its own output or on outage/refusal guesses.
+            reason = f"{judge_json.get('source', 'llm')}:{sev}"
             return {"action": act, "reason": reason, "categories": cats}
 
         return {"action":"allow","reason":"default allow","categories":[]}
@@ -1,14 +1,20 @@
 from __future__ import annotations
 import asyncio
+import copy
 import json
 import logging
 from typing import Dict, Any, Optional
-from core.db import db
+from core.db import db, OCR_ANALYSIS_MODEL
 from core.config import settings
 from core.activity_logger import log_step
-from analysis.graph import app_graph, MonitorState
+from analysis.graph import app_graph, resume_graph, MonitorState, node_headline_layer, streamed_action
+from analysis.llm_judge import is_fallback_verdict
 from policy.engine import PolicyEngine
 from core.screenshot_store import persist_screenshots_async
+from runtime.executor import pipeline_executor, PRIORITY_NAVIGATION, PRIORITY_UPGRADE
+from runtime.checkpoints import checkpoint_key, pipeline_checkpoints
+from runtime.scheduler import tab_scheduler
+from runtime.verdict_cache import upgrade_verdict_key, verdict_cache, verdict_key
 
 class DecisionBus:
     def __init__(self):
@@ -30,6 +36,69 @@ bus = DecisionBus()
 policy = PolicyEngine()
 logger = logging.getLogger("watchit.bootstrap")
 
+# Pipeline runs currently in flight, keyed by analysis key. Concurrent identical
+# events await the same task instead of each paying for an LLM call.
+_inflight: Dict[str, asyncio.Task] = {}
+_inflight_waiters: Dict[str, int] = {}
+
+
+async def _run_graph(cache_key: str, state: MonitorState, *, upgrade: bool, graph: Any = app_graph) -> Dict[str, Any]:
+    priority = PRIORITY_UPGRADE if upgrade else PRIORITY_NAVIGATION
+    result = await pipeline_executor.run(graph.invoke, state, priority=priority)
+    if is_fallback_verdict(result.get("judge_json")):
+        # A short outage must not pin keyword-only guesses for the cache TTL.
+        log_step("verdict_cache_skip_fallback", state.event, {"key": cache_key})
+    else:
+        # The disk tier commits on the writer (and prunes every 100th put): keep it off the loop.
+        await asyncio.to_thread(verdict_cache.put, cache_key, result)
+    return result
+
+
+async def _analyze_shared(cache_key: str, state: MonitorState, *, upgrade: bool) -> MonitorState:
+    flight_key = f"{cache_key}:{'upgrade' if upgrade else 'base'}"
+    task = _inflight.get(flight_key)
+    if task is None:
+        task = asyncio.create_task(_run_graph(cache_key, state, upgrade=upgrade))
+        _inflight[flight_key] = task
+
+        def _forget(t: asyncio.Task) -> None:
+            if _inflight.get(flight_key) is t:
+                del _inflight[flight_key]
+                _inflight_waiters.pop(flight_key, None)
+
+        task.add_done_callback(_forget)
+    else:
+        log_step("pipeline_coalesced", state.event, {"upgrade": upgrade, "key": cache_key})
+    _inflight_waiters[flight_key] = _inflight_waiters.get(flight_key, 0) + 1
+    try:
+        # Shield so one caller going away does not cancel the run for the others.
+        result = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if _inflight.get(flight_key) is task and _inflight_waiters.get(flight_key, 0) <= 1 and not task.done():
+            # Last interested caller (e.g. superseded navigation): drop the run.
+            task.cancel()
+        raise
+    finally:
+        if flight_key in _inflight_waiters:
+            _inflight_waiters[flight_key] -= 1
+    return _state_from_result(state, result)
+
+
+def _state_from_result(state: MonitorState, result: Dict[str, Any]) -> MonitorState:
+    shared = copy.deepcopy({k: v for k, v in result.items() if k not in ("event", "child_profile")})
+    return MonitorState(event=state.event, child_profile=state.child_profile, **shared)
+
+
+async def _resume_upgrade(cache_key: str, event: Dict[str, Any], profile: Dict[str, Any]) -> Optional[MonitorState]:
+    """Continue the first pass of this event from its checkpoint: OCR plus a delta LLM prompt only."""
+    checkpoint = await asyncio.to_thread(pipeline_checkpoints.take, str(event["id"]), checkpoint_key(event, profile))
+    if checkpoint is None:
+        return None
+    log_step("upgrade_resumed", event, {"key": cache_key})
+    state = MonitorState(event=event, child_profile=profile, **checkpoint)
+    result = await _run_graph(cache_key, state, upgrade=True, graph=resume_graph)
+    return _state_from_result(state, result)
+
 
 def _extract_screenshots(event: Dict[str, Any]) -> list[str]:
     payload = event.get("data_json")
@@ -130,36 +199,248 @@ async def publish_decision_row(row: Dict[str, Any]) -> None:
     message = _decision_message_from_row(row)
     await bus.publish(message)
 
-async def process_event(event: Dict[str, Any], *, upgrade: bool = False) -> Dict[str, Any]:
+def admit_event(event: Dict[str, Any]) -> str:
+    """
+    Give a journaled event its id and child and write its row (the encrypted
+    store of its body) before the ingest journal acknowledges it.
+    """
     active_child = db.get_active_child_id()
     if active_child:
         event["child_id"] = active_child
-    event_id = event.get("id")
-    if not upgrade or not event_id:
-        event_id = db.add_event(event)
-        event["id"] = event_id
-    else:
-        db.update_event_data_json(event_id, event.get("data_json") or "")
+    event["child_id"] = event.get("child_id") or "child_default"
+    event["id"] = event.get("id") or db.new_event_id()
+    if not db.event_exists(event["id"]):
+        db.add_event(event)
+    return event["id"]
+
+
+def load_admitted_event(event_id: str) -> Optional[Dict[str, Any]]:
+    """A journaled event still awaiting a decision, or None when it has one (or is gone)."""
+    if db.has_final_decision(event_id):
+        return None
+    return db.get_event(event_id)
+
 
-    child_id = event.get("child_id")
-    profile = db.get_child_profile(child_id) if child_id else None
-    if not profile and child_id:
+def _child_profile(child_id: str) -> Dict[str, Any]:
+    """The child's profile, created with defaults on first sight (a writer commit)."""
+    profile = db.get_child_profile(child_id)
+    if not profile:
         db.add_child_profile(child_id)
         profile = db.get_child_profile(child_id)
-    if not profile:
-        profile = {"id": child_id or "child_default", "strictness": "standard", "age": 12}
+    return profile or {"id": child_id, "strictness": "standard", "age": 12}
+
+
+async def process_event(
+    event: Dict[str, Any], *, upgrade: bool = False, replay: bool = False, wait_final: bool = False
+) -> Dict[str, Any]:
+    """
+    Decide one event. With a decision deadline the provisional answer is
+    returned while the final one is still being computed; `wait_final` holds
+    the return until the final decision is committed as well.
+    """
+    active_child = db.get_active_child_id()
+    if active_child:
+        event["child_id"] = active_child
+    event_id = event.get("id")
+    insert_event = False  # an upgrade's row exists; its data_json is refreshed in _finalize
+    if not (upgrade and event_id):
+        # Journaled events are written at ingest, and a replay may find the row already there.
+        insert_event = not (replay and event_id and await asyncio.to_thread(db.event_exists, event_id))
+        event_id = event_id or db.new_event_id()
+        event["id"] = event_id
+
+    child_id = event.get("child_id") or "child_default"
+    event["child_id"] = child_id
+    profile = await asyncio.to_thread(_child_profile, child_id)
+
+    if insert_event:
+        # Write the row before analysis, as the PG replicator syncs events in `ts` order and
+        # must not find a slow event appearing behind ones it has already passed.
+        await asyncio.to_thread(db.add_event, event, ensure_child=False)
 
     _schedule_screenshot_save(str(event_id), event)
     log_step("event_received", event, {"upgrade": upgrade})
-    state = MonitorState(event=event, child_profile=profile)
-    state = MonitorState(**app_graph.invoke(state))
 
-    db.add_analysis(event_id, "fast+ocr", "1.0", state.fast_scores, label="")
-    if state.judge_json:
-        db.add_analysis(event_id, "llm_judge", "1.0", state.judge_json, label=state.judge_json.get("action",""))
-    if state.headline_result:
-        db.add_analysis(event_id, "headline_agent", "1.0", state.headline_result, label=state.headline_result.get("risk",""))
+    tab_id = event.get("tab_id")
+    if upgrade and tab_scheduler.is_superseded(tab_id, event_id):
+        # The tab has already navigated elsewhere; OCR for the old page is moot.
+        log_step("upgrade_superseded", event, {"tab_id": tab_id})
+        return {"event_id": event_id, "superseded": True, "upgrade": True, "needs_ocr": False}
+    if not upgrade:
+        tab_scheduler.claim(tab_id, event_id)
+
+    work = asyncio.create_task(_decide(event, profile, upgrade=upgrade, wait_final=wait_final))
+    tab_scheduler.track(tab_id, event_id, work)
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        if work.cancelled():
+            log_step("event_superseded", event, {"tab_id": tab_id, "upgrade": upgrade})
+            return {"event_id": event_id, "superseded": True, "upgrade": upgrade, "needs_ocr": False}
+        raise
+
+
+def _write_event_row(event: Dict[str, Any], *, upgrade: bool) -> None:
+    if upgrade:
+        db.update_event_data_json(event["id"], event.get("data_json") or "")
+
+
+async def _decide(event: Dict[str, Any], profile: Dict[str, Any], *, upgrade: bool, wait_final: bool = False) -> Dict[str, Any]:
+    cache_key = verdict_key(event, profile)
+    # A memory miss falls through to an SQLCipher read; run the lookup off the loop.
+    cached = await asyncio.to_thread(verdict_cache.get, cache_key)
+    if upgrade:
+        # An upgrade pass may reuse a verdict that already settled without OCR, or
+        # one computed from these very screenshots; it runs and caches under the latter.
+        if cached is not None and cached.get("needs_screenshot"):
+            cached = None
+        cache_key = upgrade_verdict_key(cache_key, event)
+        cached = cached or await asyncio.to_thread(verdict_cache.get, cache_key)
+    if cached is not None:
+        state = MonitorState(event=event, child_profile=profile, **cached)
+        log_step("verdict_cache_hit", event, {"upgrade": upgrade, "key": cache_key})
+        return await _finalize(event, profile, state, upgrade=upgrade)
+
+    if upgrade:
+        state = await _resume_upgrade(cache_key, event, profile)
+        if state is not None:
+            return await _finalize(event, profile, state, upgrade=True)
 
+    base_state = MonitorState(event=event, child_profile=profile)
+    deadline_ms = settings.decision_deadline_ms
+    if upgrade or deadline_ms <= 0:
+        state = await _analyze_shared(cache_key, base_state, upgrade=upgrade)
+        return await _finalize(event, profile, state, upgrade=upgrade)
+
+    analysis = asyncio.create_task(_analyze_shared(cache_key, base_state, upgrade=False))
+    try:
+        state = await asyncio.wait_for(asyncio.shield(analysis), timeout=deadline_ms / 1000.0)
+    except asyncio.TimeoutError:
+        message = await _publish_provisional(event, profile)
+        finalizer = asyncio.create_task(_finalize_when_ready(analysis, event, profile))
+        _track_background(finalizer, event["id"])
+        tab_scheduler.track(event.get("tab_id"), event["id"], finalizer)
+        if wait_final:
+            await finalizer
+        return message
+    except asyncio.CancelledError:
+        analysis.cancel()
+        raise
+    return await _finalize(event, profile, state, upgrade=False)
+
+
+def _track_background(task: asyncio.Task, event_id: Any) -> None:
+    def _finished(t: asyncio.Task) -> None:
+        if t.cancelled():
+            return
+        exc = t.exception()
+        if exc is not None:
+            logger.error("Background finalization failed for event %s", event_id, exc_info=exc)
+
+    task.add_done_callback(_finished)
+
+
+async def _publish_provisional(event: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer within the deadline from the headline layer, allow/block lists and schedule."""
+    fast = node_headline_layer(MonitorState(event=event, child_profile=profile))
+    decision = policy.decide(event, fast.fast_scores, fast.judge_json, profile, fast.headline_result)
+    if decision.get("reason") == "default allow":
+        early = streamed_action(event["id"])
+        if early:
+            # The LLM has already committed to an action; the rest of its verdict is still streaming.
+            decision = {"action": early, "reason": "llm_streamed_action", "categories": []}
+        else:
+            # Nothing decisive yet; hold the page until the LLM verdict lands.
+            decision = {"action": "warn", "reason": "pending_llm", "categories": []}
+    confidence = fast.confidence if fast.judge_json else 0.0
+    decision_id = await asyncio.to_thread(
+        db.add_decision,
+        event["id"],
+        settings.policy_version,
+        decision["action"],
+        decision["reason"],
+        {"categories": decision.get("categories", []), "confidence": confidence, "provisional": True},
+    )
+    message = _format_decision_message(
+        decision_id,
+        event,
+        decision,
+        confidence=confidence,
+        need_screenshot=False,
+        headline_result=fast.headline_result,
+        llm_rationale=None,
+    )
+    message["provisional"] = True
+    log_step("decision_provisional", event, {"decision": decision, "deadline_ms": settings.decision_deadline_ms})
+    await bus.publish(message)
+    return message
+
+
+async def _finalize_when_ready(analysis: asyncio.Task, event: Dict[str, Any], profile: Dict[str, Any]) -> None:
+    state = await analysis
+    await _finalize(event, profile, state, upgrade=False, announce_upgrade=True)
+
+
+def _record_outcome(
+    event: Dict[str, Any],
+    state: MonitorState,
+    decision: Dict[str, Any],
+    confidence: float,
+    llm_rationale: Optional[str],
+    *,
+    upgrade: bool,
+) -> str:
+    event_id = event["id"]
+    # One transaction for the analyses, the decision and (on upgrade) the refreshed
+    # payload; it is committed on leaving the block, before the decision is published.
+    with db.unit_of_work():
+        _write_event_row(event, upgrade=upgrade)
+        db.add_analysis(event_id, "fast+ocr", "1.0", state.fast_scores, label="")
+        if state.judge_json:
+            judge_ms = sum(t["latency_ms"] for t in state.judge_tiers) if state.judge_tiers else None
+            db.add_analysis(event_id, "llm_judge", "1.0", state.judge_json, label=state.judge_json.get("action",""), latency_ms=judge_ms)
+        if any(t["min_confidence"] is not None for t in state.judge_tiers):
+            # Model cascade: one row per tier consulted, so escalation rates and tier latency can be tuned.
+            for t in state.judge_tiers:
+                verdict = t["verdict"]
+                db.add_analysis(
+                    event_id,
+                    "llm_tier",
+                    t["model"],
+                    {**verdict, "tier": t["tier"], "min_confidence": t["min_confidence"], "escalated": t["escalated"]},
+                    label=verdict.get("action", ""),
+                    latency_ms=t["latency_ms"],
+                )
+        if state.headline_result:
+            db.add_analysis(event_id, "headline_agent", "1.0", state.headline_result, label=state.headline_result.get("risk",""))
+        if state.linear_result:
+            db.add_analysis(event_id, "linear_tier", state.linear_result.get("version", ""), state.linear_result, label=state.linear_result.get("action", ""))
+        if state.ocr_text:
+            db.add_analysis(event_id, OCR_ANALYSIS_MODEL, "1.0", {"text": state.ocr_text}, label="")
+        decision_id = db.add_decision(
+            event_id,
+            settings.policy_version,
+            decision["action"],
+            decision["reason"],
+            {
+                "categories": decision.get("categories", []),
+                "confidence": confidence,
+                **({"rationale": llm_rationale} if llm_rationale else {}),
+            },
+        )
+    return decision_id
+
+
+async def _finalize(
+    event: Dict[str, Any],
+    profile: Dict[str, Any],
+    state: MonitorState,
+    *,
+    upgrade: bool,
+    announce_upgrade: bool = False,
+) -> Dict[str, Any]:
+    event_id = event["id"]
+    streamed_action(event_id, forget=True)
     confidence = state.judge_json.get("confidence", 1.0) if state.judge_json else 1.0
     need_screenshot = settings.enable_ocr and not upgrade and state.needs_screenshot
 
@@ -172,18 +453,17 @@ async def process_event(event: Dict[str, Any], *, upgrade: bool = False) -> Dict
     if llm_rationale:
         decision["llm_rationale"] = llm_rationale
 
-    decision_id = db.add_decision(
-        event_id,
-        settings.policy_version,
-        decision["action"],
-        decision["reason"],
-        {
-            "categories": decision.get("categories", []),
-            "confidence": confidence,
-            **({"rationale": llm_rationale} if llm_rationale else {}),
-        },
+    # Commits on the writer thread; the event loop keeps serving other events meanwhile.
+    decision_id = await asyncio.to_thread(
+        _record_outcome, event, state, decision, confidence, llm_rationale, upgrade=upgrade
     )
 
+    if need_screenshot:
+        # The upgrade with screenshots resumes from here instead of starting over.
+        await asyncio.to_thread(
+            pipeline_checkpoints.put, str(event_id), checkpoint_key(event, profile), state.model_dump(exclude={"event", "child_profile"})
+        )
+
     message = _format_decision_message(
         decision_id,
         event,
@@ -193,7 +473,7 @@ async def process_event(event: Dict[str, Any], *, upgrade: bool = False) -> Dict
         headline_result=state.headline_result,
         llm_rationale=llm_rationale,
     )
-    message["upgrade"] = bool(upgrade)
+    message["upgrade"] = bool(upgrade or announce_upgrade)
     log_step("decision_finalized", event, {"decision": decision, "confidence": confidence, "headline_agent": state.headline_result})
     await bus.publish(message)
     return message
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+from core.db import db
+from runtime.verdict_cache import verdict_key
+
+log = logging.getLogger("watchit.checkpoints")
+
+# MonitorState fields an OCR upgrade resumes from. Judge tiers are left out so
+# the upgrade records only the model calls it makes itself.
+CHECKPOINT_FIELDS = (
+    "fast_scores",
+    "judge_json",
+    "headline_result",
+    "linear_result",
+    "confidence",
+    "ocr_text",
+    "need_llm",
+    "need_ocr",
+    "needs_screenshot",
+)
+
+
+def checkpoint_key(event: Dict[str, Any], child_profile: Dict[str, Any]) -> str:
+    """The verdict key without the event kind: the extension re-posts a visit as kind "content" for OCR."""
+    return verdict_key({**event, "kind": ""}, child_profile)
+
+
+class PipelineCheckpoints:
+    """
+    First-pass pipeline state per event, kept until its OCR upgrade arrives.
+
+    A pass that ends asking for screenshots stores its state here; the upgrade
+    resumes from it instead of re-running the headline layer and the first
+    LLM call. Entries live in memory with an encrypted on-disk copy, so an
+    upgrade arriving after a restart can still resume, and are consumed once.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        self.counters = {"stores": 0, "resumed": 0, "missing": 0, "stale": 0, "expired": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.pipeline_checkpoints and settings.pipeline_checkpoint_ttl_seconds > 0
+
+    def _fresh(self, stored_at: float, now: float) -> bool:
+        return now - stored_at <= settings.pipeline_checkpoint_ttl_seconds
+
+    def put(self, event_id: str, key: str, state: Dict[str, Any]) -> None:
+        """Checkpoint `state` for `event_id`; `key` is its checkpoint_key."""
+        if not self.enabled:
+            return
+        payload = {"key": key, "state": {field: state.get(field) for field in CHECKPOINT_FIELDS if field in state}}
+        stored_at = time.time()
+        with self._lock:
+            self._mem[event_id] = (stored_at, payload)
+            self._mem.move_to_end(event_id)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+            self.counters["stores"] += 1
+            self._puts_since_prune += 1
+            prune = self._puts_since_prune >= 100
+            if prune:
+                self._puts_since_prune = 0
+        try:
+            db.put_pipeline_checkpoint(event_id, payload, int(stored_at * 1000))
+            if prune:
+                db.prune_pipeline_checkpoints(int((stored_at - settings.pipeline_checkpoint_ttl_seconds) * 1000))
+        except Exception:
+            log.exception("Pipeline checkpoint write failed")
+
+    def take(self, event_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        The checkpointed state of `event_id`, removed from the store. None when
+        there is none, it expired, or it was computed for other page text or
+        another child profile (`key` differs).
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._mem.pop(event_id, None)
+        try:
+            # Always consume the disk copy as well, even when memory answered.
+            row = db.take_pipeline_checkpoint(event_id)
+        except Exception:
+            log.exception("Pipeline checkpoint lookup failed")
+            row = None
+        entry = entry or row
+        with self._lock:
+            if entry is None:
+                self.counters["missing"] += 1
+                return None
+            stored_at, payload = entry
+            if not self._fresh(stored_at, time.time()):
+                self.counters["expired"] += 1
+                return None
+            if payload.get("key") != key:
+                self.counters["stale"] += 1
+                return None
+            self.counters["resumed"] += 1
+        return dict(payload.get("state") or {})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "entries": len(self._mem)}
+
+
+pipeline_checkpoints = PipelineCheckpoints()
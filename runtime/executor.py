@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from core.config import settings
+
+T = TypeVar("T")
+
+log = logging.getLogger("watchit.executor")
+
+# Lower value runs first.
+PRIORITY_NAVIGATION = 0
+PRIORITY_UPGRADE = 10
+
+
+class PipelineSaturated(RuntimeError):
+    """Raised when the pipeline queue is full and a new job cannot be admitted."""
+
+
+class PipelineExecutor:
+    """
+    Bounded worker pool for the blocking analysis pipeline (LLM + OCR).
+
+    `max_workers` caps how many graph runs execute at once; `max_queue` caps how
+    many more may wait for a free worker. Anything beyond that is rejected with
+    `PipelineSaturated` instead of piling up behind a slow model. Waiting jobs
+    are dispatched by priority, and a job cancelled before it reaches a worker
+    never runs.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max(1, max_workers or settings.pipeline_workers)
+        self.max_queue = max(0, max_queue if max_queue is not None else settings.pipeline_max_queue)
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._active = 0
+        self._pending = 0
+        self._running = 0
+        self._rejected = 0
+        self._cancelled = 0
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="watchit-pipeline")
+            log.info("Started pipeline pool (workers=%s, queue=%s)", self.max_workers, self.max_queue)
+        return self._pool
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PipelineSaturated(
+                    f"pipeline saturated ({self._pending} jobs in flight, limit {self.max_workers + self.max_queue})"
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def _acquire_slot(self, priority: int) -> None:
+        if self._waiters and any(w.done() for _, _, w in self._waiters):
+            # Drop entries of callers that gave up while queued.
+            self._waiters = [entry for entry in self._waiters if not entry[2].done()]
+            heapq.heapify(self._waiters)
+        if self._active < self.max_workers and not self._waiters:
+            self._active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we were cancelled; pass it on.
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # slot transfers to the waiter
+                return
+        self._active -= 1
+
+    def _wrap(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, priority: int = PRIORITY_NAVIGATION, **kwargs: Any) -> T:
+        """Run `fn` on the pool without blocking the event loop."""
+        self._admit()
+        try:
+            await self._acquire_slot(priority)
+        except BaseException:
+            with self._lock:
+                self._cancelled += 1
+            self._release()
+            raise
+        loop = asyncio.get_running_loop()
+        try:
+            fut = self._ensure_pool().submit(self._wrap, fn, *args, **kwargs)
+        except BaseException:
+            self._release_slot()
+            self._release()
+            raise
+
+        # Release the slot when the worker finishes, not when the caller stops
+        # waiting, so cancelled callers cannot overrun the pool.
+        def _done(_f: Any) -> None:
+            self._release()
+            try:
+                loop.call_soon_threadsafe(self._release_slot)
+            except RuntimeError:
+                pass  # loop already closed during shutdown
+
+        fut.add_done_callback(_done)
+        return await asyncio.wrap_future(fut)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": sum(1 for _, _, w in self._waiters if not w.done()),
+                "rejected": self._rejected,
+                "cancelled_before_start": self._cancelled,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+pipeline_executor = PipelineExecutor()
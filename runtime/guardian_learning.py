@@ -7,10 +7,7 @@ import time
 from typing import Any, Dict, List
 import re
 
-from langchain_ollama import ChatOllama
-from langchain.schema import HumanMessage, SystemMessage
-
-from core.config import settings
+from analysis.llm_judge import ollama_client
 from core.db import db
 
 
@@ -20,11 +17,7 @@ class GuardianLearningLoop:
     def __init__(self, interval_seconds: float = 3600.0):
         self.interval = interval_seconds
         self.logger = logging.getLogger("watchit.guardian_learning")
-        self.client = ChatOllama(
-            model=settings.ollama_model,
-            base_url=settings.ollama_base_url,
-            temperature=0,
-        )
+        self.client = ollama_client
 
     async def run_forever(self) -> None:
         while True:
@@ -40,7 +33,7 @@ class GuardianLearningLoop:
         overrides = db.fetch_unprocessed_overrides(100)
         if not overrides:
             return
-        guidance = await asyncio.to_thread(self._infer_guidance, overrides)
+        guidance = await self._infer_guidance(overrides)
 
         # Merge with any existing guidance to avoid discarding past insights.
         merged_guidance, merged_patterns = self._merge_with_existing(guidance)
@@ -53,9 +46,12 @@ class GuardianLearningLoop:
         }
         db.set_setting("guardian_feedback", json.dumps(payload))
         db.mark_override_processed([ov["id"] for ov in overrides])
+        # Cached verdicts were produced under the old guidance.
+        from runtime.verdict_cache import verdict_cache
+        verdict_cache.clear()
         self.logger.info("Updated guardian feedback using %s overrides", len(overrides))
 
-    def _infer_guidance(self, overrides: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def _infer_guidance(self, overrides: List[Dict[str, Any]]) -> Dict[str, Any]:
         sample_lines = []
         for o in overrides[:15]:
             sample_lines.append(
@@ -63,23 +59,24 @@ class GuardianLearningLoop:
             )
         prompt = "\n".join(sample_lines) or "No overrides."
         messages = [
-            SystemMessage(
-                content=(
+            {
+                "role": "system",
+                "content": (
                     "You review guardian overrides of a parental-control system. "
                     "Infer likely reasons (maturity, educational purpose, harmless fun, etc.) why a guardian corrected decisions."
                     "Respond in JSON with keys 'guidance' (short paragraph) and 'patterns' (array of short bullet strings)."
-                )
-            ),
-            HumanMessage(
-                content=(
+                ),
+            },
+            {
+                "role": "user",
+                "content": (
                     "Recent overrides (each line: url/title/original->manual action):\n"
                     f"{prompt}\n\nSummarize motivations so the model can improve future moderation."
-                )
-            ),
+                ),
+            },
         ]
         try:
-            resp = self.client.invoke(messages)
-            raw = resp.content.strip()
+            raw = await self.client.achat(messages)
         except Exception as exc:
             self.logger.exception("Guardian insight model failed")
             return {"guidance": f"LLM feedback unavailable: {exc}", "patterns": []}
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.config import settings
+from runtime.executor import PipelineSaturated
+from runtime.queue import InprocQueue
+
+log = logging.getLogger("watchit.journal")
+_BASE_DIR = Path(__file__).resolve().parent.parent
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+Admit = Callable[[Dict[str, Any]], str]  # stores the event body, returns its id
+Load = Callable[[str], Optional[Dict[str, Any]]]  # the stored event, None once it has a decision
+
+MAX_ATTEMPTS = 3
+
+
+def _resolve_path() -> Path:
+    raw = Path(settings.ingest_journal_path).expanduser()
+    path = raw if raw.is_absolute() else _BASE_DIR / raw
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class IngestJournal:
+    """
+    Append-only, fsync-batched journal of ingested events.
+
+    Records hold only sequence numbers and event ids; the event body lives in
+    the encrypted database, written before the event is journaled. Each
+    accepted event gets an `append` record and, once the pipeline has decided
+    it, a `done` record. Appends arriving within the same flush window share
+    one write + fsync (group commit), and callers are acknowledged only after
+    their record is durable. On start, appended-but-not-done records are
+    handed back for replay and the file is rewritten to hold just those.
+    """
+
+    def __init__(self, path: Optional[Path] = None, flush_interval_ms: Optional[float] = None):
+        self.path = path or _resolve_path()
+        interval = settings.ingest_journal_flush_ms if flush_interval_ms is None else flush_interval_ms
+        self.flush_interval = max(0.0, interval) / 1000.0
+        self.compact_bytes = settings.ingest_journal_compact_bytes
+        self._fh = None
+        self._seq = 0
+        self._outstanding: set[int] = set()
+        self._buffer: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._dirty: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+        self.counters = {"appended": 0, "completed": 0, "dead_lettered": 0, "fsyncs": 0, "replayed": 0, "compactions": 0}
+
+    def _load(self) -> List[Dict[str, Any]]:
+        pending: Dict[int, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return []
+        with self.path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    # A torn final write from a crash; everything before it is intact.
+                    log.warning("Skipping unreadable journal record")
+                    continue
+                seq = int(rec.get("seq", 0))
+                self._seq = max(self._seq, seq)
+                if rec.get("op") == "append":
+                    pending[seq] = rec
+                elif rec.get("op") == "done":
+                    pending.pop(seq, None)
+                # "dead" records leave the entry pending: it is retried on the next start.
+        return [pending[s] for s in sorted(pending)]
+
+    def _rewrite(self, records: List[Dict[str, Any]]) -> None:
+        """Replace the file with `records` (metadata only), dropping settled and legacy lines."""
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            for rec in records:
+                fh.write(json.dumps({"op": "append", "seq": rec["seq"], "event_id": rec["event_id"]}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        tmp.replace(self.path)
+
+    async def open(self, admit: Optional[Admit] = None) -> List[Dict[str, Any]]:
+        """
+        Open the journal and return records that still need processing.
+
+        Journals written before bodies moved to the database carry the event
+        itself; those events are stored through `admit` first, so the rewritten
+        file no longer holds page content.
+        """
+        replay = await asyncio.to_thread(self._load)
+        for rec in replay:
+            if "event_id" not in rec:
+                event = dict(rec.get("event") or {})
+                rec["event_id"] = await asyncio.to_thread(admit, event) if admit else event.get("id")
+        replay = [r for r in replay if r.get("event_id")]
+        await asyncio.to_thread(self._rewrite, replay)
+        self._outstanding = {int(r["seq"]) for r in replay}
+        self._fh = await asyncio.to_thread(self.path.open, "a", encoding="utf-8")
+        self._dirty = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self.counters["replayed"] += len(replay)
+        if replay:
+            log.info("Replaying %s unprocessed journal entries from %s", len(replay), self.path)
+        return replay
+
+    async def append(self, event_id: str) -> int:
+        """Durably record that `event_id` awaits processing; returns its sequence number once fsynced."""
+        self._seq += 1
+        seq = self._seq
+        rec = {"op": "append", "seq": seq, "event_id": event_id}
+        fut = asyncio.get_running_loop().create_future()
+        self._buffer.append(json.dumps(rec))
+        self._waiters.append(fut)
+        self._outstanding.add(seq)
+        self.counters["appended"] += 1
+        self._dirty.set()
+        await fut
+        return seq
+
+    def mark_done(self, seq: int) -> None:
+        """
+        Record completion; written with the next flush. The decision is committed
+        before this, so a crash in between replays an event that already has a
+        decision, and replay skips those.
+        """
+        self._outstanding.discard(seq)
+        self._buffer.append(json.dumps({"op": "done", "seq": seq}))
+        self.counters["completed"] += 1
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def dead_letter(self, seq: int) -> None:
+        """Give up on an entry for this run; it stays outstanding and is replayed on the next start."""
+        self._buffer.append(json.dumps({"op": "dead", "seq": seq}))
+        self.counters["dead_lettered"] += 1
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def _write(self, lines: List[str], compact: bool) -> None:
+        if compact:
+            # Nothing outstanding: every record on disk (and in `lines`) is settled.
+            self._fh.truncate(0)
+            self._fh.seek(0)
+        elif lines:
+            self._fh.write("\n".join(lines) + "\n")
+            self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._dirty.wait()
+            if self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+            self._dirty.clear()
+            lines, self._buffer = self._buffer, []
+            waiters, self._waiters = self._waiters, []
+            compact = not self._outstanding and self._fh.tell() + sum(len(l) for l in lines) > self.compact_bytes
+            try:
+                await asyncio.to_thread(self._write, lines, compact)
+            except Exception as exc:
+                log.exception("Journal write failed")
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            self.counters["fsyncs"] += 1
+            if compact:
+                self.counters["compactions"] += 1
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(None)
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._fh is not None:
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, lines, False)
+            self._fh.close()
+            self._fh = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "outstanding": len(self._outstanding)}
+
+
+class JournaledIngest:
+    """Fast-ack ingestion: store and journal the event, then let workers drain it into `handler`."""
+
+    def __init__(self, journal: Optional[IngestJournal] = None, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.journal = journal or IngestJournal()
+        self.worker_count = max(1, workers or settings.ingest_workers)
+        self.queue = InprocQueue(max_queue or settings.ingest_max_queue)
+        self._workers: List[asyncio.Task] = []
+        self._admit: Optional[Admit] = None
+        self._load: Optional[Load] = None
+        self.counters = {"rejected": 0, "retries": 0, "skipped_decided": 0}
+
+    async def start(self, handler: Handler, admit: Admit, load: Load) -> None:
+        self._admit, self._load = admit, load
+        replay = await self.journal.open(admit)
+        self._workers = [asyncio.create_task(self._worker(handler, i)) for i in range(self.worker_count)]
+        for rec in replay:
+            await self.queue.put({"seq": rec["seq"], "event_id": rec["event_id"], "event": None})
+
+    async def submit(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        if self.queue.full():
+            # Same backpressure as the direct path: the caller gets a 503 and retries.
+            self.counters["rejected"] += 1
+            raise PipelineSaturated(f"ingest queue full ({self.queue.q.maxsize} events)")
+        event = dict(event)
+        event_id = await asyncio.to_thread(self._admit, event)
+        seq = await self.journal.append(event_id)
+        await self.queue.put({"seq": seq, "event_id": event_id, "event": event})
+        return {"event_id": event_id, "queued": True, "needs_ocr": False, "ts": event.get("ts")}
+
+    async def _worker(self, handler: Handler, idx: int) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                # Shutdown mid-event cancels here and leaves it un-done, so the next start replays it.
+                processed = await self._process(handler, item, idx)
+            finally:
+                self.queue.task_done()
+            if processed:
+                self.journal.mark_done(item["seq"])
+            else:
+                self.journal.dead_letter(item["seq"])
+
+    async def _process(self, handler: Handler, item: Dict[str, Any], idx: int) -> bool:
+        """Run one entry to a decision; False once it has failed MAX_ATTEMPTS times."""
+        failures = 0
+        backoff = 0.1
+        event = item["event"]
+        while True:
+            if event is None:
+                # Replayed or retried: reload, and skip it if a decision was committed meanwhile.
+                event = await asyncio.to_thread(self._load, item["event_id"])
+                if event is None:
+                    self.counters["skipped_decided"] += 1
+                    return True
+            try:
+                await handler(event)
+                return True
+            except PipelineSaturated:
+                # Backpressure, not a failure: hold the entry until the pipeline drains.
+                pass
+            except Exception:
+                failures += 1
+                log.exception("Ingest worker %s failed on journal entry %s (attempt %s)", idx, item["seq"], failures)
+                if failures >= MAX_ATTEMPTS:
+                    log.error("Journal entry %s (event %s) dead-lettered until restart", item["seq"], item["event_id"])
+                    return False
+            self.counters["retries"] += 1
+            event = None
+            await asyncio.sleep(backoff)
+            backoff = min(2.0, backoff * 2)
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        await self.journal.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.journal.stats(), **self.counters, "queued": self.queue.q.qsize(), "workers": self.worker_count}
+
+
+ingest = JournaledIngest()
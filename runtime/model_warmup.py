@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from analysis.llm_judge import OllamaClient, judge_tiers, ollama_client, prefix_messages
+from core.config import settings
+
+
+class ModelWarmup:
+    """
+    Keeps the judge models (every cascade tier) loaded and their shared
+    prompt prefix cached.
+
+    Runs once at startup, so the first navigation does not pay the cold
+    load, then every `WATCHIT_OLLAMA_WARMUP_INTERVAL` seconds to renew the
+    `keep_alive` pin and re-prime the prefix if Ollama evicted the model.
+    """
+
+    def __init__(self, client: Optional[OllamaClient] = None, interval_seconds: Optional[float] = None):
+        self.client = client or ollama_client
+        self.interval = interval_seconds if interval_seconds is not None else settings.ollama_warmup_interval_seconds
+        self.logger = logging.getLogger("watchit.warmup")
+        self.counters: Dict[str, Any] = {"runs": 0, "failures": 0, "last_at": None, "last": {}}
+
+    async def run_forever(self) -> None:
+        while True:
+            await self.process_once()
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    async def process_once(self) -> Dict[str, Dict[str, Any]]:
+        warmed: Dict[str, Dict[str, Any]] = {}
+        for tier in judge_tiers():
+            try:
+                timings = await self.client.aprefill(prefix_messages(), model=tier.model)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.counters["failures"] += 1
+                self.logger.warning("Warmup of %s failed: %s", tier.model, exc)
+                continue
+            warmed[tier.model] = timings
+            if timings.get("load_ms", 0) > 1000:
+                self.logger.info("Loaded %s in %.0f ms", tier.model, timings["load_ms"])
+        self.counters["runs"] += 1
+        self.counters["last_at"] = int(time.time())
+        self.counters["last"] = warmed
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
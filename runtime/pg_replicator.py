@@ -49,20 +49,17 @@ def _get_pg_logger() -> logging.Logger:
 
 
 def _get_setting(key: str) -> Optional[str]:
-    cur = db.conn.cursor()
-    cur.execute("SELECT value FROM settings WHERE key=?", (key,))
-    row = cur.fetchone()
-    return row[0] if row else None
+    return db.get_setting(key)
 
 
 def _set_setting(key: str, value: str) -> None:
-    cur = db.conn.cursor()
-    cur.execute(
-        "INSERT INTO settings(key,value) VALUES(?, ?) "
-        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-        (key, value),
-    )
-    db.conn.commit()
+    db.set_setting(key, value)
+
+
+_DECISION_COLUMNS = (
+    "id, event_id, policy_version, action, reason, details_json, original_action, "
+    "manual_action, manual_flagged, manual_processed, manual_updated_at, seq"
+)
 
 
 class PostgresReplicator:
@@ -174,11 +171,16 @@ class PostgresReplicator:
                 );
                 """
             )
+            # Keyset pagination on (ts, id) for the dashboard listings
+            cur.execute("CREATE INDEX IF NOT EXISTS watchit_events_ts_id ON watchit_events(ts, id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS watchit_events_child_ts_id ON watchit_events(child_id, ts, id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS watchit_decisions_event ON watchit_decisions(event_id)")
 
     def _sync_children(self, conn: psycopg.Connection) -> int:
-        cur = db.conn.cursor()
-        cur.execute("SELECT id, name, os_user, timezone, strictness, age, created_at FROM child_profile")
-        rows = cur.fetchall()
+        with db.reader() as sqlite_conn:
+            cur = sqlite_conn.cursor()
+            cur.execute("SELECT id, name, os_user, timezone, strictness, age, created_at FROM child_profile")
+            rows = cur.fetchall()
         if not rows:
             return 0
         payloads = [tuple(row) for row in rows]
@@ -202,20 +204,21 @@ class PostgresReplicator:
     def _sync_events(self, conn: psycopg.Connection) -> int:
         last_ts_raw = _get_setting("pg_last_event_ts")
         last_ts = int(last_ts_raw) if last_ts_raw else None
-        cur = db.conn.cursor()
-        if last_ts is None:
-            cur.execute(
-                "SELECT id, child_id, ts, kind, url, title, tab_id, referrer, data_json "
-                "FROM event ORDER BY ts ASC LIMIT ?",
-                (self.batch_size,),
-            )
-        else:
-            cur.execute(
-                "SELECT id, child_id, ts, kind, url, title, tab_id, referrer, data_json "
-                "FROM event WHERE ts > ? ORDER BY ts ASC LIMIT ?",
-                (last_ts, self.batch_size),
-            )
-        rows = cur.fetchall()
+        with db.reader() as sqlite_conn:
+            cur = sqlite_conn.cursor()
+            if last_ts is None:
+                cur.execute(
+                    "SELECT id, child_id, ts, kind, url, title, tab_id, referrer, payload_hash "
+                    "FROM event ORDER BY ts ASC LIMIT ?",
+                    (self.batch_size,),
+                )
+            else:
+                cur.execute(
+                    "SELECT id, child_id, ts, kind, url, title, tab_id, referrer, payload_hash "
+                    "FROM event WHERE ts > ? ORDER BY ts ASC LIMIT ?",
+                    (last_ts, self.batch_size),
+                )
+            rows = cur.fetchall()
         if not rows:
             return 0
         payloads = [
@@ -228,7 +231,7 @@ class PostgresReplicator:
                 r[5],
                 r[6],
                 r[7],
-                Json(self._safe_json(r[8])),
+                Json(db.get_payload(r[8])),
             )
             for r in rows
         ]
@@ -246,57 +249,25 @@ class PostgresReplicator:
         return len(rows)
 
     def _sync_decisions(self, conn: psycopg.Connection) -> int:
-        last_ts_raw = _get_setting("pg_last_decision_ts")
-        last_ts = int(last_ts_raw) if last_ts_raw else None
-        cur = db.conn.cursor()
-        if last_ts is None:
+        # New decisions follow their commit-ordered seq, so one committed late
+        # for an old event is still picked up; overrides follow manual_updated_at.
+        # The old ts watermark (pg_last_decision_ts) is ignored: the first sync
+        # after the upgrade re-sends everything, which the upsert absorbs.
+        last_seq = int(_get_setting("pg_last_decision_seq") or 0)
+        last_override = int(_get_setting("pg_last_override_ts") or 0)
+        with db.reader() as sqlite_conn:
+            cur = sqlite_conn.cursor()
             cur.execute(
-                """
-                SELECT d.id,
-                       d.event_id,
-                       d.policy_version,
-                       d.action,
-                       d.reason,
-                       d.details_json,
-                       e.ts,
-                       d.original_action,
-                       d.manual_action,
-                       d.manual_flagged,
-                       d.manual_processed,
-                       d.manual_updated_at,
-                       MAX(e.ts, COALESCE(d.manual_updated_at, 0)) AS sync_ts
-                FROM decision d
-                JOIN event e ON e.id = d.event_id
-                ORDER BY sync_ts ASC
-                LIMIT ?
-                """,
-                (self.batch_size,),
+                f"SELECT {_DECISION_COLUMNS} FROM decision WHERE seq > ? ORDER BY seq ASC LIMIT ?",
+                (last_seq, self.batch_size),
             )
-        else:
+            created = cur.fetchall()
             cur.execute(
-                """
-                SELECT d.id,
-                       d.event_id,
-                       d.policy_version,
-                       d.action,
-                       d.reason,
-                       d.details_json,
-                       e.ts,
-                       d.original_action,
-                       d.manual_action,
-                       d.manual_flagged,
-                       d.manual_processed,
-                       d.manual_updated_at,
-                       MAX(e.ts, COALESCE(d.manual_updated_at, 0)) AS sync_ts
-                FROM decision d
-                JOIN event e ON e.id = d.event_id
-                WHERE MAX(e.ts, COALESCE(d.manual_updated_at, 0)) > ?
-                ORDER BY sync_ts ASC
-                LIMIT ?
-                """,
-                (last_ts, self.batch_size),
+                f"SELECT {_DECISION_COLUMNS} FROM decision WHERE manual_updated_at > ? ORDER BY manual_updated_at ASC LIMIT ?",
+                (last_override, self.batch_size),
             )
-        rows = cur.fetchall()
+            overridden = cur.fetchall()
+        rows = list({r[0]: r for r in created + overridden}.values())
         if not rows:
             return 0
 
@@ -308,11 +279,11 @@ class PostgresReplicator:
                 r[3],
                 r[4],
                 Json(self._safe_json(r[5])),
+                r[6],
                 r[7],
-                r[8],
+                bool(r[8]),
                 bool(r[9]),
-                bool(r[10]),
-                r[11],
+                r[10],
             )
             for r in rows
         ]
@@ -333,8 +304,10 @@ class PostgresReplicator:
                 """,
                 payloads,
             )
-        latest_ts = max(r[12] or 0 for r in rows)
-        _set_setting("pg_last_decision_ts", str(latest_ts))
+        if created:
+            _set_setting("pg_last_decision_seq", str(created[-1][11]))
+        if overridden:
+            _set_setting("pg_last_override_ts", str(overridden[-1][10]))
         return len(rows)
 
     @staticmethod
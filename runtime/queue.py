@@ -3,9 +3,12 @@ import asyncio
 from typing import Any, Dict, Callable, Awaitable, Optional
 
 class InprocQueue:
-    """Simple in-process async queue for events."""
-    def __init__(self):
-        self.q: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
+    """Simple in-process async queue for events (unbounded when `maxsize` is 0)."""
+    def __init__(self, maxsize: int = 0):
+        self.q: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize)
+
+    def full(self) -> bool:
+        return self.q.full()
 
     async def put(self, item: Dict[str, Any]):
         await self.q.put(item)
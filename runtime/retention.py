@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from core.archive import ArchiveStore, archive
+from core.config import settings
+from core.db import db
+
+DAY_MS = 24 * 3600 * 1000
+
+
+class RetentionJob:
+    """
+    Background job that moves history past its retention budget into the archive.
+
+    Work is done in small batches: rows are read through the reader pool and
+    written to the archive segment first, then deleted from the live database
+    in one short writer job. The batch size adapts so each delete stays within
+    `WATCHIT_RETENTION_MAX_WRITE_MS`. A crash between the two steps only means
+    the rows get archived again next time.
+    """
+
+    def __init__(self, store: Optional[ArchiveStore] = None, interval_seconds: Optional[float] = None):
+        self.store = store or archive
+        self.interval = interval_seconds or settings.retention_interval_seconds
+        self.batch = max(1, settings.retention_batch)
+        self.max_write_ms = settings.retention_max_write_ms
+        self.logger = logging.getLogger("watchit.retention")
+        self.counters = {"runs": 0, "events_archived": 0, "analyses_archived": 0, "batches": 0, "slowest_write_ms": 0.0}
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.process_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.logger.exception("Retention run failed")
+            await asyncio.sleep(self.interval)
+
+    def _event_cutoff(self, now_ms: int) -> Optional[int]:
+        cutoff = now_ms - settings.retention_event_days * DAY_MS if settings.retention_event_days > 0 else None
+        if settings.retention_max_events > 0:
+            excess = db.count_events() - settings.retention_max_events
+            if excess > 0:
+                size_cutoff = db.event_ts_at(excess)
+                if size_cutoff is not None:
+                    cutoff = size_cutoff if cutoff is None else max(cutoff, size_cutoff)
+        return cutoff
+
+    def _timed_write(self, fn, *args) -> Any:
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.counters["slowest_write_ms"] = max(self.counters["slowest_write_ms"], round(elapsed, 2))
+        # Keep writer holds short: shrink fast, grow slowly.
+        if elapsed > self.max_write_ms:
+            self.batch = max(1, self.batch // 2)
+        elif elapsed < self.max_write_ms / 2:
+            self.batch = min(settings.retention_batch * 4, self.batch + max(1, self.batch // 4))
+        return result
+
+    def _archive_events_batch(self, cutoff: int) -> int:
+        started_ms = int(time.time() * 1000)
+        events = db.fetch_events_for_archive(cutoff, self.batch)
+        if not events:
+            return 0
+        self.store.write_events(events)
+        removed = self._timed_write(db.purge_events, [e["id"] for e in events], started_ms)
+        self.counters["events_archived"] += len(removed)
+        # A batch where every event was touched meanwhile must not look like "done".
+        return len(removed) or len(events)
+
+    def _archive_analyses_batch(self, cutoff: int) -> int:
+        rows = db.fetch_analyses_for_archive(cutoff, self.batch)
+        if not rows:
+            return 0
+        self.store.write_analyses(rows)
+        removed = self._timed_write(db.purge_analyses, [r["id"] for r in rows])
+        self.counters["analyses_archived"] += removed
+        return len(rows)
+
+    async def process_once(self) -> Dict[str, int]:
+        now_ms = int(time.time() * 1000)
+        done = {"events": 0, "analyses": 0}
+        budget = settings.retention_max_batches
+        cutoff = await asyncio.to_thread(self._event_cutoff, now_ms)
+        while cutoff is not None and budget > 0:
+            moved = await asyncio.to_thread(self._archive_events_batch, cutoff)
+            if not moved:
+                break
+            done["events"] += moved
+            budget -= 1
+            self.counters["batches"] += 1
+            await asyncio.sleep(settings.retention_pause_ms / 1000)
+        if settings.retention_analysis_days > 0:
+            analysis_cutoff = now_ms - settings.retention_analysis_days * DAY_MS
+            while budget > 0:
+                moved = await asyncio.to_thread(self._archive_analyses_batch, analysis_cutoff)
+                if not moved:
+                    break
+                done["analyses"] += moved
+                budget -= 1
+                self.counters["batches"] += 1
+                await asyncio.sleep(settings.retention_pause_ms / 1000)
+        self.counters["runs"] += 1
+        if done["events"] or done["analyses"]:
+            self.logger.info("Archived %s events and %s analyses", done["events"], done["analyses"])
+        return done
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "batch": self.batch, "segments": len(self.store.segments())}
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+log = logging.getLogger("watchit.scheduler")
+
+
+class TabScheduler:
+    """
+    Track in-flight pipeline work per browser tab.
+
+    Only the latest navigation in a tab still matters: when a new event claims
+    the tab, every task registered for the previous event (its pipeline run,
+    deadline-mode finalizer, OCR upgrade) is cancelled, and late upgrades for
+    the old event are refused.
+    """
+
+    def __init__(self, max_tabs: int = 512):
+        self.max_tabs = max_tabs
+        self._latest: "OrderedDict[str, str]" = OrderedDict()
+        self._tasks: Dict[str, Set[asyncio.Task]] = {}
+        self.superseded = 0
+
+    def claim(self, tab_id: Optional[str], event_id: str) -> None:
+        """Make `event_id` the current navigation of `tab_id`, cancelling older work."""
+        if not tab_id:
+            return
+        previous = self._latest.get(tab_id)
+        self._latest[tab_id] = event_id
+        self._latest.move_to_end(tab_id)
+        if previous and previous != event_id:
+            self._cancel(previous)
+        while len(self._latest) > self.max_tabs:
+            _, stale = self._latest.popitem(last=False)
+            self._tasks.pop(stale, None)
+
+    def is_superseded(self, tab_id: Optional[str], event_id: Optional[str]) -> bool:
+        if not tab_id or not event_id:
+            return False
+        latest = self._latest.get(tab_id)
+        return latest is not None and latest != event_id
+
+    def track(self, tab_id: Optional[str], event_id: str, task: asyncio.Task) -> None:
+        """Register `task` as work on behalf of `event_id`; cancelled if the tab moves on."""
+        if not tab_id:
+            return
+        if self.is_superseded(tab_id, event_id):
+            task.cancel()
+            return
+        tasks = self._tasks.setdefault(event_id, set())
+        tasks.add(task)
+
+        def _forget(t: asyncio.Task) -> None:
+            remaining = self._tasks.get(event_id)
+            if remaining is None:
+                return
+            remaining.discard(t)
+            if not remaining:
+                self._tasks.pop(event_id, None)
+
+        task.add_done_callback(_forget)
+
+    def _cancel(self, event_id: str) -> None:
+        tasks = self._tasks.pop(event_id, set())
+        cancelled = 0
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                cancelled += 1
+        if cancelled:
+            self.superseded += 1
+            log.info("Superseded event %s (%s tasks cancelled)", event_id, cancelled)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tabs": len(self._latest),
+            "events_with_work": len(self._tasks),
+            "superseded": self.superseded,
+        }
+
+
+tab_scheduler = TabScheduler()
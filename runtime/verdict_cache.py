@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.config import settings
+from core.db import db
+
+log = logging.getLogger("watchit.verdict_cache")
+
+# Query parameters that never change page content but vary per click/share.
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src", "ref_url", "si", "feature",
+    "spm", "scid", "trk", "vero_id", "oly_anon_id", "oly_enc_id",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# MonitorState fields worth reusing; everything else is derived from the event.
+CACHED_FIELDS = (
+    "fast_scores",
+    "judge_json",
+    "headline_result",
+    "confidence",
+    "ocr_text",
+    "need_llm",
+    "need_ocr",
+    "needs_screenshot",
+)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so trivially different links map to the same cache entry."""
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = (parts.scheme or "").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    netloc = host
+    if port is not None and DEFAULT_PORTS.get(scheme) != str(port):
+        netloc = f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+    return urlunsplit((scheme, netloc, path, urlencode(query, doseq=True), ""))
+
+
+def _dom_sample(event: Dict[str, Any]) -> str:
+    raw = event.get("data_json")
+    if not raw:
+        return ""
+    try:
+        data = json.loads(raw) or {}
+    except Exception:
+        return ""
+    parts = [data.get("dom_sample") or "", data.get("text") or ""]
+    return "\n".join(p for p in parts if isinstance(p, str))
+
+
+@lru_cache(maxsize=1)
+def _model_versions() -> Tuple[str, ...]:
+    # The graph owns the loaded models; tiers and the linear build are fixed for the process.
+    from analysis.graph import model_versions
+
+    return tuple(model_versions())
+
+
+def verdict_key(event: Dict[str, Any], child_profile: Dict[str, Any]) -> str:
+    """Cache key: canonical URL + content hash + child profile + policy version + every model consulted."""
+    content_hash = hashlib.sha256(_dom_sample(event).encode("utf-8", "ignore")).hexdigest()
+    strictness = (child_profile.get("strictness") or "standard").lower()
+    try:
+        age = int(child_profile.get("age", 12) or 12)
+    except Exception:
+        age = 12
+    material = json.dumps(
+        [
+            canonicalize_url(event.get("url") or ""),
+            event.get("kind") or "",
+            event.get("title") or "",
+            content_hash,
+            age,
+            strictness,
+            settings.policy_version,
+            *_model_versions(),
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def upgrade_verdict_key(base_key: str, event: Dict[str, Any]) -> str:
+    """Key of an OCR upgrade: the page's verdict key plus a hash of the screenshots it was run on."""
+    try:
+        shots = (json.loads(event.get("data_json") or "{}") or {}).get("screenshots_b64") or []
+    except Exception:
+        shots = []
+    digest = hashlib.sha256()
+    for shot in shots:
+        digest.update(hashlib.sha256(str(shot).encode("ascii", "ignore")).digest())
+    return f"{base_key}:ocr:{digest.hexdigest()}"
+
+
+class VerdictCache:
+    """
+    Two-tier (memory LRU + encrypted on-disk) cache of pipeline verdicts.
+
+    Entries store the MonitorState fields produced by `app_graph`, never the
+    policy decision itself, so schedules and pauses are still applied live.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        max_disk_entries: Optional[int] = None,
+        persist: Optional[bool] = None,
+    ):
+        self.max_entries = max_entries or settings.verdict_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.verdict_cache_ttl_seconds
+        self.max_disk_entries = max_disk_entries or settings.verdict_cache_max_disk_entries
+        self.persist = settings.verdict_cache_persist if persist is None else persist
+        self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return settings.verdict_cache_enabled and self.ttl_seconds > 0
+
+    def _fresh(self, stored_at: float, now: float) -> bool:
+        return now - stored_at <= self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._mem[key] = (stored_at, payload)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if self._fresh(entry[0], now):
+                    self._mem.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return dict(entry[1])
+                del self._mem[key]
+                self.counters["expired"] += 1
+        if self.persist:
+            try:
+                row = db.get_cached_verdict(key)
+            except Exception:
+                log.exception("Verdict cache disk lookup failed")
+                row = None
+            if row is not None:
+                stored_at, payload = row
+                if self._fresh(stored_at, now):
+                    self._remember(key, stored_at, payload)
+                    with self._lock:
+                        self.counters["disk_hits"] += 1
+                    return dict(payload)
+                with self._lock:
+                    self.counters["expired"] += 1
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, state: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        payload = {field: state.get(field) for field in CACHED_FIELDS if field in state}
+        stored_at = time.time()
+        self._remember(key, stored_at, payload)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._puts_since_prune += 1
+            prune = self._puts_since_prune >= 100
+            if prune:
+                self._puts_since_prune = 0
+        if not self.persist:
+            return
+        try:
+            db.put_cached_verdict(key, payload, int(stored_at * 1000))
+            if prune:
+                db.prune_verdict_cache(
+                    max_entries=self.max_disk_entries,
+                    older_than_ms=int((stored_at - self.ttl_seconds) * 1000),
+                )
+        except Exception:
+            log.exception("Verdict cache disk write failed")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.persist:
+            db.clear_verdict_cache()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {
+                **self.counters,
+                "entries": len(self._mem),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+verdict_cache = VerdictCache()
@@ -0,0 +1,12 @@
+"""
+core.config reads the environment once, and core.db opens its database at
+import time: point both at a scratch file before any test module imports them.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+_SCRATCH = Path(tempfile.mkdtemp(prefix="watchit-tests-"))
+os.environ["WATCHIT_DB_PATH"] = str(_SCRATCH / "scratch.db")
@@ -0,0 +1,100 @@
+"""CircuitBreaker state transitions: closed -> open -> half-open -> closed/open."""
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from analysis import circuit  # noqa: E402
+from analysis.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    now = [1_000.0]
+    monkeypatch.setattr(circuit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker("judge-model", failures=3, slow_ms=500, cooldown_s=30)
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.max_failures):
+        breaker.record(10, TimeoutError())
+
+
+def test_trips_after_consecutive_failures(clock: List[float]) -> None:
+    breaker = _breaker()
+    breaker.record(10, TimeoutError())
+    breaker.record(10, TimeoutError())
+    assert breaker.state == CLOSED
+    breaker.record(10, TimeoutError())
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.counters["trips"] == 1
+    assert breaker.counters["rejected"] == 1
+
+
+def test_success_resets_the_streak(clock: List[float]) -> None:
+    breaker = _breaker()
+    breaker.record(10, TimeoutError())
+    breaker.record(10, TimeoutError())
+    breaker.record(10)
+    breaker.record(10, TimeoutError())
+    assert breaker.state == CLOSED
+
+
+def test_slow_responses_count_as_failures(clock: List[float]) -> None:
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(900)
+    assert breaker.state == OPEN
+    assert breaker.counters["slow"] == 3
+    assert breaker.counters["failures"] == 0
+
+
+def test_half_open_lets_one_probe_through(clock: List[float]) -> None:
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 29
+    assert breaker.state == OPEN
+    clock[0] += 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(clock: List[float]) -> None:
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(10)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_for_another_cooldown(clock: List[float]) -> None:
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(10, ConnectionError())
+    assert breaker.state == OPEN
+    assert breaker.counters["trips"] == 2
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+
+
+def test_reset_closes(clock: List[float]) -> None:
+    breaker = _breaker()
+    _trip(breaker)
+    breaker.reset()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
@@ -0,0 +1,89 @@
+"""The writer thread survives a batch whose transaction control fails."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+pytest.importorskip("pysqlcipher3")
+
+from core.connections import ConnectionManager  # noqa: E402
+
+
+class _FlakyCursor:
+    """Fails the next BEGIN IMMEDIATE once `failures` is non-empty."""
+
+    def __init__(self, cur: Any, failures: List[Exception]):
+        self.cur = cur
+        self.failures = failures
+
+    def execute(self, sql: str, params: Any = ()) -> Any:
+        if sql == "BEGIN IMMEDIATE" and self.failures:
+            raise self.failures.pop()
+        return self.cur.execute(sql, params)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.cur, name)
+
+
+class _FlakyConnection:
+    def __init__(self, conn: Any, failures: List[Exception]):
+        self.conn = conn
+        self.failures = failures
+
+    def cursor(self) -> _FlakyCursor:
+        return _FlakyCursor(self.conn.cursor(), self.failures)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.conn, name)
+
+
+@pytest.fixture
+def failures() -> List[Exception]:
+    return []
+
+
+@pytest.fixture
+def conns(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, failures: List[Exception]) -> Any:
+    real_open = ConnectionManager._open
+
+    def _open(self: ConnectionManager, *, readonly: bool) -> Any:
+        conn = real_open(self, readonly=readonly)
+        return conn if readonly else _FlakyConnection(conn, failures)
+
+    monkeypatch.setattr(ConnectionManager, "_open", _open)
+    manager = ConnectionManager(str(tmp_path / "writer.db"), "passphrase", readers=1)
+    manager.start()
+    manager.write(lambda conn: conn.execute("CREATE TABLE t(v INTEGER)"), transactional=False)
+    yield manager
+    manager.close()
+
+
+def _insert(value: int) -> Any:
+    return lambda conn: conn.execute("INSERT INTO t(v) VALUES (?)", (value,))
+
+
+def _values(manager: ConnectionManager) -> List[int]:
+    return manager.write(lambda conn: [r[0] for r in conn.execute("SELECT v FROM t ORDER BY v").fetchall()])
+
+
+def test_failed_begin_fails_the_batch_and_keeps_writing(conns: ConnectionManager, failures: List[Exception]) -> None:
+    failures.append(RuntimeError("injected BEGIN failure"))
+    with pytest.raises(RuntimeError, match="injected BEGIN failure"):
+        conns.submit(_insert(1)).result(timeout=5)
+
+    conns.write(_insert(2))
+    assert _values(conns) == [2]
+    assert conns._writer is not None and conns._writer.is_alive()
+
+
+def test_job_errors_roll_back_only_that_job(conns: ConnectionManager) -> None:
+    def _boom(conn: Any) -> None:
+        conn.execute("INSERT INTO t(v) VALUES (99)")
+        raise ValueError("job failed")
+
+    with pytest.raises(ValueError):
+        conns.write(_boom)
+    conns.write(_insert(3))
+    assert _values(conns) == [3]
@@ -0,0 +1,121 @@
+"""JudgeBatcher coalescing, leader handoff and solo fallbacks, driven from real threads."""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+
+from analysis.judge_batcher import JudgeBatcher
+
+
+def _solo(request: Any) -> Dict[str, Any]:
+    return {"request": request, "via": "solo"}
+
+
+class _Harness:
+    """A batcher plus one long-running solo call, so later callers see a busy judge and batch."""
+
+    def __init__(self, batch_fn: Any, *, window_ms: float, max_items: int):
+        self.batcher = JudgeBatcher(batch_fn, window_ms=window_ms, max_items=max_items)
+        self.pool = ThreadPoolExecutor(max_workers=16)
+        self._busy = threading.Event()
+        self._release = threading.Event()
+
+        def _blocking_solo(request: Any) -> Dict[str, Any]:
+            self._busy.set()
+            self._release.wait(timeout=10)
+            return _solo(request)
+
+        self.blocker = self.pool.submit(self.batcher.judge, "blocker", _blocking_solo)
+        assert self._busy.wait(timeout=5)
+
+    def judge_all(self, requests: List[str]) -> Dict[str, Dict[str, Any]]:
+        futures = {r: self.pool.submit(self.batcher.judge, r, _solo) for r in requests}
+        return {r: f.result(timeout=10) for r, f in futures.items()}
+
+    def close(self) -> None:
+        self._release.set()
+        assert self.blocker.result(timeout=5) == _solo("blocker")
+        self.pool.shutdown()
+
+
+@pytest.fixture
+def harness() -> Iterator[Any]:
+    made: List[_Harness] = []
+
+    def _make(batch_fn: Any, *, window_ms: float = 2_000, max_items: int = 2) -> _Harness:
+        made.append(_Harness(batch_fn, window_ms=window_ms, max_items=max_items))
+        return made[-1]
+
+    yield _make
+    for h in made:
+        h.close()
+
+
+def _echo(sizes: List[int]) -> Any:
+    def batch_fn(requests: List[str]) -> List[Optional[Dict[str, Any]]]:
+        sizes.append(len(requests))
+        return [{"request": r, "via": "batch"} for r in requests]
+
+    return batch_fn
+
+
+def test_idle_judge_skips_the_window() -> None:
+    batcher = JudgeBatcher(_echo([]), window_ms=5_000, max_items=8)
+    started = time.monotonic()
+    assert batcher.judge("only", _solo) == _solo("only")
+    assert time.monotonic() - started < 1.0
+    assert batcher.counters["window_skipped"] == 1
+    assert batcher.counters["batches"] == 0
+
+
+def test_busy_judge_batches_concurrent_requests(harness: Any) -> None:
+    sizes: List[int] = []
+    h = harness(_echo(sizes))
+    results = h.judge_all(["a", "b"])
+    assert results == {r: {"request": r, "via": "batch"} for r in "ab"}
+    assert sizes == [2]
+    assert h.batcher.counters["batched_items"] == 2
+
+
+def test_leader_hands_off_beyond_max_items(harness: Any) -> None:
+    sizes: List[int] = []
+    h = harness(_echo(sizes), window_ms=200, max_items=2)
+    requests = ["a", "b", "c", "d", "e"]
+    results = h.judge_all(requests)
+    # Every caller gets its own verdict, whichever batch (or solo call) produced it.
+    assert {r: v["request"] for r, v in results.items()} == {r: r for r in requests}
+    assert max(sizes) == 2
+    assert len(sizes) >= 2
+    solo = sum(1 for v in results.values() if v["via"] == "solo")
+    assert sum(sizes) + solo == len(requests)
+    assert h.batcher.counters["largest_batch"] == 2
+
+
+def test_batch_failure_falls_back_to_solo(harness: Any) -> None:
+    def batch_fn(requests: List[str]) -> List[Optional[Dict[str, Any]]]:
+        raise RuntimeError("model returned garbage")
+
+    h = harness(batch_fn)
+    assert h.judge_all(["a", "b"]) == {r: _solo(r) for r in "ab"}
+    assert h.batcher.counters["fallbacks"] == 2
+    assert h.batcher.counters["batched_items"] == 0
+
+
+def test_unanswered_items_fall_back_to_solo(harness: Any) -> None:
+    def batch_fn(requests: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return [None if r == "b" else {"request": r, "via": "batch"} for r in requests]
+
+    h = harness(batch_fn)
+    assert h.judge_all(["a", "b"]) == {"a": {"request": "a", "via": "batch"}, "b": _solo("b")}
+    assert h.batcher.counters["fallbacks"] == 1
+    assert h.batcher.counters["batched_items"] == 1
+
+
+def test_short_batch_results_fall_back_to_solo(harness: Any) -> None:
+    h = harness(lambda requests: [])
+    assert h.judge_all(["a", "b"]) == {r: _solo(r) for r in "ab"}
+    assert h.batcher.counters["fallbacks"] == 2
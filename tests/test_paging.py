@@ -0,0 +1,100 @@
+"""Keyset cursors: round-trips, and `before`/`after` pages over a real table."""
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from core.paging import MAX_PAGE_SIZE, PageQuery, decode_cursor, encode_cursor
+
+# Two rows share every timestamp, so the id tiebreak matters.
+ROWS = [(ts, f"evt_{ts}_{suffix}") for ts in range(1, 6) for suffix in "ab"]
+NEWEST_FIRST = sorted(ROWS, reverse=True)
+
+
+@pytest.mark.parametrize("ts, row_id", [(0, ""), (1_700_000_000_000, "evt_abc"), (5, "id:with:colons"), (None, "x")])
+def test_cursor_round_trip(ts: Any, row_id: str) -> None:
+    token = encode_cursor(ts, row_id)
+    assert "=" not in token
+    assert decode_cursor(token) == (int(ts or 0), row_id)
+
+
+@pytest.mark.parametrize("token", ["", "not base64!", encode_cursor(1, "x")[:-2] + "**"])
+def test_bad_cursor(token: str) -> None:
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_parse() -> None:
+    page = PageQuery.parse(limit=10_000, before=encode_cursor(3, "evt_3_a"), child_id="", value="visit")
+    assert page.limit == MAX_PAGE_SIZE
+    assert page.before == (3, "evt_3_a")
+    assert page.child_id is None
+    assert page.value == "visit"
+    with pytest.raises(ValueError):
+        PageQuery.parse(before=encode_cursor(1, "a"), after=encode_cursor(2, "b"))
+
+
+@pytest.fixture
+def conn() -> Iterator[sqlite3.Connection]:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE event(id TEXT PRIMARY KEY, ts INTEGER, child_id TEXT, kind TEXT)")
+    conn.executemany("INSERT INTO event(id, ts, child_id, kind) VALUES (?, ?, 'c', 'visit')", [(i, ts) for ts, i in ROWS])
+    yield conn
+    conn.close()
+
+
+def _fetch(conn: sqlite3.Connection, page: PageQuery) -> Dict[str, Any]:
+    where, tail, params = page.sql(ts_col="ts", id_col="id", child_col="child_id", value_col="kind")
+    rows = [dict(r) for r in conn.execute(f"SELECT id, ts FROM event {where} {tail}", params)]
+    return page.page(rows, "events")
+
+
+def _keys(result: Dict[str, Any]) -> List[Any]:
+    return [(r["ts"], r["id"]) for r in result["events"]]
+
+
+def test_before_walks_older_pages(conn: sqlite3.Connection) -> None:
+    seen: List[Any] = []
+    cursor = None
+    while True:
+        result = _fetch(conn, PageQuery.parse(limit=3, before=cursor))
+        seen += _keys(result)
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == NEWEST_FIRST
+
+
+def test_after_pages_newer_rows_newest_first(conn: sqlite3.Connection) -> None:
+    oldest = _fetch(conn, PageQuery(limit=1, after=(0, "")))
+    assert _keys(oldest) == [ROWS[0]]
+    # Walk towards newer rows with prev_cursor; each page is still newest first.
+    seen: List[Any] = []
+    cursor = encode_cursor(*ROWS[2])
+    while True:
+        result = _fetch(conn, PageQuery.parse(limit=3, after=cursor))
+        keys = _keys(result)
+        if not keys:
+            break
+        assert keys == sorted(keys, reverse=True)
+        seen = keys + seen
+        cursor = result["prev_cursor"]
+    assert seen == NEWEST_FIRST[: len(ROWS) - 3]
+
+
+def test_after_then_before_returns_to_the_cursor(conn: sqlite3.Connection) -> None:
+    result = _fetch(conn, PageQuery(limit=2, after=ROWS[4]))
+    assert _keys(result) == [ROWS[6], ROWS[5]]
+    older = _fetch(conn, PageQuery.parse(limit=2, before=result["next_cursor"]))
+    assert _keys(older) == [ROWS[4], ROWS[3]]
+
+
+def test_filters_and_empty_page(conn: sqlite3.Connection) -> None:
+    result = _fetch(conn, PageQuery(limit=50, since_ms=2, until_ms=4))
+    assert _keys(result) == [k for k in NEWEST_FIRST if 2 <= k[0] < 4]
+    assert result["next_cursor"] is None
+    empty = _fetch(conn, PageQuery(limit=5, child_id="someone_else"))
+    assert empty == {"events": [], "next_cursor": None, "prev_cursor": None}
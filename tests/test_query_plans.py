@@ -0,0 +1,194 @@
+"""
+Hot queries must plan onto their indexes.
+
+The queries are issued by the real `Database` methods (and the PG replicator)
+against a freshly migrated scratch database; every statement they run is
+passed through `EXPLAIN QUERY PLAN` first, and a full-table `SCAN` fails the
+test.
+"""
+from __future__ import annotations
+
+import re
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("pysqlcipher3")
+
+# conftest.py has pointed WATCHIT_DB_PATH at a scratch file.
+from core import payloads  # noqa: E402
+from core.db import db  # noqa: E402
+from core.paging import PageQuery  # noqa: E402
+
+# "SCAN event" / "SCAN TABLE event AS e": a table walked without any index.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+EXPLAINED = ("SELECT", "WITH", "DELETE", "UPDATE")
+
+Plan = Tuple[str, List[str]]
+
+
+class _Recorder:
+    """A connection that records the query plan of each statement before running it."""
+
+    def __init__(self, conn: Any, plans: List[Plan]):
+        self.conn = conn
+        self.plans = plans
+
+    def explain(self, sql: str, params: Any = ()) -> None:
+        if sql.lstrip().upper().startswith(EXPLAINED):
+            rows = self.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            self.plans.append((" ".join(sql.split()), [str(r[-1]) for r in rows]))
+
+    def execute(self, sql: str, params: Any = ()) -> Any:
+        self.explain(sql, params)
+        return self.conn.execute(sql, params)
+
+    def cursor(self) -> "_RecordingCursor":
+        return _RecordingCursor(self)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.conn, name)
+
+
+class _RecordingCursor:
+    def __init__(self, recorder: _Recorder):
+        self.recorder = recorder
+        self.cur = recorder.conn.cursor()
+
+    def execute(self, sql: str, params: Any = ()) -> "_RecordingCursor":
+        self.recorder.explain(sql, params)
+        self.cur.execute(sql, params)
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.cur, name)
+
+
+class _RecordingConnections:
+    """Wraps the real ConnectionManager so reads and writes go through a _Recorder."""
+
+    def __init__(self, conns: Any):
+        self.conns = conns
+        self.plans: List[Plan] = []
+
+    @contextmanager
+    def reader(self, timeout: Any = None) -> Iterator[_Recorder]:
+        with self.conns.reader(timeout) as conn:
+            yield _Recorder(conn, self.plans)
+
+    def write(self, fn: Any, *, transactional: bool = True) -> Any:
+        return self.conns.write(lambda conn: fn(_Recorder(conn, self.plans)), transactional=transactional)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.conns, name)
+
+
+@pytest.fixture(scope="module")
+def seeded() -> str:
+    """One event with a decision, an override and an analysis, so every query has rows to plan over."""
+    event_id = db.add_event(
+        {"child_id": "child_default", "ts": 1_000, "kind": "visit", "url": "https://example.com/", "title": "Example",
+         "data_json": '{"dom_sample": "hello"}'}
+    )
+    decision_id = db.add_decision(event_id, "v1", "allow", "llm:low", {"confidence": 0.9})
+    db.add_analysis(event_id, "fast+ocr", "1.0", {"violence": 0.0})
+    db.override_decision(decision_id, "block")
+    return event_id
+
+
+@pytest.fixture
+def plans(monkeypatch: pytest.MonkeyPatch, seeded: str) -> List[Plan]:
+    recording = _RecordingConnections(db.conns)
+    monkeypatch.setattr(db, "conns", recording)
+    return recording.plans
+
+
+def _assert_indexed(plans: List[Plan]) -> None:
+    assert plans, "no statement was recorded"
+    scans = [(sql, line) for sql, plan in plans for line in plan if FULL_SCAN.match(line)]
+    assert not scans, "\n".join(f"{line}\n  in: {sql}" for sql, line in scans)
+
+
+PAGES = {
+    "first": PageQuery(limit=50),
+    "before": PageQuery(limit=50, before=(2_000, "evt_z")),
+    "after": PageQuery(limit=50, after=(0, "")),
+    "child": PageQuery(limit=50, child_id="child_default", before=(2_000, "evt_z")),
+    "window": PageQuery(limit=50, since_ms=0, until_ms=5_000),
+}
+
+
+@pytest.mark.parametrize("page", PAGES.values(), ids=PAGES.keys())
+def test_event_listing(plans: List[Plan], page: PageQuery) -> None:
+    db.list_events(page)
+    _assert_indexed(plans)
+
+
+@pytest.mark.parametrize("page", PAGES.values(), ids=PAGES.keys())
+def test_decision_listing(plans: List[Plan], page: PageQuery) -> None:
+    db.list_decisions(page)
+    _assert_indexed(plans)
+
+
+def test_override_queue(plans: List[Plan]) -> None:
+    db.fetch_unprocessed_overrides(50)
+    _assert_indexed(plans)
+
+
+def test_event_lookups(plans: List[Plan], seeded: str) -> None:
+    db.event_exists(seeded)
+    db.has_final_decision(seeded)
+    db.get_event(seeded)
+    _assert_indexed(plans)
+
+
+@pytest.mark.parametrize("child_id", [None, "child_default"])
+def test_daily_stats(plans: List[Plan], child_id: Any) -> None:
+    db.stats_daily(child_id, 30)
+    _assert_indexed(plans)
+
+
+def test_retention_batches(plans: List[Plan]) -> None:
+    db.fetch_events_for_archive(5_000, 200)
+    db.fetch_analyses_for_archive(5_000, 200)
+    _assert_indexed(plans)
+
+
+def test_payload_gc(plans: List[Plan]) -> None:
+    db.conns.write(lambda conn: payloads.collect_garbage(conn, ["0" * 64]))
+    _assert_indexed(plans)
+
+
+def test_cache_and_checkpoint_pruning(plans: List[Plan], seeded: str) -> None:
+    db.prune_verdict_cache(10, 0)
+    db.put_pipeline_checkpoint(seeded, {"confidence": 0.5}, 1_000)
+    db.take_pipeline_checkpoint(seeded)
+    db.prune_pipeline_checkpoints(0)
+    _assert_indexed(plans)
+
+
+class _NullPostgres:
+    """Swallows the replicator's Postgres writes; only its SQLite reads matter here."""
+
+    @contextmanager
+    def cursor(self) -> Iterator["_NullPostgres"]:
+        yield self
+
+    def executemany(self, *args: Any) -> None:
+        pass
+
+
+def test_replicator_batches(plans: List[Plan], monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("psycopg")
+    from runtime import pg_replicator
+
+    # Incremental syncs only: the very first one walks everything by design.
+    watermarks = {"pg_last_event_ts": "0", "pg_last_decision_seq": "0", "pg_last_override_ts": "0"}
+    monkeypatch.setattr(pg_replicator, "_get_setting", watermarks.get)
+    monkeypatch.setattr(pg_replicator, "_set_setting", watermarks.__setitem__)
+    replicator = pg_replicator.PostgresReplicator("postgresql://unused")
+    replicator._sync_events(_NullPostgres())
+    replicator._sync_decisions(_NullPostgres())
+    _assert_indexed(plans)